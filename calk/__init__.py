@@ -1,37 +1,20 @@
-from flask import Flask, request
-from flask_babel import Babel
+"""Scientific calculator: service layer plus a Flask web front end.
 
-babel = Babel()
-
-
-def get_locale():
-    # Check cookie first
-    lang = request.cookies.get('lang')
-    if lang in ['en', 'ru', 'fr', 'de', 'es', 'it', 'zh', 'ka', 'hy']:
-        return lang
-    # Then check Accept-Language header
-    return request.accept_languages.best_match(['en', 'ru', 'fr', 'de', 'es', 'it', 'zh', 'ka', 'hy']) or 'en'
+Importing ``calk`` or anything under ``calk.services`` does not import
+Flask or Flask-Babel; they are loaded by ``create_app`` (see
+``calk.factory``), so batch scripts and the CLI pay only for the
+service layer.
+"""
 
 
 def create_app(config_object=None):
-    app = Flask(__name__, template_folder="templates", static_folder="static")
-
-    # Config
-    if config_object is None:
-        from .config import Config
-        app.config.from_object(Config)
-    else:
-        app.config.from_object(config_object)
-
-    # Initialize extensions
-    babel.init_app(app, locale_selector=get_locale)
-
-    # expose gettext in templates
-    from flask_babel import gettext as _gettext
-    app.jinja_env.globals['gettext'] = _gettext
+    from .factory import create_app as _create_app
+    return _create_app(config_object)
 
-    # register blueprints
-    from .routes.main import main_bp
-    app.register_blueprint(main_bp)
 
-    return app
+def __getattr__(name):
+    # babel and get_locale live with the factory; load them on first use
+    if name in ('babel', 'get_locale'):
+        from . import factory
+        return getattr(factory, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,71 @@
+"""Command-line batch evaluation: ``python -m calk [--format csv|jsonl] [FILE]``.
+
+Reads CSV or JSON Lines rows (``op``, ``a``, ``b``) from FILE or stdin
+and writes the evaluated rows to stdout, chunk by chunk, using
+``calk.services.stream``. ``--workers N`` spreads large chunks over N
+cores (``calk.services.parallel``). ``--ipc SOCKET`` instead serves
+shared-memory batches to local processes on a Unix socket
+(``calk.services.ipc``). Imports no web dependencies.
+"""
+import argparse
+import sys
+
+from .config import Config
+from .services import batch, ipc, parallel, stream
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m calk',
+                                     description='Evaluate a CSV or JSONL file of calculations.')
+    parser.add_argument('input', nargs='?', type=argparse.FileType('r', encoding='utf-8'),
+                        default=sys.stdin, help='input file (default: stdin)')
+    parser.add_argument('--format', choices=('csv', 'jsonl'),
+                        help='input format (default: from the file extension, else csv)')
+    parser.add_argument('--chunk-size', type=int, default=Config.STREAM_CHUNK_SIZE)
+    parser.add_argument('--max-cost', type=float, default=Config.COST_BUDGET,
+                        help='per-row cost budget (see calk.services.cost)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='cores to evaluate large chunks on (0: all, default: 1)')
+    parser.add_argument('--ipc', metavar='SOCKET',
+                        help='serve shared-memory batches on this Unix socket instead')
+    parser.add_argument('--ipc-files', metavar='DIR',
+                        help='with --ipc, also accept memory-mapped file columns inside DIR')
+    args = parser.parse_args(argv)
+    if args.ipc:
+        return serve_ipc(args)
+
+    fmt = args.format or ('jsonl' if args.input.name.endswith(('.jsonl', '.ndjson')) else 'csv')
+    evaluate = stream.evaluate_jsonl if fmt == 'jsonl' else stream.evaluate_csv
+    evaluator = batch
+    if args.workers != 1:
+        evaluator = parallel.ParallelEvaluator(args.workers or None, min_items=8 * parallel.MIN_CHUNK)
+    try:
+        for piece in evaluate(args.input, args.chunk_size, args.max_cost, evaluator):
+            sys.stdout.write(piece)
+    except stream.StreamFormatError as e:
+        parser.exit(2, f'{parser.prog}: error: {e}\n')
+    finally:
+        if evaluator is not batch:
+            evaluator.shutdown()
+    return 0
+
+
+def serve_ipc(args) -> int:
+    evaluator = None
+    if args.workers != 1:
+        evaluator = parallel.ParallelEvaluator(args.workers or None)
+    server = ipc.Server(args.ipc, evaluator, args.max_cost, files=args.ipc_files)
+    print(f'serving on {args.ipc}', file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if evaluator is not None:
+            evaluator.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
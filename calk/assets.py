@@ -0,0 +1,188 @@
+"""Static asset build: minified, fingerprinted and precompressed files.
+
+``flask --app calk assets build`` reads every CSS, JS and SVG file under
+the static folder and writes to ``<static>/<ASSET_DIST_DIR>``:
+
+- a minified copy named after its content hash
+  (``css/style.css`` -> ``dist/css/style.3f2a9c1b7e.css``);
+- ``.gz`` and, when the ``brotli`` package is installed, ``.br``
+  siblings compressed at the highest level;
+- ``manifest.json`` mapping source names to built names.
+
+At runtime ``url_for('static', filename='css/style.css')`` resolves
+through the manifest (see ``http_cache.CachePolicy.url_defaults``) and
+the static view serves the best precompressed sibling allowed by
+``Accept-Encoding``; nothing is compressed per request. Without a
+manifest the source files are served as before.
+
+The minifiers are conservative (comments and redundant whitespace only)
+so they cannot change the meaning of the small hand-written assets.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip siblings are built
+    brotli = None
+
+MANIFEST_NAME = 'manifest.json'
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def minify_css(text: str) -> str:
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text: str) -> str:
+    # only whole-line comments: '//' can appear inside strings and URLs
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//')) + '\n'
+
+
+def minify_svg(text: str) -> str:
+    text = re.sub(r'<!--.*?-->', '', text, flags=re.S)
+    text = re.sub(r'>\s+<', '><', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js, '.svg': minify_svg}
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def _compress(path: str, data: bytes):
+    with open(path + '.gz', 'wb') as f:
+        # mtime=0 keeps the output reproducible
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build(static_folder: str, dist_dir: str = 'dist') -> dict:
+    """Build every minifiable asset into ``static_folder/dist_dir``.
+
+    The output directory is replaced. Returns the manifest, which maps
+    source paths to built paths, both relative to ``static_folder``.
+    """
+    out = os.path.join(static_folder, dist_dir)
+    if os.path.isdir(out):
+        shutil.rmtree(out)
+    manifest = {}
+    for root, dirs, names in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(static_folder) and dist_dir in dirs:
+            dirs.remove(dist_dir)
+        for name in sorted(names):
+            stem, ext = os.path.splitext(name)
+            if ext not in MINIFIERS:
+                continue
+            source = os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, '/')
+            with open(os.path.join(root, name), encoding='utf-8') as f:
+                data = MINIFIERS[ext](f.read()).encode('utf-8')
+            built = '/'.join(filter(None, [dist_dir, os.path.dirname(source),
+                                           f'{stem}.{fingerprint(data)}{ext}']))
+            path = os.path.join(static_folder, *built.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+            _compress(path, data)
+            manifest[source] = built
+    with open(os.path.join(out, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class AssetManifest:
+    """Source name -> built name lookup loaded from ``manifest.json``."""
+
+    def __init__(self, entries=None):
+        self.entries = dict(entries or {})
+        self.built = frozenset(self.entries.values())
+
+    @classmethod
+    def load(cls, static_folder: str, dist_dir: str = 'dist'):
+        """The manifest of a previous build, or an empty one."""
+        try:
+            with open(os.path.join(static_folder, dist_dir, MANIFEST_NAME), encoding='utf-8') as f:
+                return cls(json.load(f))
+        except (OSError, ValueError):
+            return cls()
+
+    def resolve(self, filename: str) -> str:
+        return self.entries.get(filename, filename)
+
+    def __contains__(self, built_name) -> bool:
+        return built_name in self.built
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+
+def init_app(app):
+    """Load the manifest, serve precompressed variants, add the CLI command."""
+    import click
+    from flask import request, send_from_directory
+    from flask.cli import AppGroup
+
+    manifest = AssetManifest.load(app.static_folder, app.config['ASSET_DIST_DIR'])
+    app.extensions['asset_manifest'] = manifest
+    send_static_file = app.view_functions['static']
+    # precompressed siblings of each built file, looked up once at startup
+    variants = {
+        built: [(encoding, built + suffix) for encoding, suffix in ENCODINGS
+                if os.path.isfile(os.path.join(app.static_folder, built + suffix))]
+        for built in manifest.built
+    }
+
+    def send(filename, mimetype=None):
+        memory = app.extensions.get('static_cache')
+        if memory is not None:
+            response = memory.send(filename, mimetype)
+            if response is not None:
+                return response
+        if mimetype is None:
+            return send_static_file(filename=filename)
+        return send_from_directory(app.static_folder, filename, mimetype=mimetype)
+
+    def static(filename):
+        if filename not in manifest:
+            return send(filename)
+        for encoding, variant in variants[filename]:
+            if request.accept_encodings[encoding]:
+                response = send(variant, mimetypes.guess_type(filename)[0])
+                response.content_encoding = encoding
+                break
+        else:
+            response = send(filename)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = static
+
+    assets_cli = AppGroup('assets', help='Build static assets.')
+
+    @assets_cli.command('build')
+    def build_command():
+        """Minify, fingerprint and precompress CSS/JS/SVG into the dist folder."""
+        entries = build(app.static_folder, app.config['ASSET_DIST_DIR'])
+        for source, built in sorted(entries.items()):
+            click.echo(f'{source} -> {built}')
+        if brotli is None:
+            click.echo('brotli is not installed: only .gz variants were written')
+
+    app.cli.add_command(assets_cli)
+    return manifest
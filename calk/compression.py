@@ -0,0 +1,276 @@
+"""WSGI middleware that compresses responses for clients that accept it.
+
+Encodings are negotiated from ``Accept-Encoding``: ``gzip`` from the
+standard library always, ``br`` and ``zstd`` when the optional
+``brotli`` / ``zstandard`` packages are installed. Responses are left
+alone when they are already encoded, not a compressible type, smaller
+than ``min_size``, marked ``no-transform``, or have no body (HEAD, 204,
+206, 304).
+
+Responses with a ``Content-Length`` are compressed in one piece.
+Streamed responses (no length, e.g. the CSV/JSONL stream endpoint) are
+compressed incrementally: every chunk of the application's output is
+flushed as its own compressed block, so clients still receive data as
+it is produced.
+
+The ETag of a compressed response gets an ``-<encoding>`` suffix, since
+it is a different representation; the suffix is stripped from
+``If-None-Match`` before the application sees it, so 304s keep working.
+A 304 gets the suffix back only if the client validated the encoded
+representation: a 200 that went out uncompressed (small, not a
+compressible type, already encoded) keeps its plain ETag on the 304.
+Compressed bodies of responses with a strong ETag (the cached per-locale
+pages, versioned assets) are kept in a small LRU cache keyed by
+``(etag, encoding)``, so a hot page is compressed once per encoding.
+"""
+from collections import OrderedDict
+import threading
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_cache_control_header, parse_etags
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+COMPRESSIBLE_TYPES = frozenset({
+    'application/javascript', 'application/json', 'application/x-ndjson',
+    'application/xml', 'image/svg+xml',
+})
+NO_BODY_STATUS = (204, 206, 304)
+
+
+class GzipEncoder:
+    def __init__(self, level: int = 6):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._z.compress(data)
+
+    def flush(self) -> bytes:
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._z.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, level: int = 6):
+        # brotli quality runs 0-11; map the zlib-style 1-9 level onto it
+        self._c = brotli.Compressor(quality=min(11, level + 1))
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level: int = 6):
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+# Content-Encoding -> encoder, in order of preference on equal q-values
+ENCODERS = {}
+if brotli is not None:
+    ENCODERS['br'] = BrotliEncoder
+if zstandard is not None:
+    ENCODERS['zstd'] = ZstdEncoder
+ENCODERS['gzip'] = GzipEncoder
+
+
+def negotiate(accept_encoding: str, encoders=ENCODERS):
+    """The best supported encoding allowed by an ``Accept-Encoding`` value, or ``None``."""
+    accept = parse_accept_header(accept_encoding)
+    best, best_q = None, 0
+    for name in encoders:
+        q = accept[name]
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compressible(mimetype: str) -> bool:
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """Compress the responses of a WSGI application."""
+
+    def __init__(self, app, min_size: int = 500, level: int = 6, cache_size: int = 64,
+                 encoders=None):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.cache_size = cache_size
+        self.encoders = ENCODERS if encoders is None else encoders
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.streamed = 0
+        self.cache_hits = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ.get('REQUEST_METHOD') != 'HEAD':
+            encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''), self.encoders)
+        if encoding is None:
+            return self.app(environ, start_response)
+        suffix = '-' + encoding
+        encoded_tags = ()
+        if 'HTTP_IF_NONE_MATCH' in environ:
+            environ['HTTP_IF_NONE_MATCH'], encoded_tags = _strip_suffix(environ['HTTP_IF_NONE_MATCH'], suffix)
+
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, Headers(headers), exc_info]
+            return lambda data: data  # write() is not supported by this middleware
+
+        # Flask calls start_response before returning the body iterable
+        app_iter = self.app(environ, capture)
+        status, headers, exc_info = captured
+        code = int(status.split(None, 1)[0])
+        if not self._should_compress(code, headers):
+            if code == 304 and _unquoted_etag(headers) in encoded_tags:
+                _suffix_etag(headers, suffix)
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return app_iter
+
+        headers['Content-Encoding'] = encoding
+        vary = headers.get('Vary')
+        headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+        headers.remove('Accept-Ranges')
+        etag = _suffix_etag(headers, suffix)
+        if headers.get('Content-Length') is None:
+            headers.remove('Content-Length')
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            self.streamed += 1
+            return self._stream(app_iter, encoding)
+
+        body = self._compress_body(app_iter, encoding, etag)
+        headers['Content-Length'] = str(len(body))
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        return [body]
+
+    def _should_compress(self, status: int, headers: Headers) -> bool:
+        if status < 200 or status in NO_BODY_STATUS or 'Content-Encoding' in headers:
+            return False
+        if not compressible(headers.get('Content-Type', '').split(';')[0].strip()):
+            return False
+        if parse_cache_control_header(headers.get('Cache-Control')).no_transform:
+            return False
+        length = headers.get('Content-Length', type=int)
+        return length is None or length >= self.min_size
+
+    def _compress_body(self, app_iter, encoding: str, etag) -> bytes:
+        key = (etag, encoding)
+        if etag is not None:
+            with self._lock:
+                body = self._cache.get(key)
+                if body is not None:
+                    self._cache.move_to_end(key)
+                    self.cache_hits += 1
+            if body is not None:
+                _close(app_iter)
+                return body
+        try:
+            data = b''.join(app_iter)
+        finally:
+            _close(app_iter)
+        encoder = self.encoders[encoding](self.level)
+        body = encoder.compress(data) + encoder.finish()
+        with self._lock:
+            self.compressed += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(body)
+            if etag is not None and self.cache_size:
+                self._cache[key] = body
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return body
+
+    def _stream(self, app_iter, encoding: str):
+        encoder = self.encoders[encoding](self.level)
+        try:
+            for chunk in app_iter:
+                if chunk:
+                    out = encoder.compress(chunk) + encoder.flush()
+                    self.bytes_in += len(chunk)
+                    self.bytes_out += len(out)
+                    yield out
+            out = encoder.finish()
+            self.bytes_out += len(out)
+            yield out
+        finally:
+            _close(app_iter)
+
+    def stats(self) -> dict:
+        """Counters for monitoring: responses compressed, streamed, cache hits, bytes."""
+        return {
+            'encodings': list(self.encoders),
+            'compressed': self.compressed,
+            'streamed': self.streamed,
+            'cache_hits': self.cache_hits,
+            'cache_size': len(self._cache),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+        }
+
+
+def _suffix_etag(headers: Headers, suffix: str):
+    """Mark the ETag as belonging to the encoded representation; return it."""
+    etag = headers.get('ETag')
+    if not etag:
+        return None
+    weak = etag.startswith('W/')
+    value = etag[2:] if weak else etag
+    headers['ETag'] = ('W/' if weak else '') + '"' + value.strip('"') + suffix + '"'
+    return None if weak else value.strip('"')
+
+
+def _unquoted_etag(headers: Headers):
+    etag = headers.get('ETag')
+    if not etag:
+        return None
+    return (etag[2:] if etag.startswith('W/') else etag).strip('"')
+
+
+def _strip_suffix(if_none_match: str, suffix: str):
+    """``If-None-Match`` without the suffix, and the tags that had it."""
+    etags = parse_etags(if_none_match)
+    if etags.star_tag:
+        return if_none_match, frozenset()
+    strong, weak = etags.as_set(include_weak=False), etags.as_set(include_weak=True)
+    encoded = frozenset(tag[:-len(suffix)] for tag in weak if tag.endswith(suffix))
+    header = ', '.join(
+        ('' if tag in strong else 'W/') + '"' + (tag[:-len(suffix)] if tag.endswith(suffix) else tag) + '"'
+        for tag in weak)
+    return header, encoded
+
+
+def _close(app_iter):
+    close = getattr(app_iter, 'close', None)
+    if close is not None:
+        close()
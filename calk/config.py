@@ -18,3 +18,73 @@ class Config:
         'ka': 'ქართული 🇬🇪',
         'hy': 'Հայերեն 🇦🇲'
     }
+    # Seconds between checks for changed .mo catalogs, which are then
+    # reloaded in the background without a restart; 0 disables
+    CATALOG_RELOAD_INTERVAL = 2.0
+    # Distinct Accept-Language values remembered by locale negotiation
+    LOCALE_CACHE_SIZE = 256
+    # JSON batch API limits
+    API_BATCH_MAX_ITEMS = 10000
+    API_BATCH_MAX_BYTES = 2 * 1024 * 1024
+    # Rows evaluated per chunk by the streaming CSV/JSONL endpoint
+    STREAM_CHUNK_SIZE = 4096
+    # Memoization of pure operations: 0 disables, policy is 'lru' or 'tinylfu'
+    RESULT_CACHE_SIZE = 0
+    RESULT_CACHE_POLICY = 'lru'
+    # Largest estimated cost (see calk.services.cost) run per calculation;
+    # None disables admission control
+    COST_BUDGET = 1000
+    # Process pool for calculations whose estimated cost reaches
+    # OFFLOAD_COST_THRESHOLD: 0 workers disables offloading
+    OFFLOAD_WORKERS = 0
+    OFFLOAD_COST_THRESHOLD = 100
+    OFFLOAD_TIMEOUT = 5.0
+    # Cache the rendered GET page per locale (invalidated when templates or
+    # static files change, checked at most once per interval, and per
+    # locale when its catalog is reloaded)
+    PAGE_CACHE = True
+    PAGE_CACHE_CHECK_INTERVAL = 1.0
+    # Cache-Control policy (see calk.http_cache). Static URLs built by
+    # url_for carry ?v=<content hash>, so they can be cached forever
+    HTTP_CACHE_STATIC = 'public, max-age=31536000, immutable'
+    HTTP_CACHE_STATIC_UNVERSIONED = 'public, max-age=3600'
+    # POST results, errors and responses that set cookies
+    HTTP_CACHE_UNCACHEABLE = 'no-store'
+    # Other GETs: per-endpoint overrides, else the default (None leaves the
+    # response alone); validators let caches revalidate with a 304
+    HTTP_CACHE_DEFAULT = 'no-cache'
+    HTTP_CACHE_CONTROL = {
+        'main.index': 'public, max-age=300',
+        'main.debug_tooltip': 'no-store',
+        'api.calc': 'public, max-age=86400',
+        'api.expr': 'public, max-age=86400',
+    }
+    # Output of 'flask --app calk assets build', relative to the static folder
+    ASSET_DIST_DIR = 'dist'
+    # Serve the static folder from memory (files above the size limits stay
+    # on disk and are sent with send_from_directory)
+    STATIC_MEMORY_CACHE = False
+    STATIC_MEMORY_CACHE_MAX_FILE = 1024 * 1024
+    STATIC_MEMORY_CACHE_MAX_TOTAL = 32 * 1024 * 1024
+    # Response compression (gzip; br / zstd if brotli / zstandard are
+    # installed). Bodies under COMPRESSION_MIN_SIZE bytes are sent as is;
+    # COMPRESSION_CACHE_SIZE compressed bodies with strong ETags are kept
+    COMPRESSION = True
+    COMPRESSION_MIN_SIZE = 500
+    COMPRESSION_LEVEL = 6
+    COMPRESSION_CACHE_SIZE = 64
+    # Directory for compiled Jinja templates shared across workers and
+    # restarts (None disables); WARM_ON_START compiles every template and
+    # renders each locale in create_app, before serving traffic
+    JINJA_BYTECODE_CACHE_DIR = None
+    WARM_ON_START = False
+    # Compiled expressions of /api/v1/expr kept per app (LRU, keyed by the
+    # source's tokens joined by single spaces, so '1 2' and '12' differ)
+    EXPRESSION_CACHE_SIZE = 256
+    # Spread large batch / stream / expression columns over worker threads
+    # (NumPy kernels) and processes (pure-Python kernels); 0 disables.
+    # Inputs under PARALLEL_MIN_ITEMS run inline, chunks are sized to take
+    # about PARALLEL_CHUNK_SECONDS from the measured per-item cost
+    PARALLEL_WORKERS = 0
+    PARALLEL_MIN_ITEMS = 65536
+    PARALLEL_CHUNK_SECONDS = 0.005
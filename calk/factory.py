@@ -0,0 +1,124 @@
+import os
+
+from flask import Flask, current_app, request
+from flask_babel import Babel
+
+from .http_cache import init_app as init_http_cache, mark_locale_negotiated
+
+babel = Babel()
+
+
+def get_locale():
+    # the response now depends on the cookie / Accept-Language header
+    mark_locale_negotiated()
+    locales = current_app.extensions['locales']
+    # Check cookie first
+    lang = request.cookies.get('lang')
+    if lang in locales.supported:
+        return lang
+    # Then check Accept-Language header (memoized per header value)
+    return locales.negotiate(request.headers.get('Accept-Language', ''))
+
+
+def create_app(config_object=None):
+    app = Flask(__name__, template_folder="templates", static_folder="static")
+
+    # Config: defaults first, then the caller's overrides
+    from .config import Config
+    app.config.from_object(Config)
+    if config_object is not None:
+        app.config.from_object(config_object)
+
+    # Initialize extensions
+    babel.init_app(app, locale_selector=get_locale)
+
+    # compiled-template cache shared across workers
+    from .templating import init_app as init_templating
+    init_templating(app)
+
+    # catalogs frozen into lookup tables; gettext in templates and routes
+    from .i18n import init_app as init_i18n
+    init_i18n(app)
+
+    # opt-in memoization of pure operations
+    if app.config['RESULT_CACHE_SIZE']:
+        from .services.cache import ResultCache
+        app.extensions['result_cache'] = ResultCache(
+            app.config['RESULT_CACHE_SIZE'], app.config['RESULT_CACHE_POLICY'])
+
+    # compiled infix expressions
+    from .services.expression import ExpressionCache
+    app.extensions['expressions'] = ExpressionCache(app.config['EXPRESSION_CACHE_SIZE'])
+
+    # warm process pool for CPU-heavy calculations
+    if app.config['OFFLOAD_WORKERS']:
+        from .services.offload import Offloader
+        offloader = Offloader(app.config['OFFLOAD_WORKERS'], app.config['OFFLOAD_COST_THRESHOLD'],
+                              app.config['OFFLOAD_TIMEOUT'])
+        offloader.start()
+        app.extensions['offloader'] = offloader
+
+    # multi-core batch, stream and expression columns
+    if app.config['PARALLEL_WORKERS']:
+        from .services.operations import OPERATIONS
+        from .services.parallel import ParallelEvaluator
+        # one cost estimate per operation and per cached expression
+        app.extensions['parallel'] = ParallelEvaluator(
+            app.config['PARALLEL_WORKERS'], app.config['PARALLEL_CHUNK_SECONDS'],
+            app.config['PARALLEL_MIN_ITEMS'],
+            max_costs=len(OPERATIONS) + app.config['EXPRESSION_CACHE_SIZE'])
+
+    # rendered GET page per locale, with ETags
+    if app.config['PAGE_CACHE']:
+        from .page_cache import PageCache
+        # static files too: the page embeds their ?v= versions
+        watch = [(os.path.join(app.root_path, app.template_folder), ()), (app.static_folder, ())]
+        app.extensions['page_cache'] = PageCache(watch, app.config['PAGE_CACHE_CHECK_INTERVAL'])
+
+    # hot reload of changed .mo catalogs; drops only that locale's pages
+    if app.config['CATALOG_RELOAD_INTERVAL']:
+        from .i18n import CatalogWatcher
+        page_cache = app.extensions.get('page_cache')
+        watcher = CatalogWatcher(app.extensions['catalogs'], app.config['CATALOG_RELOAD_INTERVAL'],
+                                 on_reload=page_cache.invalidate if page_cache is not None else None)
+        watcher.start()
+        app.extensions['catalog_watcher'] = watcher
+
+    # button grids are generated from the operation registry
+    from .services.operations import GROUPS
+    app.jinja_env.globals['operation_groups'] = GROUPS
+
+    # static folder held in memory
+    if app.config['STATIC_MEMORY_CACHE']:
+        from .static_cache import StaticMemoryCache
+        app.extensions['static_cache'] = StaticMemoryCache(
+            app.static_folder, app.config['STATIC_MEMORY_CACHE_MAX_FILE'],
+            app.config['STATIC_MEMORY_CACHE_MAX_TOTAL'])
+
+    # built assets (manifest, precompressed variants) and the build command
+    from .assets import init_app as init_assets
+    init_assets(app)
+
+    # Cache-Control, Vary and validators
+    init_http_cache(app)
+
+    # register blueprints
+    from .routes.main import main_bp
+    from .routes.api import api_bp
+    app.register_blueprint(main_bp)
+    app.register_blueprint(api_bp)
+
+    # compile templates and render every locale before the first request
+    if app.config['WARM_ON_START']:
+        from .templating import warm
+        warm(app)
+
+    # compress responses for clients that accept it
+    if app.config['COMPRESSION']:
+        from .compression import CompressionMiddleware
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app, app.config['COMPRESSION_MIN_SIZE'], app.config['COMPRESSION_LEVEL'],
+            app.config['COMPRESSION_CACHE_SIZE'])
+        app.extensions['compression'] = app.wsgi_app
+
+    return app
@@ -0,0 +1,99 @@
+"""HTTP caching policy: Cache-Control, Vary and validators for every response.
+
+``init_app`` registers one ``after_request`` hook that decides the
+``Cache-Control`` header from the app config, so browsers and an edge
+cache (CDN) can store what is safe to store:
+
+- unsafe methods (POST, ...) and responses that set a cookie or are not
+  successful get ``HTTP_CACHE_UNCACHEABLE`` (``no-store``);
+- static files whose URL carries the content version (``?v=``, added by
+  ``url_for('static', ...)``, or a fingerprinted name from the asset
+  manifest, see ``calk.assets``) get ``HTTP_CACHE_STATIC``, a long-lived
+  immutable policy; unversioned static URLs get ``HTTP_CACHE_STATIC_UNVERSIONED``;
+- other GETs use ``HTTP_CACHE_CONTROL[endpoint]`` or ``HTTP_CACHE_DEFAULT``.
+  A ``None`` policy leaves the response's own header untouched.
+
+Successful dynamic GETs without an ETag get one computed from the body,
+and conditional requests are answered with 304. Responses whose content
+was negotiated by ``get_locale`` (see ``mark_locale_negotiated``) carry
+``Vary: Cookie, Accept-Language``.
+"""
+import hashlib
+import os
+
+from flask import g, request
+
+LOCALE_VARY = ('Cookie', 'Accept-Language')
+CACHEABLE_STATUS = (200, 203, 204, 206, 304)
+
+
+def mark_locale_negotiated():
+    """Record that the current response depends on the negotiated locale."""
+    g.locale_negotiated = True
+
+
+class CachePolicy:
+    """Per-app caching policy; installed by ``init_app``."""
+
+    def __init__(self, app):
+        self.app = app
+        self._versions = {}
+
+    def static_version(self, filename: str):
+        """Short content hash of a static file, or ``None`` if it is missing."""
+        path = os.path.join(self.app.static_folder, filename)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._versions.get(filename)
+        if cached is None or cached[0] != mtime:
+            with open(path, 'rb') as f:
+                cached = (mtime, hashlib.sha256(f.read()).hexdigest()[:12])
+            self._versions[filename] = cached
+        return cached[1]
+
+    def url_defaults(self, endpoint, values):
+        if endpoint == 'static' and 'v' not in values and 'filename' in values:
+            # built assets carry the content hash in their name
+            manifest = self.app.extensions.get('asset_manifest')
+            if manifest and values['filename'] in manifest.entries:
+                values['filename'] = manifest.resolve(values['filename'])
+                return
+            version = self.static_version(values['filename'])
+            if version is not None:
+                values['v'] = version
+
+    def cache_control_for(self, response):
+        config = self.app.config
+        if request.method not in ('GET', 'HEAD'):
+            return config['HTTP_CACHE_UNCACHEABLE']
+        if response.status_code not in CACHEABLE_STATUS or 'Set-Cookie' in response.headers:
+            return config['HTTP_CACHE_UNCACHEABLE']
+        if request.endpoint == 'static':
+            manifest = self.app.extensions.get('asset_manifest')
+            if request.args.get('v') or (manifest and request.view_args['filename'] in manifest):
+                return config['HTTP_CACHE_STATIC']
+            return config['HTTP_CACHE_STATIC_UNVERSIONED']
+        return config['HTTP_CACHE_CONTROL'].get(request.endpoint, config['HTTP_CACHE_DEFAULT'])
+
+    def after_request(self, response):
+        if g.get('locale_negotiated'):
+            response.vary.update(LOCALE_VARY)
+        policy = self.cache_control_for(response)
+        if policy is not None:
+            response.headers['Cache-Control'] = policy
+        if (request.method in ('GET', 'HEAD') and response.status_code == 200
+                and request.endpoint != 'static' and not response.is_streamed
+                and not response.direct_passthrough and response.get_etag()[0] is None):
+            response.add_etag()
+            response.make_conditional(request)
+        return response
+
+
+def init_app(app):
+    policy = CachePolicy(app)
+    app.url_defaults(policy.url_defaults)
+    app.after_request(policy.after_request)
+    app.extensions['http_cache'] = policy
+    return policy
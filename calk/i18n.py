@@ -0,0 +1,240 @@
+"""Translation catalogs frozen into plain lookup tables.
+
+Flask-Babel resolves the catalog for every ``gettext`` call through its
+per-request machinery. The catalogs here are read once, at
+``create_app`` time, from the compiled ``.mo`` files of every supported
+locale into read-only dicts (msgid -> msgstr). Translating is then one
+dict lookup in the table of the already-resolved locale:
+
+- templates get a ``gettext`` bound to the request's locale through a
+  context processor, once per render;
+- routes call ``calk.i18n.gettext``, which binds the translator on the
+  first call of a request and keeps it on ``flask.g``.
+
+Semantics match Flask-Babel's ``gettext``: unknown or untranslated
+msgids come back unchanged, and keyword arguments are %-interpolated.
+
+``CatalogWatcher`` polls the ``.mo`` files in a daemon thread and hot
+swaps a changed catalog: the new table is loaded completely off the
+request path, then installed with a single dict assignment of its
+translator. A request binds its translator once, so it sees either the
+old catalog or the new one, never a mix; a catalog that fails to load
+(e.g. half-written) keeps the old one in place until the next change.
+
+``LocaleNegotiator`` holds the supported locales (``Config.LANGUAGES``)
+for ``get_locale`` and the ``?lang=`` switch, and memoizes
+``Accept-Language`` negotiation: browsers send a handful of distinct
+header values, so each is parsed once and then resolved by a dict lookup.
+"""
+import logging
+import os
+import threading
+from types import MappingProxyType
+import weakref
+
+from babel.messages.mofile import read_mo
+from flask import current_app, g
+from flask_babel import get_locale
+from werkzeug.datastructures import LanguageAccept
+from werkzeug.http import parse_accept_header
+
+EMPTY = MappingProxyType({})
+
+logger = logging.getLogger(__name__)
+
+
+def load_catalog(path: str) -> MappingProxyType:
+    """msgid -> msgstr for the translated singular messages of one ``.mo`` file."""
+    with open(path, 'rb') as f:
+        catalog = read_mo(f)
+    return MappingProxyType({
+        message.id: message.string for message in catalog
+        if message.id and isinstance(message.id, str) and message.string
+    })
+
+
+def _translator(table):
+    def gettext(string, **variables):
+        s = table.get(string, string)
+        return s % variables if variables else s
+    return gettext
+
+
+class Catalogs:
+    """Frozen translation tables and bound translators for a set of locales."""
+
+    def __init__(self, directories, locales, domain: str = 'messages'):
+        self.directories = list(directories)
+        self.locales = tuple(locales)
+        self.domain = domain
+        self.tables = {}
+        self.translators = {}
+        self._fallback = _translator(EMPTY)
+        self.reload()
+
+    def paths(self, locale: str) -> list:
+        """The ``.mo`` files of ``locale`` that exist, in directory order."""
+        paths = (os.path.join(d, locale, 'LC_MESSAGES', self.domain + '.mo') for d in self.directories)
+        return [path for path in paths if os.path.isfile(path)]
+
+    def load(self, locale: str) -> MappingProxyType:
+        """Read the table of ``locale``; later directories override earlier ones."""
+        table = {}
+        for path in self.paths(locale):
+            table.update(load_catalog(path))
+        return MappingProxyType(table)
+
+    def install(self, locale: str, table):
+        # the translators entry is the swap point read by requests
+        self.tables[locale] = table
+        self.translators[locale] = _translator(table)
+
+    def reload(self):
+        """Read every locale's catalog again."""
+        for locale in self.locales:
+            self.install(locale, self.load(locale))
+
+    def translator(self, locale: str):
+        """``gettext(string, **variables)`` for one locale."""
+        return self.translators.get(locale, self._fallback)
+
+    def gettext(self, locale: str, string: str, **variables) -> str:
+        return self.translator(locale)(string, **variables)
+
+
+class CatalogWatcher:
+    """Reload the catalog of a locale when its ``.mo`` files change.
+
+    ``poll()`` checks every locale once; ``start()`` runs it every
+    ``interval`` seconds in a daemon thread, which ends with ``stop()``
+    or when the watcher is garbage collected. ``on_reload(locale)`` is
+    called after a new catalog is installed.
+    """
+
+    def __init__(self, catalogs: Catalogs, interval: float = 2.0, on_reload=None):
+        self.catalogs = catalogs
+        self.interval = interval
+        self.on_reload = on_reload
+        self._fingerprints = {locale: self._fingerprint(locale) for locale in catalogs.locales}
+        self._stop = threading.Event()
+        self._thread = None
+        self.reloads = 0
+        self.errors = 0
+
+    def _fingerprint(self, locale: str) -> tuple:
+        files = []
+        for path in self.catalogs.paths(locale):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(files)
+
+    def poll(self) -> list:
+        """Reload changed catalogs; return the locales that were swapped in."""
+        reloaded = []
+        for locale in self.catalogs.locales:
+            fingerprint = self._fingerprint(locale)
+            if fingerprint == self._fingerprints.get(locale):
+                continue
+            self._fingerprints[locale] = fingerprint
+            try:
+                table = self.catalogs.load(locale)
+            except Exception:
+                self.errors += 1
+                logger.exception('cannot load the %s catalog; keeping the previous one', locale)
+                continue
+            self.catalogs.install(locale, table)
+            self.reloads += 1
+            reloaded.append(locale)
+            if self.on_reload is not None:
+                self.on_reload(locale)
+        return reloaded
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=_watch, args=(weakref.ref(self), self._stop,
+                                                                 self.interval),
+                                            name='catalog-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        """Counters for monitoring: reloads, errors."""
+        return {'reloads': self.reloads, 'errors': self.errors}
+
+
+def _watch(ref, stop, interval):
+    # holds only a weak reference, so an unused app's watcher can be collected
+    while not stop.wait(interval):
+        watcher = ref()
+        if watcher is None:
+            return
+        watcher.poll()
+        del watcher
+
+
+class LocaleNegotiator:
+    """Supported locales plus a bounded ``Accept-Language`` -> locale cache."""
+
+    def __init__(self, locales, default: str = 'en', maxsize: int = 256):
+        self.locales = tuple(locales)
+        self.supported = frozenset(self.locales)
+        self.default = default
+        self.maxsize = maxsize
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def negotiate(self, accept_language: str) -> str:
+        """Best supported locale for an ``Accept-Language`` value, else the default.
+
+        ``maxsize <= 0`` disables the cache.
+        """
+        locale = self._cache.get(accept_language)
+        if locale is not None:
+            self.hits += 1
+            return locale
+        self.misses += 1
+        accept = parse_accept_header(accept_language, LanguageAccept)
+        locale = accept.best_match(self.locales) or self.default
+        if self.maxsize <= 0:
+            return locale
+        with self._lock:
+            while len(self._cache) >= self.maxsize:
+                # evict the oldest entry; header values are few, so FIFO is enough
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[accept_language] = locale
+        return locale
+
+    def stats(self) -> dict:
+        """Counters for monitoring: hits, misses, size."""
+        return {'size': len(self._cache), 'hits': self.hits, 'misses': self.misses}
+
+
+def current_translator():
+    """The translator of the current request's locale, bound once per request."""
+    translate = g.get('translate')
+    if translate is None:
+        translate = g.translate = current_app.extensions['catalogs'].translator(str(get_locale()))
+    return translate
+
+
+def gettext(string: str, **variables) -> str:
+    """Drop-in for ``flask_babel.gettext`` backed by the frozen catalogs."""
+    return current_translator()(string, **variables)
+
+
+def init_app(app):
+    catalogs = Catalogs(app.config['BABEL_TRANSLATION_DIRECTORIES'].split(';'),
+                        app.config['LANGUAGES'], app.config.get('BABEL_DOMAIN', 'messages'))
+    app.extensions['catalogs'] = catalogs
+    app.extensions['locales'] = LocaleNegotiator(
+        app.config['LANGUAGES'], app.config['BABEL_DEFAULT_LOCALE'], app.config['LOCALE_CACHE_SIZE'])
+    app.jinja_env.globals['gettext'] = gettext
+    app.context_processor(lambda: {'gettext': current_translator()})
+    return catalogs
@@ -0,0 +1,138 @@
+"""Cache of fully rendered pages with strong ETags.
+
+The GET page only depends on the resolved locale (and the tooltip flag
+of ``/debug/tooltip``), so it is rendered once per key and the bytes are
+served from memory afterwards. Each entry carries a strong ETag (a hash
+of the body) for conditional requests.
+
+Entries are dropped when any watched file changes (the app watches the
+templates and the static files whose versions the page embeds). The
+check compares file mtimes and runs at most once per ``check_interval``
+seconds, so a cache hit normally costs a dict lookup.
+``invalidate(locale)`` drops the entries of one locale; the catalog
+watcher (``calk.i18n.CatalogWatcher``) calls it when a catalog changes.
+
+A render can still be in flight when its entry is dropped, with the
+old translator or templates. Callers read ``generation(locale)`` before
+rendering and pass it to ``put``, which discards the page if the
+entries of that locale were dropped in between.
+"""
+from dataclasses import dataclass
+import hashlib
+import os
+import threading
+import time
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    """A rendered page; ``parts`` optionally holds it pre-split for stitching."""
+
+    body: bytes
+    etag: str
+    parts: tuple = ()
+
+
+class PageCache:
+    """Thread-safe map of ``(locale, *variant)`` keys to rendered pages.
+
+    ``watch`` is a sequence of ``(directory, suffixes)`` pairs; files in
+    those trees ending with one of ``suffixes`` (all files for an empty
+    tuple) are checked for changes. ``on_change`` is called after the
+    cache is cleared because a watched file changed.
+    """
+
+    def __init__(self, watch=(), check_interval: float = 1.0, on_change=None):
+        self.watch = tuple(watch)
+        self.check_interval = check_interval
+        self.on_change = on_change
+        self._pages = {}
+        self._lock = threading.Lock()
+        # bumped when every entry, or the entries of one locale, are dropped
+        self._generation = 0
+        self._generations = {}
+        self._fingerprint = self._scan()
+        self._checked_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _scan(self) -> tuple:
+        files = []
+        for directory, suffixes in self.watch:
+            for root, _dirs, names in os.walk(directory):
+                for name in names:
+                    if not suffixes or name.endswith(tuple(suffixes)):
+                        path = os.path.join(root, name)
+                        try:
+                            files.append((path, os.stat(path).st_mtime_ns))
+                        except OSError:
+                            pass
+        return tuple(sorted(files))
+
+    def check(self, force: bool = False) -> bool:
+        """Clear the cache if a watched file changed; return whether it did."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        fingerprint = self._scan()
+        if fingerprint == self._fingerprint:
+            return False
+        with self._lock:
+            self._fingerprint = fingerprint
+            self._pages.clear()
+            self._generation += 1
+            self.reloads += 1
+        if self.on_change is not None:
+            self.on_change()
+        return True
+
+    def get(self, key):
+        """The cached page for ``key``, or ``None``."""
+        self.check()
+        page = self._pages.get(key)
+        if page is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return page
+
+    def generation(self, locale) -> tuple:
+        """Token that changes whenever the entries of ``locale`` are dropped."""
+        return self._generation, self._generations.get(locale, 0)
+
+    def put(self, key, body: bytes, generation: tuple | None = None, parts: tuple = ()) -> CachedPage:
+        """Cache ``body`` (and its ``parts``) under ``key`` and return the page.
+
+        With ``generation`` (read before rendering), a page rendered
+        before its locale was invalidated is returned but not stored.
+        """
+        page = CachedPage(body, hashlib.sha256(body).hexdigest()[:32], tuple(parts))
+        with self._lock:
+            if generation is None or generation == self.generation(key[0]):
+                self._pages[key] = page
+        return page
+
+    def invalidate(self, locale=None):
+        """Drop the entries of one locale, or every entry."""
+        with self._lock:
+            if locale is None:
+                self._pages.clear()
+                self._generation += 1
+            else:
+                for key in [k for k in self._pages if k[0] == locale]:
+                    del self._pages[key]
+                self._generations[locale] = self._generations.get(locale, 0) + 1
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def stats(self) -> dict:
+        """Counters for monitoring: hits, misses, reloads, size."""
+        return {
+            'size': len(self._pages),
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads,
+        }
@@ -1,3 +1,30 @@
-from flask import Blueprint
+from flask import Blueprint, current_app
+
+from ..services import cost
+from ..services.operations import get_operation
 
 __all__ = ['main_bp']
+
+
+def lookup_operation(name):
+    """Registry lookup that goes through the app's result cache when enabled."""
+    cache = current_app.extensions.get('result_cache')
+    return cache.get_operation(name) if cache is not None else get_operation(name)
+
+
+def check_cost(operation, a=0.0, b=0.0):
+    """Reject work above the app's COST_BUDGET before it starts.
+
+    Raises ``cost.CostLimitExceeded`` (a ``CalculatorError`` with code
+    ``too_expensive``).
+    """
+    cost.check(operation, a, b, current_app.config['COST_BUDGET'])
+
+
+def run_operation(operation, a=0.0, b=0.0):
+    """Check the cost, then run inline or on the app's offload pool."""
+    check_cost(operation, a, b)
+    offloader = current_app.extensions.get('offloader')
+    if offloader is not None:
+        return offloader.call(operation, a, b)
+    return operation(a, b)
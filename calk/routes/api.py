@@ -0,0 +1,322 @@
+"""JSON API for machine clients.
+
+These endpoints never render templates or translate messages: they parse
+the operands, dispatch through the operation registry (or the vectorized
+``services.batch`` path for ``/batch``) and return a small JSON body.
+Error messages are the untranslated English text; clients should rely
+on the stable ``code``.
+"""
+import io
+import json
+from itertools import chain
+
+import numpy as np
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+from ..services import batch, blocked, stream
+from ..services.expression import ExpressionError
+from ..services.operations import ERROR_MESSAGES, get_operation
+from . import lookup_operation, run_operation
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+API_ERROR_MESSAGES = {
+    **ERROR_MESSAGES,
+    'invalid_input': 'Invalid input',
+    'too_many_items': 'Too many items in batch',
+    'payload_too_large': 'Request body is too large',
+}
+
+# Calculation errors are 422 unless listed here
+_ERROR_STATUS = {'timeout': 504, 'offload_failed': 503}
+
+
+def _evaluator():
+    """The app's parallel evaluator when enabled, else the ``batch`` module."""
+    return current_app.extensions.get('parallel') or batch
+
+
+def _error(op, code, status, message=None, key='op'):
+    body = {key: op, 'error': {'code': code, 'message': message or API_ERROR_MESSAGES[code]}}
+    return jsonify(body), status
+
+
+def _parse_operand(value) -> float:
+    """Parse a JSON number or numeric string; raise ValueError otherwise."""
+    if isinstance(value, bool) or value is None:
+        raise ValueError(value)
+    if isinstance(value, str):
+        value = value.strip()
+    return float(value)
+
+
+def _parse_column(values):
+    """Parse a JSON column, or a single operand for every row.
+
+    Returns the float64 array and the mask of the elements that are not
+    operands (``None`` if all are); those elements are 0 and must be
+    reported as ``invalid_input``. A bad single operand or a nested list
+    raises ValueError.
+    """
+    if not isinstance(values, list):
+        return np.asarray(_parse_operand(values)), None
+    # the usual case: plain JSON numbers (bool is an int subclass, so no isinstance)
+    if all(type(value) in (int, float) for value in values):
+        try:
+            return np.array(values, dtype=np.float64), None
+        except OverflowError:
+            pass
+    column, invalid = np.zeros(len(values)), np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        if isinstance(value, (list, dict)):
+            raise ValueError('column must be a flat list')
+        try:
+            column[i] = _parse_operand(value)
+        except (TypeError, ValueError, OverflowError):
+            invalid[i] = True
+    return column, invalid if invalid.any() else None
+
+
+@api_bp.route('/calc', methods=['GET', 'POST'])
+def calc():
+    if request.method == 'POST':
+        params = request.get_json(silent=True) if request.is_json else request.form
+    else:
+        params = request.args
+    if not hasattr(params, 'get'):
+        return _error(None, 'invalid_input', 400)
+
+    op = params.get('op')
+    operation = lookup_operation(op) if isinstance(op, str) else None
+    if operation is None:
+        return _error(op, 'unknown_operation', 400)
+
+    operands = []
+    for name in ('a', 'b')[:operation.arity]:
+        try:
+            operands.append(_parse_operand(params.get(name)))
+        except (TypeError, ValueError):
+            return _error(op, 'invalid_input', 400, f'Invalid input for {name.upper()}')
+
+    result, code = operation.evaluate(*operands, runner=run_operation)
+    if code is not None:
+        return _error(op, code, _ERROR_STATUS.get(code, 422))
+    return jsonify({'op': op, 'result': batch.json_number(result)})
+
+
+@api_bp.route('/expr', methods=['GET', 'POST'])
+def expr():
+    """Evaluate an infix expression such as ``sqrt(a^2 + b^2) * sin(30)``.
+
+    The expression is ``expr``; variables are the other query / form
+    parameters, or ``{"expr": ..., "vars": {...}}`` in a JSON body.
+    Compiled expressions are cached per app, so repeating one with other
+    variable values only runs the arithmetic. ``explain=1`` adds the
+    optimized evaluation plan to the response.
+
+    In a JSON body, variables may also be lists (columns of equal
+    length, mixed with scalars); the expression is then evaluated over
+    them in blocks and the response has parallel ``results`` and
+    ``errors`` arrays like the columnar ``/batch`` form.
+    """
+    if request.method == 'POST' and request.is_json:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return _error(None, 'invalid_input', 400, key='expr')
+        source, bindings, explain = body.get('expr'), body.get('vars', {}), body.get('explain')
+    else:
+        params = request.form if request.method == 'POST' else request.args
+        source, bindings, explain = params.get('expr'), params, params.get('explain')
+    if not isinstance(source, str) or not hasattr(bindings, 'get'):
+        return _error(None, 'invalid_input', 400, key='expr')
+
+    try:
+        compiled = current_app.extensions['expressions'].get(source)
+    except ExpressionError as e:
+        return _error(source, e.code, 400, f'Invalid expression: {e}', key='expr')
+
+    if any(isinstance(bindings.get(name), list) for name in compiled.variables):
+        return _expr_columns(source, compiled, bindings)
+
+    values = {}
+    for name in compiled.variables:
+        if bindings.get(name) is None:
+            return _error(source, 'unbound_variable', 400, f'No value for variable {name}', key='expr')
+        try:
+            values[name] = _parse_operand(bindings.get(name))
+        except (TypeError, ValueError):
+            return _error(source, 'invalid_input', 400, f'Invalid input for {name}', key='expr')
+
+    result, code = compiled.evaluate(values)
+    if code is not None:
+        return _error(source, code, _ERROR_STATUS.get(code, 422), key='expr')
+    body = {'expr': source, 'result': batch.json_number(result)}
+    if explain in (True, '1', 'true'):
+        body['plan'] = compiled.explain().splitlines()
+    return jsonify(body)
+
+
+def _expr_columns(source, compiled, bindings):
+    columns, invalid = {}, []
+    for name in compiled.variables:
+        if bindings.get(name) is None:
+            return _error(source, 'unbound_variable', 400, f'No value for variable {name}', key='expr')
+        try:
+            columns[name], mask = _parse_column(bindings[name])
+        except (TypeError, ValueError, OverflowError):
+            return _error(source, 'invalid_input', 400, f'Invalid input for {name}', key='expr')
+        if mask is not None:
+            invalid.append(mask)
+        if columns[name].size > current_app.config['API_BATCH_MAX_ITEMS']:
+            return _error(source, 'too_many_items', 413, key='expr')
+    try:
+        parallel = current_app.extensions.get('parallel')
+        if parallel is not None:
+            res = parallel.evaluate_expression(compiled, columns)
+        else:
+            res = blocked.evaluate(compiled, columns)
+    except ValueError:
+        return _error(source, 'invalid_input', 400, 'Columns must have the same length', key='expr')
+    codes = _codes(res)
+    for mask in invalid:
+        for i in np.flatnonzero(mask):
+            codes[i] = 'invalid_input'
+    results = [None if code else batch.json_number(value) for value, code in zip(res.values.tolist(), codes)]
+    return jsonify({'expr': source, 'results': results, 'errors': codes})
+
+
+def _codes(res) -> list:
+    """Per-element error code (or None) for a BatchResult."""
+    codes = [None] * res.values.size
+    for code, mask in res.errors.items():
+        for i in np.flatnonzero(mask):
+            codes[i] = code
+    return codes
+
+
+def _batch_items(items, max_items):
+    if not isinstance(items, list):
+        return _error(None, 'invalid_input', 400)
+    if len(items) > max_items:
+        return _error(None, 'too_many_items', 413)
+
+    n = len(items)
+    names = [None] * n
+    a, b = np.zeros(n), np.zeros(n)
+    invalid = set()
+    for i, item in enumerate(items):
+        op = item.get('op') if isinstance(item, dict) else None
+        operation = get_operation(op) if isinstance(op, str) else None
+        if operation is None:
+            continue
+        names[i] = op
+        try:
+            for column, key in zip((a, b), ('a', 'b')[:operation.arity]):
+                column[i] = _parse_operand(item.get(key))
+        except (TypeError, ValueError):
+            invalid.add(i)
+
+    res = _evaluator().evaluate_many(names, a, b, current_app.config['COST_BUDGET'])
+    results = []
+    for i, (value, code) in enumerate(zip(res.values.tolist(), _codes(res))):
+        if i in invalid:
+            code = 'invalid_input'
+        if code is None:
+            results.append({'result': batch.json_number(value)})
+        else:
+            results.append({'error': {'code': code, 'message': API_ERROR_MESSAGES[code]}})
+    return jsonify({'results': results})
+
+
+def _batch_columns(body, max_items):
+    ops = body.get('op')
+    try:
+        (a, invalid_a), (b, invalid_b) = _parse_column(body.get('a', 0.0)), _parse_column(body.get('b', 0.0))
+        if isinstance(ops, list):
+            a, b = np.broadcast_to(a, len(ops)), np.broadcast_to(b, len(ops))
+        a, b = np.broadcast_arrays(a, b)
+    except (TypeError, ValueError, OverflowError):
+        return _error(None, 'invalid_input', 400)
+    if a.ndim != 1:
+        return _error(None, 'invalid_input', 400)
+    if a.size > max_items:
+        return _error(None, 'too_many_items', 413)
+
+    if isinstance(ops, list):
+        names = [op if isinstance(op, str) else None for op in ops]
+        res = _evaluator().evaluate_many(names, a, b, current_app.config['COST_BUDGET'])
+    elif isinstance(ops, str):
+        res = _evaluator().evaluate(ops, a, b, current_app.config['COST_BUDGET'])
+    else:
+        return _error(None, 'unknown_operation', 400)
+
+    codes = _codes(res)
+    for mask in (invalid_a, invalid_b):
+        if mask is not None:
+            for i in np.flatnonzero(np.broadcast_to(mask, a.shape)):
+                codes[i] = 'invalid_input'
+    results = [None if code else batch.json_number(value) for value, code in zip(res.values.tolist(), codes)]
+    return jsonify({'op': ops, 'results': results, 'errors': codes})
+
+
+@api_bp.route('/batch', methods=['POST'])
+def batch_calc():
+    """Evaluate many operations in one request.
+
+    Accepts either ``{"items": [{"op", "a", "b"}, ...]}`` (or a bare list
+    of items) and answers with one result/error object per item, or
+    columnar ``{"op": name | [names], "a": [...], "b": [...]}`` and
+    answers with parallel ``results`` and ``errors`` arrays.
+    """
+    max_bytes = current_app.config['API_BATCH_MAX_BYTES']
+    max_items = current_app.config['API_BATCH_MAX_ITEMS']
+    if request.content_length is not None and request.content_length > max_bytes:
+        return _error(None, 'payload_too_large', 413)
+    raw = request.stream.read(max_bytes + 1)
+    if len(raw) > max_bytes:
+        return _error(None, 'payload_too_large', 413)
+    try:
+        body = json.loads(raw)
+    except ValueError:
+        return _error(None, 'invalid_input', 400)
+
+    if isinstance(body, list):
+        return _batch_items(body, max_items)
+    if not isinstance(body, dict):
+        return _error(None, 'invalid_input', 400)
+    if 'items' in body:
+        return _batch_items(body['items'], max_items)
+    return _batch_columns(body, max_items)
+
+
+@api_bp.route('/stream', methods=['POST'])
+def stream_calc():
+    """Evaluate an uploaded CSV or JSONL body and stream the result back.
+
+    The format is taken from ``?format=csv|jsonl`` or the Content-Type.
+    The body is read incrementally and evaluated ``STREAM_CHUNK_SIZE``
+    rows at a time; the response has no Content-Length and is sent with
+    chunked transfer encoding.
+    """
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'jsonl' if request.mimetype in ('application/x-ndjson', 'application/jsonl') else 'csv'
+    if fmt not in ('csv', 'jsonl'):
+        return _error(None, 'invalid_input', 400, 'Unsupported stream format')
+
+    lines = io.TextIOWrapper(io.BufferedReader(request.stream), encoding='utf-8', newline='')
+    chunk_size = current_app.config['STREAM_CHUNK_SIZE']
+    budget = current_app.config['COST_BUDGET']
+    if fmt == 'csv':
+        output = stream.evaluate_csv(lines, chunk_size, budget, _evaluator())
+        mimetype = 'text/csv'
+    else:
+        output = stream.evaluate_jsonl(lines, chunk_size, budget, _evaluator())
+        mimetype = 'application/x-ndjson'
+
+    # Pull the first chunk now so header errors still get a 400
+    try:
+        first = next(output, '')
+    except (stream.StreamFormatError, UnicodeDecodeError) as e:
+        return _error(None, 'invalid_input', 400, str(e))
+    return Response(stream_with_context(chain([first], output)), mimetype=mimetype)
@@ -1,31 +1,101 @@
-from flask import Blueprint, render_template, request, redirect, url_for
-from flask_babel import gettext, get_locale
+from flask import Blueprint, current_app, g, render_template, request, redirect, url_for
+from markupsafe import Markup
+from flask_babel import get_locale
 
-from ..services import calculator_service as svc
+from ..i18n import gettext
+from ..services.operations import ERROR_MESSAGES
+from . import lookup_operation, run_operation
 
 main_bp = Blueprint('main', __name__)
 
+# Stands in for the result region in the cached per-locale page shell
+RESULT_PLACEHOLDER = '<!--calk:result-region-->'
+
+
+def _cacheable(cache, current_locale) -> tuple:
+    """Generation of the locale's cache entries, read before rendering one.
+
+    The translator bound so far in this request may predate a catalog
+    reload; it is dropped, so the render binds the one installed now.
+    """
+    generation = cache.generation(current_locale)
+    g.pop('translate', None)
+    return generation
+
+
+def render_page(current_locale, force_tooltip=False):
+    """The GET page for a locale, from the app's page cache when enabled.
+
+    Answers ``If-None-Match`` with 304 when the ETag matches.
+    """
+    cache = current_app.extensions.get('page_cache')
+    if cache is None:
+        return render_template('index.html', result=None, error=None, current_lang=current_locale,
+                               force_tooltip=force_tooltip)
+    key = (current_locale, force_tooltip)
+    page = cache.get(key)
+    if page is None:
+        generation = _cacheable(cache, current_locale)
+        body = render_template('index.html', result=None, error=None, current_lang=current_locale,
+                               force_tooltip=force_tooltip)
+        page = cache.put(key, body.encode('utf-8'), generation)
+    response = current_app.response_class(page.body, mimetype='text/html')
+    response.set_etag(page.etag)
+    return response.make_conditional(request)
+
+
+def render_shell(cache, current_locale):
+    """The cached page shell of a locale; its ``parts`` are the halves
+    before and after the result region, split once when it is rendered."""
+    key = (current_locale, 'shell')
+    shell = cache.get(key)
+    if shell is None:
+        generation = _cacheable(cache, current_locale)
+        body = render_template('index.html', result_region=Markup(RESULT_PLACEHOLDER),
+                               current_lang=current_locale).encode('utf-8')
+        head, _, tail = body.partition(RESULT_PLACEHOLDER.encode('ascii'))
+        shell = cache.put(key, body, generation, parts=(head, tail))
+    return shell
+
+
+def render_result(current_locale, result=None, error=None):
+    """The page with a calculation result or error.
+
+    With the page cache enabled, everything but the result region is
+    rendered once per locale as a shell; each call renders only
+    ``_result.html`` and stitches it in between the two halves of the
+    shell, without copying them into one body.
+    """
+    cache = current_app.extensions.get('page_cache')
+    if cache is None:
+        return render_template('index.html', result=result, error=error, current_lang=current_locale)
+    head, tail = render_shell(cache, current_locale).parts
+    region = render_template('_result.html', result=result, error=error).encode('utf-8')
+    return current_app.response_class([head, region, tail], mimetype='text/html')
+
 
 @main_bp.route('/debug/tooltip', methods=['GET'])
 def debug_tooltip():
     """Debug endpoint to show tooltip - always displays it regardless of localStorage"""
     current_locale = str(get_locale())
     # Force tooltip to show by passing a flag
-    return render_template('index.html', result=None, error=None, current_lang=current_locale, force_tooltip=True)
+    return render_page(current_locale, force_tooltip=True)
 
 
 @main_bp.route('/', methods=['GET', 'POST'])
 def index():
     # Handle language selection
     lang = request.args.get('lang')
-    if lang and lang in ['en', 'ru', 'fr', 'de', 'es', 'it', 'zh', 'ka', 'hy']:
+    if lang and lang in current_app.extensions['locales'].supported:
         response = redirect(url_for('main.index'))
         response.set_cookie('lang', lang, max_age=60*60*24*365, path='/')
         return response
     
     # Get current locale at the start and convert to string
     current_locale = str(get_locale())
-    
+    if request.method == 'GET':
+        return render_page(current_locale)
+
     result = None
     error = None
     op = None
@@ -40,79 +110,21 @@ def index():
             a = float(a_raw) if a_raw != '' else 0.0
         except ValueError:
             error = gettext('Invalid input for A')
-            return render_template('index.html', result=result, error=error, current_lang=current_locale)
+            return render_result(current_locale, result, error)
 
         try:
             b = float(b_raw) if b_raw != '' else 0.0
         except ValueError:
             error = gettext('Invalid input for B')
-            return render_template('index.html', result=result, error=error, current_lang=current_locale)
+            return render_result(current_locale, result, error)
 
-        try:
-            # Basic operations
-            if op == 'add':
-                result = svc.add(a, b)
-            elif op == 'sub':
-                result = svc.sub(a, b)
-            elif op == 'mul':
-                result = svc.mul(a, b)
-            elif op == 'div':
-                result = svc.div(a, b)
-            elif op == 'square':
-                result = svc.square(a)
-            elif op == 'sqrt':
-                result = svc.sqrt(a)
-            # Engineering functions (single operand)
-            elif op == 'sin':
-                result = svc.sin(a, in_degrees=True)
-            elif op == 'cos':
-                result = svc.cos(a, in_degrees=True)
-            elif op == 'tan':
-                result = svc.tan(a, in_degrees=True)
-            elif op == 'log':
-                result = svc.log10(a)
-            elif op == 'ln':
-                result = svc.ln(a)
-            elif op == 'exp':
-                result = svc.exp(a)
-            elif op == 'factorial':
-                result = svc.factorial(a)
-            elif op == 'reciprocal':
-                result = svc.reciprocal(a)
-            elif op == 'percent':
-                result = svc.percent(a)
-            elif op == 'negate':
-                result = svc.negate(a)
-            # Two-operand engineering
-            elif op == 'power':
-                result = svc.power(a, b)
-            elif op == 'log_base':
-                result = svc.log(a, b)
-            # Constants
-            elif op == 'pi':
-                result = svc.get_pi()
-            elif op == 'e':
-                result = svc.get_e()
-            else:
-                error = gettext('Unknown operation')
-        except svc.DivisionByZeroError:
-            error = gettext('Cannot divide by zero. Please check your values.')
-        except svc.CalculatorError as e:
-            # Translate specific error messages
-            error_msg = str(e)
-            if 'sqrt of negative' in error_msg:
-                error = gettext('Cannot take square root of a negative number.')
-            elif 'logarithm of non-positive' in error_msg:
-                error = gettext('Logarithm is only defined for positive numbers.')
-            elif 'factorial of negative' in error_msg:
-                error = gettext('Factorial is only defined for non-negative integers.')
-            elif 'factorial of non-integer' in error_msg:
-                error = gettext('Factorial requires a whole number (integer).')
-            elif 'invalid logarithm base' in error_msg:
-                error = gettext('Invalid logarithm base. Must be positive and not equal to 1.')
-            else:
-                error = str(e)
-        except Exception:
-            error = gettext('Calculation error. Please check your input and try again.')
-
-    return render_template('index.html', result=result, error=error, current_lang=current_locale)
+        operation = lookup_operation(op)
+        if operation is None:
+            error = gettext('Unknown operation')
+        else:
+            # the same error codes as /api/v1/calc, translated
+            result, code = operation.evaluate(a, b, runner=run_operation)
+            if code is not None:
+                error = gettext(ERROR_MESSAGES[code])
+
+    return render_result(current_locale, result, error)
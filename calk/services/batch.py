@@ -0,0 +1,339 @@
+"""Vectorized counterpart of ``calculator_service`` backed by NumPy.
+
+Every function here mirrors the scalar function of the same name but
+accepts NumPy arrays (or any buffer-protocol / sequence input) and
+evaluates the whole column in one call. Domain errors do not raise:
+they are reported as per-element boolean masks keyed by an error code,
+and the corresponding result slots are set to NaN.
+
+Error codes:
+
+- ``division_by_zero``  - div/reciprocal by zero, zero to a negative power
+- ``sqrt_negative``     - sqrt of a negative number
+- ``log_non_positive``  - logarithm of a non-positive number
+- ``log_invalid_base``  - logarithm base <= 0 or == 1
+- ``factorial_invalid`` - factorial of a negative or non-integer number
+- ``overflow``          - result does not fit in a float
+- ``domain_error``      - any other undefined result (sin(inf), (-8)^(1/3))
+
+``evaluate`` and ``evaluate_many`` dispatch by operation name through the
+registry in ``services.operations`` and may additionally report
+``unknown_operation``, ``calculation_error`` and, for operations without a
+vectorized kernel, any other code of that operation (e.g. ``gamma_pole``)
+or ``too_expensive`` for rows whose estimated cost is above ``max_cost``.
+"""
+from dataclasses import dataclass, field
+import math as _math
+
+import numpy as np
+
+from . import calculator_service as svc
+from .operations import get_operation
+
+ERROR_CODES = (
+    'division_by_zero',
+    'sqrt_negative',
+    'log_non_positive',
+    'log_invalid_base',
+    'factorial_invalid',
+    'overflow',
+    'domain_error',
+    'unknown_operation',
+    'calculation_error',
+    'gamma_pole',
+    'too_expensive',
+)
+
+_FACTORIAL_TABLE = np.array(svc.FACTORIAL_TABLE)
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    """Result column plus one boolean mask per error code that occurred."""
+
+    values: np.ndarray
+    errors: dict = field(default_factory=dict)
+
+    @property
+    def ok(self) -> np.ndarray:
+        """Mask of elements that were computed without a domain error."""
+        mask = np.ones(self.values.shape, dtype=bool)
+        for err in self.errors.values():
+            mask &= ~err
+        return mask
+
+    @property
+    def error_count(self) -> int:
+        return int(self.values.size - np.count_nonzero(self.ok))
+
+    def error_at(self, index) -> str | None:
+        """Return the error code for one element, or None if it succeeded."""
+        for code, mask in self.errors.items():
+            if mask[index]:
+                return code
+        return None
+
+
+def json_number(x: float):
+    """JSON has no inf/nan literals, so those are returned as strings."""
+    if isinstance(x, int):
+        return x
+    return x if _math.isfinite(x) else str(x)
+
+
+def _as_array(x) -> np.ndarray:
+    return np.asarray(x, dtype=np.float64)
+
+
+def _operands(a, b):
+    return np.broadcast_arrays(_as_array(a), _as_array(b))
+
+
+def _finish(values: np.ndarray, masks: dict) -> BatchResult:
+    """Drop empty masks, blank out failed slots, and wrap the result.
+
+    Masks are applied in insertion order and an element is only reported
+    under the first code that claims it, matching the scalar functions,
+    which raise on the first failed check.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    claimed = np.zeros(values.shape, dtype=bool)
+    errors = {}
+    for code, mask in masks.items():
+        mask = np.broadcast_to(mask, values.shape) & ~claimed
+        if mask.any():
+            errors[code] = mask
+            claimed |= mask
+    if claimed.any():
+        values = np.where(claimed, np.nan, values)
+    return BatchResult(values, errors)
+
+
+def _overflowed(values: np.ndarray, *inputs) -> np.ndarray:
+    """Infinite results computed from finite inputs."""
+    mask = np.isinf(values)
+    for x in inputs:
+        mask &= np.isfinite(x)
+    return mask
+
+
+def add(a, b) -> BatchResult:
+    a, b = _operands(a, b)
+    return _finish(np.add(a, b), {})
+
+
+def sub(a, b) -> BatchResult:
+    a, b = _operands(a, b)
+    return _finish(np.subtract(a, b), {})
+
+
+def mul(a, b) -> BatchResult:
+    a, b = _operands(a, b)
+    return _finish(np.multiply(a, b), {})
+
+
+def div(a, b) -> BatchResult:
+    a, b = _operands(a, b)
+    zero = b == 0
+    with np.errstate(all='ignore'):
+        values = np.divide(a, b)
+    return _finish(values, {'division_by_zero': zero})
+
+
+def square(a) -> BatchResult:
+    a = _as_array(a)
+    with np.errstate(all='ignore'):
+        return _finish(np.multiply(a, a), {})
+
+
+def sqrt(a) -> BatchResult:
+    a = _as_array(a)
+    with np.errstate(all='ignore'):
+        values = np.sqrt(a)
+    return _finish(values, {'sqrt_negative': a < 0})
+
+
+def _trig(func, a, in_degrees: bool) -> BatchResult:
+    a = _as_array(a)
+    rad = np.radians(a) if in_degrees else a
+    with np.errstate(all='ignore'):
+        values = func(rad)
+    return _finish(values, {'domain_error': np.isinf(a)})
+
+
+def sin(a, in_degrees: bool = True) -> BatchResult:
+    """Sine of each element. If in_degrees=True, convert from degrees to radians."""
+    return _trig(np.sin, a, in_degrees)
+
+
+def cos(a, in_degrees: bool = True) -> BatchResult:
+    """Cosine of each element. If in_degrees=True, convert from degrees to radians."""
+    return _trig(np.cos, a, in_degrees)
+
+
+def tan(a, in_degrees: bool = True) -> BatchResult:
+    """Tangent of each element. If in_degrees=True, convert from degrees to radians."""
+    return _trig(np.tan, a, in_degrees)
+
+
+def log(a, base=10) -> BatchResult:
+    """Logarithm with given base (default 10); ``base`` may be a column."""
+    a, base = _operands(a, base)
+    with np.errstate(all='ignore'):
+        values = np.log(a) / np.log(base)
+    return _finish(values, {
+        'log_non_positive': a <= 0,
+        'log_invalid_base': (base <= 0) | (base == 1),
+    })
+
+
+def ln(a) -> BatchResult:
+    """Natural logarithm (base e)."""
+    a = _as_array(a)
+    with np.errstate(all='ignore'):
+        values = np.log(a)
+    return _finish(values, {'log_non_positive': a <= 0})
+
+
+def log10(a) -> BatchResult:
+    """Base-10 logarithm."""
+    a = _as_array(a)
+    with np.errstate(all='ignore'):
+        values = np.log10(a)
+    return _finish(values, {'log_non_positive': a <= 0})
+
+
+def exp(a) -> BatchResult:
+    """Exponential function (e^a)."""
+    a = _as_array(a)
+    with np.errstate(all='ignore'):
+        values = np.exp(a)
+    return _finish(values, {'overflow': _overflowed(values, a)})
+
+
+def power(a, b) -> BatchResult:
+    """Power function (a^b).
+
+    Negative bases with non-integer exponents have no real result; the
+    scalar function returns a complex number there, the batch version
+    reports ``domain_error``.
+    """
+    a, b = _operands(a, b)
+    with np.errstate(all='ignore'):
+        values = np.power(a, b)
+    return _finish(values, {
+        'division_by_zero': (a == 0) & (b < 0),
+        'domain_error': (a < 0) & np.isfinite(a) & np.isfinite(b) & (b != np.trunc(b)),
+        'overflow': _overflowed(values, a, b),
+    })
+
+
+def factorial(a) -> BatchResult:
+    """Factorial function (a!) via a precomputed float table.
+
+    As in the scalar function, ``inf`` overflows and ``-inf`` and NaN
+    are invalid.
+    """
+    a = _as_array(a)
+    with np.errstate(all='ignore'):
+        invalid = np.isnan(a) | (a < 0) | (np.isfinite(a) & (a != np.trunc(a)))
+        overflow = ~invalid & (a > svc.MAX_FACTORIAL)
+        index = np.where(invalid | overflow, 0, a).astype(np.intp)
+    return _finish(_FACTORIAL_TABLE[index], {
+        'factorial_invalid': invalid,
+        'overflow': overflow,
+    })
+
+
+def reciprocal(a) -> BatchResult:
+    """Reciprocal function (1/a)."""
+    a = _as_array(a)
+    with np.errstate(all='ignore'):
+        values = np.divide(1.0, a)
+    return _finish(values, {'division_by_zero': a == 0})
+
+
+def percent(a, total=None) -> BatchResult:
+    """Percent helper; see ``calculator_service.percent``."""
+    if total is None:
+        return _finish(_as_array(a) / 100.0, {})
+    a, total = _operands(a, total)
+    return _finish((a / 100.0) * total, {})
+
+
+def negate(a) -> BatchResult:
+    """Negate each element."""
+    return _finish(np.negative(_as_array(a)), {})
+
+
+def get_pi(a) -> BatchResult:
+    """Column of pi with the shape of ``a``."""
+    return _finish(np.full(np.shape(a), _math.pi), {})
+
+
+def get_e(a) -> BatchResult:
+    """Column of e with the shape of ``a``."""
+    return _finish(np.full(np.shape(a), _math.e), {})
+
+
+def _scalar_fallback(operation, a: np.ndarray, b: np.ndarray, max_cost=None) -> BatchResult:
+    """Element-wise loop for operations without a vectorized kernel.
+
+    Rows whose estimated cost is above ``max_cost`` are not run.
+    """
+    values = np.empty(a.shape)
+    codes = {}
+    for i, (x, y) in enumerate(zip(a.flat, b.flat)):
+        x, y = float(x), float(y)
+        if max_cost is not None and operation.estimate_cost(x, y) > max_cost:
+            result, code = None, 'too_expensive'
+        else:
+            result, code = operation.evaluate(x, y)
+        if code is None:
+            try:
+                values.flat[i] = result
+            except OverflowError:
+                # exact big-integer results that do not fit the float column
+                code = 'overflow'
+        if code is not None:
+            codes.setdefault(code, np.zeros(a.shape, dtype=bool)).flat[i] = True
+    return _finish(values, codes)
+
+
+def evaluate(name: str, a, b=None, max_cost=None) -> BatchResult:
+    """Evaluate the registered operation ``name`` over whole columns.
+
+    Operands follow the registry's arity: ``b`` is ignored by unary
+    operations and constants, and defaults to zero when omitted.
+    ``max_cost`` is the per-row cost budget (see ``services.cost``).
+    """
+    a, b = _operands(a, 0.0 if b is None else b)
+    operation = get_operation(name)
+    if operation is None:
+        return _finish(np.zeros(a.shape), {'unknown_operation': True})
+    if operation.batch is None:
+        return _scalar_fallback(operation, a, b, max_cost)
+    kernel = globals()[operation.batch]
+    if operation.arity == 0:
+        return kernel(a)
+    return kernel(*(a, b)[:operation.arity])
+
+
+def evaluate_many(names, a, b=None, max_cost=None) -> BatchResult:
+    """Evaluate a mixed column of operation names, one kernel call per name.
+
+    Rows are grouped by operation, each group is evaluated with
+    ``evaluate`` and the results are scattered back in input order.
+    """
+    names = np.asarray(names, dtype=object)
+    a, b = _operands(a, 0.0 if b is None else b)
+    a, b = np.broadcast_to(a, names.shape), np.broadcast_to(b, names.shape)
+    values = np.empty(names.shape)
+    errors = {}
+    for name in dict.fromkeys(names.tolist()):
+        rows = names == name
+        part = evaluate(name, a[rows], b[rows], max_cost)
+        values[rows] = part.values
+        for code, mask in part.errors.items():
+            errors.setdefault(code, np.zeros(names.shape, dtype=bool))[rows] = mask
+    return BatchResult(values, errors)
@@ -0,0 +1,300 @@
+"""Blocked evaluation of compiled expressions over large columns.
+
+Evaluating ``sqrt(a^2 + b^2) * sin(c)`` with ``services.batch`` (or plain
+NumPy) allocates a full-size temporary for every operator, so a formula
+over a 100M-element column needs several times the memory of its
+inputs and streams each temporary through RAM. ``BlockedProgram``
+instead walks the columns in blocks of ``block_size`` elements, small
+enough for the operands of a whole formula to stay in the CPU cache:
+
+- the optimized tree of a ``CompiledExpression`` is turned once into a
+  list of instructions over a few registers, each a preallocated
+  scratch buffer of one block; a register is reused as soon as its
+  value is dead, and repeated subexpressions share one register;
+- every kernel writes into its register with ``out=``; the last one
+  writes straight into the output slice, which may be a caller-provided
+  array;
+- input columns are read through slices (views), never copied.
+
+Peak memory is the inputs plus the output plus a few blocks, and one
+boolean mask per error code that occurs. Errors are reported as in
+``services.batch``: a ``BatchResult`` with one mask per error code and
+NaN in the failed slots; each element is reported under the first
+operation that fails for it, in evaluation order.
+"""
+from dataclasses import dataclass
+import math
+
+import numpy as np
+
+from . import batch
+from .expression import Call, ExpressionError, Number, Variable, compile_expression
+
+# 16384 float64 values are 128 KiB per register: the few live registers
+# of a typical formula fit in L2, and the per-block Python overhead is
+# small next to the kernels.
+DEFAULT_BLOCK_SIZE = 16384
+
+
+def _binary(ufunc):
+    def kernel(out, a, b):
+        ufunc(a, b, out=out)
+        return ()
+    return kernel
+
+
+def _unary(ufunc):
+    def kernel(out, a):
+        ufunc(a, out=out)
+        return ()
+    return kernel
+
+
+def _div(out, a, b):
+    np.divide(a, b, out=out)
+    return (('division_by_zero', np.equal(b, 0)),)
+
+
+def _square(out, a):
+    np.multiply(a, a, out=out)
+    return ()
+
+
+def _sqrt(out, a):
+    np.sqrt(a, out=out)
+    return (('sqrt_negative', np.less(a, 0)),)
+
+
+def _trig(ufunc):
+    def kernel(out, a):
+        np.radians(a, out=out)
+        ufunc(out, out=out)
+        return (('domain_error', np.isinf(a)),)
+    return kernel
+
+
+def _log(ufunc):
+    def kernel(out, a):
+        ufunc(a, out=out)
+        return (('log_non_positive', np.less_equal(a, 0)),)
+    return kernel
+
+
+def _exp(out, a):
+    np.exp(a, out=out)
+    return (('overflow', np.isinf(out) & np.isfinite(a)),)
+
+
+def _power(out, a, b):
+    np.power(a, b, out=out)
+    if isinstance(b, float):
+        # constant exponent (x^2): only the checks that can fire for it
+        checks = []
+        if b < 0:
+            checks.append(('division_by_zero', np.equal(a, 0)))
+        if math.isfinite(b):
+            if b != math.trunc(b):
+                checks.append(('domain_error', np.less(a, 0) & np.isfinite(a)))
+            checks.append(('overflow', np.isinf(out) & np.isfinite(a)))
+        return checks
+    return (
+        ('division_by_zero', np.equal(a, 0) & np.less(b, 0)),
+        ('domain_error', np.less(a, 0) & np.isfinite(a) & np.isfinite(b) & np.not_equal(b, np.trunc(b))),
+        ('overflow', np.isinf(out) & np.isfinite(a) & np.isfinite(b)),
+    )
+
+
+def _reciprocal(out, a):
+    np.divide(1.0, a, out=out)
+    return (('division_by_zero', np.equal(a, 0)),)
+
+
+# Operations evaluated in place; the others go through their
+# ``services.batch`` kernel one block at a time (see ``_fallback``).
+KERNELS = {
+    'add': _binary(np.add),
+    'sub': _binary(np.subtract),
+    'mul': _binary(np.multiply),
+    'div': _div,
+    'power': _power,
+    'square': _square,
+    'sqrt': _sqrt,
+    'reciprocal': _reciprocal,
+    'negate': _unary(np.negative),
+    'sin': _trig(np.sin),
+    'cos': _trig(np.cos),
+    'tan': _trig(np.tan),
+    'log': _log(np.log10),
+    'ln': _log(np.log),
+    'exp': _exp,
+}
+
+
+def _fallback(name):
+    def kernel(out, *args):
+        size = out.shape[0]
+        operands = [np.broadcast_to(arg, size) for arg in args]
+        result = batch.evaluate(name, *operands)
+        np.copyto(out, result.values)
+        return tuple(result.errors.items())
+    return kernel
+
+
+@dataclass(frozen=True)
+class Instruction:
+    """``registers[out] = name(*args)``; an argument is a register index,
+    a variable name or a float constant, told apart by ``kinds``."""
+
+    name: str
+    kernel: object
+    out: int
+    args: tuple
+    kinds: tuple
+
+
+class BlockedProgram:
+    """Register program for one expression tree.
+
+    ``registers`` is the number of scratch buffers ``run`` allocates;
+    the result of the last instruction goes to the output instead.
+    """
+
+    def __init__(self, tree, variables=()):
+        self.tree = tree
+        self.variables = tuple(variables)
+        self.instructions = []
+        self.registers = 0
+        self._free = []
+        self._assigned = {}
+        self._uses = {}
+        self._count_uses(tree)
+        self.result = self._emit(tree)
+
+    def _count_uses(self, node):
+        # each distinct call is emitted once; count the parents reading it
+        if not isinstance(node, Call):
+            return
+        self._uses[node] = self._uses.get(node, 0) + 1
+        if self._uses[node] == 1:
+            for arg in node.args:
+                self._count_uses(arg)
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        self.registers += 1
+        return self.registers - 1
+
+    def _emit(self, node):
+        """Emit ``node``; return its operand as ``(kind, value)``."""
+        if isinstance(node, Number):
+            return 'const', node.value
+        if isinstance(node, Variable):
+            return 'var', node.name
+        if node in self._assigned:
+            return 'reg', self._assigned[node]
+        operands = [self._emit(arg) for arg in node.args]
+        # the output is allocated before the arguments are released: the
+        # error checks of some kernels read their inputs after writing it
+        out = self._allocate()
+        for arg, (kind, value) in zip(node.args, operands):
+            if kind == 'reg':
+                self._uses[arg] -= 1
+                if self._uses[arg] == 0:
+                    self._free.append(value)
+        kernel = KERNELS.get(node.name) or _fallback(node.name)
+        self.instructions.append(Instruction(
+            node.name, kernel, out, tuple(v for _, v in operands), tuple(k for k, _ in operands)))
+        self._assigned[node] = out
+        return 'reg', out
+
+    def run(self, columns: dict, out=None, block_size: int = DEFAULT_BLOCK_SIZE) -> batch.BatchResult:
+        """Evaluate over ``columns`` (variable name -> array or scalar).
+
+        Array columns must all have the same shape, which is the shape
+        of the result. ``out`` receives the values if given; it must be a
+        float64 array of that shape (it may be one of the inputs). If
+        every column is a scalar, the result takes the shape of ``out``
+        and the value is broadcast into it.
+        """
+        missing = [name for name in self.variables if name not in columns]
+        if missing:
+            raise ExpressionError(f'no value for variable {missing[0]!r}', code='unbound_variable')
+
+        shape = ()
+        inputs = {}
+        for name in self.variables:
+            column = np.asarray(columns[name])
+            if column.ndim == 0:
+                inputs[name] = float(column)
+                continue
+            if shape and column.shape != shape:
+                raise ValueError(f'column {name!r} has shape {column.shape}, expected {shape}')
+            shape = column.shape
+            inputs[name] = column.reshape(-1)
+
+        if out is None:
+            out = np.empty(shape)
+        elif not inputs or all(isinstance(column, float) for column in inputs.values()):
+            shape = out.shape
+        if out.shape != shape or out.dtype != np.float64:
+            raise ValueError(f'out must be a float64 array of shape {shape}')
+        flat = out.reshape(-1)
+        if out.size and not np.shares_memory(flat, out):
+            raise ValueError('out must be contiguous')
+        size = flat.shape[0]
+        kind, value = self.result
+        if kind != 'reg':
+            flat[...] = inputs[value] if kind == 'var' else value
+            return batch.BatchResult(out, {})
+
+        block_size = max(1, min(block_size, size))
+        scratch = [np.empty(block_size) for _ in range(self.registers)]
+        claimed = np.empty(block_size, dtype=bool)
+        fresh = np.empty(block_size, dtype=bool)
+        errors = {}
+        # the last kernel writes the output directly, unless the output is
+        # also an input: checks may read an input after the kernel wrote it
+        aliased = any(not isinstance(column, float) and np.may_share_memory(flat, column)
+                      for column in inputs.values())
+        last = -1 if aliased else len(self.instructions) - 1
+
+        with np.errstate(all='ignore'):
+            for start in range(0, size, block_size):
+                stop = min(start + block_size, size)
+                n = stop - start
+                registers = [buffer[:n] for buffer in scratch]
+                values = {name: column if isinstance(column, float) else column[start:stop]
+                          for name, column in inputs.items()}
+                seen = claimed[:n]
+                seen[...] = False
+                for i, instruction in enumerate(self.instructions):
+                    target = flat[start:stop] if i == last else registers[instruction.out]
+                    args = [registers[v] if k == 'reg' else values[v] if k == 'var' else v
+                            for k, v in zip(instruction.kinds, instruction.args)]
+                    for code, mask in instruction.kernel(target, *args):
+                        new = fresh[:n]
+                        np.greater(mask, seen, out=new)
+                        if new.any():
+                            if code not in errors:
+                                errors[code] = np.zeros(size, dtype=bool)
+                            errors[code][start:stop] |= new
+                            seen |= new
+                            target[new] = np.nan
+                if aliased:
+                    flat[start:stop] = registers[value]
+        # later kernels may have turned a failed slot back into a number
+        for mask in errors.values():
+            flat[mask] = np.nan
+        return batch.BatchResult(out, {code: mask.reshape(shape) for code, mask in errors.items()})
+
+
+def evaluate(expression, columns: dict, out=None, block_size: int = DEFAULT_BLOCK_SIZE) -> batch.BatchResult:
+    """Evaluate an expression (source or ``CompiledExpression``) over columns.
+
+    See ``BlockedProgram.run``. The program is built from the optimized
+    tree, so folded constants and shared subexpressions carry over.
+    """
+    if isinstance(expression, str):
+        expression = compile_expression(expression)
+    return BlockedProgram(expression.tree, expression.variables).run(columns, out, block_size)
@@ -0,0 +1,202 @@
+"""Bounded memoization of pure calculator operations.
+
+``ResultCache`` wraps calls to registry operations (``Operation``) and
+remembers results keyed by ``(op, operands, angle mode)``. Only
+operations flagged ``pure`` are cached; because they are pure, entries
+never expire and there is no TTL. Domain errors (``CalculatorError``,
+``OverflowError``) are cached too and re-raised as fresh exceptions.
+
+Key semantics for floats:
+
+- ``0.0`` and ``-0.0`` are different keys, since results can differ
+  (``negate(0.0)`` is ``-0.0``).
+- every NaN maps to one key, so NaN inputs hit like any other value.
+- ``1`` and ``1.0`` are the same key.
+
+Eviction is always least-recently-used; the admission policy decides
+whether a new key may displace the LRU victim when the cache is full.
+``LRUPolicy`` always admits; ``TinyLFUPolicy`` admits only keys that
+have been requested more often than the victim, as estimated by a
+count-min sketch, which keeps one-off inputs from flushing hot entries.
+"""
+from collections import OrderedDict
+from dataclasses import replace
+from functools import partial
+import math
+import threading
+
+from .calculator_service import CalculatorError
+from .operations import OPERATIONS
+
+_NAN_KEY = 'nan'
+_MASK64 = (1 << 64) - 1
+_CACHED_ERRORS = (CalculatorError, OverflowError)
+
+
+def _float_key(x):
+    if x != x:
+        return _NAN_KEY
+    if x == 0:
+        return '-0.0' if math.copysign(1.0, x) < 0 else '0.0'
+    return x
+
+
+class LRUPolicy:
+    """Admit every new key; eviction is plain LRU."""
+
+    def record(self, key):
+        pass
+
+    def admit(self, candidate, victim) -> bool:
+        return True
+
+
+class TinyLFUPolicy:
+    """TinyLFU admission backed by a count-min sketch with periodic aging.
+
+    Every lookup is recorded in the sketch. When the cache is full, a new
+    key is admitted only if its estimated frequency is higher than the
+    frequency of the LRU victim. Counters saturate at 15 and are halved
+    after ``10 * maxsize`` recordings so old popularity fades.
+    """
+
+    MAX_COUNT = 15
+    # One odd 64-bit multiplier per sketch row; the row index is taken
+    # from the high bits of the product (multiplicative hashing).
+    SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+
+    def __init__(self, maxsize: int):
+        bits = 4
+        while (1 << bits) < 4 * maxsize:
+            bits += 1
+        self._shift = 64 - bits
+        self._rows = [bytearray(1 << bits) for _ in self.SEEDS]
+        self._sample_size = 10 * max(maxsize, 1)
+        self._additions = 0
+
+    def _indexes(self, key):
+        h = hash(key) & _MASK64
+        h ^= h >> 29
+        for row, seed in enumerate(self.SEEDS):
+            yield row, ((h * seed) & _MASK64) >> self._shift
+
+    def frequency(self, key) -> int:
+        return min(self._rows[row][i] for row, i in self._indexes(key))
+
+    def record(self, key):
+        for row, i in self._indexes(key):
+            if self._rows[row][i] < self.MAX_COUNT:
+                self._rows[row][i] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._age()
+
+    def _age(self):
+        self._rows = [bytearray(c >> 1 for c in row) for row in self._rows]
+        self._additions //= 2
+
+    def admit(self, candidate, victim) -> bool:
+        return self.frequency(candidate) > self.frequency(victim)
+
+
+POLICIES = {
+    'lru': lambda maxsize: LRUPolicy(),
+    'tinylfu': TinyLFUPolicy,
+}
+
+
+class ResultCache:
+    """Thread-safe bounded result cache for registry operations."""
+
+    def __init__(self, maxsize: int = 1024, policy: str = 'lru'):
+        if maxsize <= 0:
+            raise ValueError('maxsize must be positive')
+        if policy not in POLICIES:
+            raise ValueError(f'unknown cache policy: {policy}')
+        self.maxsize = maxsize
+        self.policy_name = policy
+        self._policy = POLICIES[policy](maxsize)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+        self._operations = {
+            name: replace(op, func=partial(self._call_operands, op)) if op.pure else op
+            for name, op in OPERATIONS.items()
+        }
+
+    def get_operation(self, name):
+        """Registry lookup returning operations whose calls go through the cache."""
+        return self._operations.get(name)
+
+    def _call_operands(self, operation, *operands):
+        return self.call(operation, *operands)
+
+    @staticmethod
+    def key(operation, a: float = 0.0, b: float = 0.0, angle_mode: str = 'deg') -> tuple:
+        """Cache key: only the operands the operation actually reads count."""
+        operands = tuple(_float_key(x) for x in (a, b)[:operation.arity])
+        return (operation.name, operands, angle_mode)
+
+    def call(self, operation, a: float = 0.0, b: float = 0.0, angle_mode: str = 'deg') -> float:
+        """Return ``operation(a, b)``, from the cache when possible.
+
+        Cached domain errors are re-raised as new instances of the
+        original exception type.
+        """
+        if not operation.pure:
+            return operation(a, b)
+        key = self.key(operation, a, b, angle_mode)
+        with self._lock:
+            self._policy.record(key)
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry is None:
+            try:
+                entry = (False, operation(a, b))
+            except _CACHED_ERRORS as e:
+                entry = (True, (type(e), e.args))
+            self._store(key, entry)
+        failed, value = entry
+        if failed:
+            exc_type, args = value
+            raise exc_type(*args)
+        return value
+
+    def _store(self, key, entry):
+        with self._lock:
+            if key in self._data:
+                return
+            if len(self._data) >= self.maxsize:
+                victim = next(iter(self._data))
+                if not self._policy.admit(key, victim):
+                    self.rejections += 1
+                    return
+                del self._data[victim]
+                self.evictions += 1
+            self._data[key] = entry
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Counters for monitoring: hits, misses, evictions, rejections, size."""
+        return {
+            'policy': self.policy_name,
+            'maxsize': self.maxsize,
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'rejections': self.rejections,
+        }
@@ -5,7 +5,7 @@ for invalid operations (division by zero, sqrt of negative).
 """
 from math import sqrt as _sqrt, sin as _sin, cos as _cos, tan as _tan
 from math import log as _log, log10 as _log10, exp as _exp, radians, degrees
-from math import factorial as _factorial
+from math import factorial as _factorial, gamma as _gamma, lgamma as _lgamma
 import math as _math
 
 
@@ -17,6 +17,20 @@ class DivisionByZeroError(CalculatorError):
     pass
 
 
+class ResultOverflowError(CalculatorError):
+    """The result is too large to be represented."""
+    pass
+
+
+# n! for n = 0..170 as floats; 171! no longer fits in a float.
+MAX_FACTORIAL = 170
+FACTORIAL_TABLE = tuple(float(_factorial(n)) for n in range(MAX_FACTORIAL + 1))
+
+# Default digit budget for exact big-integer results (kept below
+# Python's 4300-digit limit on int <-> str conversion).
+EXACT_MAX_DIGITS = 4000
+
+
 def add(a: float, b: float) -> float:
     return a + b
 
@@ -45,20 +59,28 @@ def sqrt(a: float) -> float:
     return _sqrt(a)
 
 
+def _check_trig_arg(a: float) -> None:
+    if a in (_math.inf, -_math.inf):
+        raise CalculatorError('trigonometric function of infinity')
+
+
 def sin(a: float, in_degrees: bool = True) -> float:
     """Sine function. If in_degrees=True, convert from degrees to radians."""
+    _check_trig_arg(a)
     rad = radians(a) if in_degrees else a
     return _sin(rad)
 
 
 def cos(a: float, in_degrees: bool = True) -> float:
     """Cosine function. If in_degrees=True, convert from degrees to radians."""
+    _check_trig_arg(a)
     rad = radians(a) if in_degrees else a
     return _cos(rad)
 
 
 def tan(a: float, in_degrees: bool = True) -> float:
     """Tangent function. If in_degrees=True, convert from degrees to radians."""
+    _check_trig_arg(a)
     rad = radians(a) if in_degrees else a
     return _tan(rad)
 
@@ -98,11 +120,65 @@ def power(a: float, b: float) -> float:
     return a ** b
 
 
-def factorial(a: float) -> float:
-    """Factorial function (a!)."""
-    if a < 0 or a != int(a):
+def _check_factorial_arg(a: float) -> None:
+    if a != a or a < 0 or (a != _math.inf and a != int(a)):
         raise CalculatorError('factorial of negative or non-integer number')
-    return float(_factorial(int(a)))
+
+
+def factorial(a: float) -> float:
+    """Factorial function (a!) from a precomputed table.
+
+    Arguments above 170 are rejected immediately instead of building a
+    huge integer that would not fit in a float anyway.
+    """
+    _check_factorial_arg(a)
+    if a > MAX_FACTORIAL:
+        raise ResultOverflowError('factorial result too large')
+    return FACTORIAL_TABLE[int(a)]
+
+
+def factorial_digits(a: float) -> int:
+    """Number of decimal digits of a! for a non-negative integer a."""
+    _check_factorial_arg(a)
+    if a == _math.inf:
+        raise ResultOverflowError('factorial result too large')
+    if a < 2:
+        return 1
+    return int(_lgamma(a + 1) / _math.log(10)) + 1
+
+
+def factorial_exact(a: float, max_digits: int = EXACT_MAX_DIGITS) -> int:
+    """Exact big-integer factorial, refused if it would exceed ``max_digits``."""
+    if factorial_digits(a) > max_digits:
+        raise ResultOverflowError('factorial exceeds digit budget')
+    return _factorial(int(a))
+
+
+def power_exact(a: float, b: float, max_digits: int = EXACT_MAX_DIGITS) -> int:
+    """Exact big-integer power for an integer base and non-negative integer exponent."""
+    if not (_math.isfinite(a) and _math.isfinite(b)) or a != int(a) or b != int(b) or b < 0:
+        raise CalculatorError('exact power needs integer base and non-negative integer exponent')
+    a, b = int(a), int(b)
+    if abs(a) > 1 and b * _math.log10(abs(a)) >= max_digits:
+        raise ResultOverflowError('power exceeds digit budget')
+    return a ** b
+
+
+def gamma(a: float) -> float:
+    """Gamma function; gamma(n + 1) == n! and it accepts non-integers."""
+    if a <= 0 and float(a).is_integer():
+        raise CalculatorError('gamma of non-positive integer')
+    try:
+        return _gamma(a)
+    except OverflowError:
+        raise ResultOverflowError('gamma result too large') from None
+
+
+def lgamma(a: float) -> float:
+    """Natural log of |gamma(a)|; finite for arguments where gamma overflows."""
+    if a <= 0 and float(a).is_integer():
+        raise CalculatorError('gamma of non-positive integer')
+    return _lgamma(a)
 
 
 def reciprocal(a: float) -> float:
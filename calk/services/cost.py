@@ -0,0 +1,53 @@
+"""Cost estimates and admission control for calculator operations.
+
+Pure Python, no Flask dependencies. A cost is a rough, dimensionless
+amount of work known *before* running an operation: ``1`` for anything
+done in float arithmetic, and the number of decimal digits of the result
+for operations that build big integers (exact factorial and power),
+since their time and memory grow with that size. Estimators never raise:
+arguments the operation itself will reject cost ``1``.
+"""
+import math
+
+from . import calculator_service as svc
+
+CONSTANT_COST = 1
+
+
+class CostLimitExceeded(svc.CalculatorError):
+    """The estimated cost of a calculation is above the allowed budget."""
+
+    code = 'too_expensive'
+
+
+def factorial_digits(a: float, b: float = 0.0) -> float:
+    """Digits of a! (the cost of ``factorial_exact``)."""
+    try:
+        return svc.factorial_digits(a)
+    except svc.ResultOverflowError:
+        return math.inf
+    except svc.CalculatorError:
+        return CONSTANT_COST
+
+
+def power_digits(a: float, b: float) -> float:
+    """Digits of a^b for an integer base and non-negative integer exponent."""
+    if not (math.isfinite(a) and math.isfinite(b)) or b < 0:
+        return CONSTANT_COST
+    # arguments ``power_exact`` rejects
+    if a != math.trunc(a) or b != math.trunc(b):
+        return CONSTANT_COST
+    if abs(a) <= 1 or b == 0:
+        return CONSTANT_COST
+    return int(b * math.log10(abs(a))) + 1
+
+
+def check(operation, a: float = 0.0, b: float = 0.0, budget: float | None = None) -> float:
+    """Return the estimated cost, or raise ``CostLimitExceeded`` above ``budget``.
+
+    ``budget=None`` disables the limit.
+    """
+    cost = operation.estimate_cost(a, b)
+    if budget is not None and cost > budget:
+        raise CostLimitExceeded('estimated cost exceeds budget')
+    return cost
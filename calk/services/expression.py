@@ -0,0 +1,527 @@
+"""Infix calculator expressions parsed, compiled and cached.
+
+Pure Python, no Flask dependencies. An expression such as
+``sqrt(a^2 + b^2) * sin(30)`` uses the registry operations
+(``services.operations``) as functions, ``pi`` and ``e`` as constants
+and any other name as a variable:
+
+- operators ``+ - * /``, ``^`` (or ``**``, right-associative, binding
+  tighter than unary minus: ``-2^2`` is ``-4``) and postfix ``!``
+  (factorial);
+- calls of every registry operation with at least one operand, except
+  the exact big-integer ones, whose cost cannot be bounded up front;
+- numbers such as ``2``, ``.5`` or ``1e-3``.
+
+``parse`` builds a small AST in which every operator is a ``Call`` of
+the registry operation it stands for (``a + b`` is ``Call('add', ...)``).
+``compile_tree`` turns it into a Python function that calls the service
+functions directly, with the literals inlined and the variables as
+positional parameters, so evaluating a compiled expression again with
+other bindings runs only the arithmetic. Before that, ``optimize`` folds
+constant subtrees (``pi``, ``e``, arithmetic on literals) and exact
+identities (``x * 1``, ``--x``, ...), and repeated subexpressions are
+evaluated once into temporaries; ``CompiledExpression.explain()`` shows
+the resulting plan. ``ExpressionCache``
+keeps compiled expressions keyed by their tokens (see ``normalize``);
+``compile_expression`` goes through a module-level instance.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import math
+import re
+import threading
+from typing import Callable
+
+from . import calculator_service as svc
+from .operations import COST_CONSTANT, OPERATIONS
+
+# Inputs are bounded so parsing and compiling stay cheap and the
+# generated code never hits the compiler's nesting limits.
+MAX_LENGTH = 1000
+MAX_DEPTH = 50
+DEFAULT_CACHE_SIZE = 256
+
+# Operations usable in expressions: constants (arity 0) are bare names,
+# the rest are functions.
+FUNCTIONS = {name: op for name, op in OPERATIONS.items() if op.cost == COST_CONSTANT}
+
+# CalculatorError message -> error code, for every operation an
+# expression can call.
+ERROR_CODES = {message: code for op in FUNCTIONS.values() for message, code in op.errors.items()}
+
+_BINARY = {'+': 'add', '-': 'sub', '*': 'mul', '/': 'div', '^': 'power', '**': 'power'}
+_TOKEN = re.compile(r'\s*(?:(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)'
+                    r'|(?P<name>[A-Za-z_][A-Za-z0-9_]*)'
+                    r'|(?P<op>\*\*|[-+*/^!(),]))')
+
+
+class ExpressionError(svc.CalculatorError):
+    """The expression cannot be parsed, or is evaluated without a variable."""
+
+    code = 'invalid_expression'
+
+    def __init__(self, message: str, position: int | None = None, code: str | None = None):
+        super().__init__(message)
+        self.position = position
+        if code is not None:
+            self.code = code
+
+
+@dataclass(frozen=True, eq=False)
+class Number:
+    """A literal. Equal numbers have the same ``repr``: ``-0.0`` and ``0.0``
+    differ and NaN equals NaN, so equal trees always evaluate the same."""
+
+    value: float
+
+    def __eq__(self, other):
+        return isinstance(other, Number) and repr(float(self.value)) == repr(float(other.value))
+
+    def __hash__(self):
+        return hash(repr(float(self.value)))
+
+
+@dataclass(frozen=True)
+class Variable:
+    name: str
+
+
+@dataclass(frozen=True)
+class Call:
+    """A registry operation applied to sub-expressions."""
+
+    name: str
+    args: tuple = ()
+
+
+def normalize(source: str) -> str:
+    """Cache key of an expression: its tokens separated by single spaces.
+
+    Whitespace cannot simply be dropped, since it separates tokens:
+    ``1 2`` (invalid) is not ``12``, and ``a* *b`` is not ``a**b``.
+    """
+    _check_length(source)
+    return ' '.join(text for _, text, _ in _tokenize(source)[:-1])
+
+
+def _check_length(source: str):
+    if len(source) > MAX_LENGTH:
+        raise ExpressionError(f'expression is longer than {MAX_LENGTH} characters')
+
+
+def _tokenize(source: str) -> list:
+    tokens = []
+    position = 0
+    end = len(source.rstrip())
+    while position < end:
+        match = _TOKEN.match(source, position)
+        if match is None:
+            start = len(source) - len(source[position:].lstrip())
+            raise ExpressionError(f'unexpected character {source[start]!r} at position {start}', start)
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind), match.start(kind)))
+        position = match.end()
+    tokens.append(('end', '', end))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent over the token list.
+
+    expr    := term (('+' | '-') term)*
+    term    := unary (('*' | '/') unary)*
+    unary   := ('+' | '-') unary | power
+    power   := postfix (('^' | '**') unary)?
+    postfix := primary '!'*
+    primary := number | name | name '(' [expr (',' expr)*] ')' | '(' expr ')'
+    """
+
+    def __init__(self, source: str):
+        self.tokens = _tokenize(source)
+        self.index = 0
+        self.depth = 0
+        # height of every Call built so far, by id: left-associative and
+        # postfix chains grow the tree without recursing in the parser
+        self.heights = {}
+
+    def peek(self) -> tuple:
+        return self.tokens[self.index]
+
+    def next(self) -> tuple:
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def expect(self, value: str):
+        kind, text, position = self.next()
+        if text != value or kind != 'op':
+            raise ExpressionError(f'expected {value!r} at position {position}', position)
+
+    def error(self, token) -> ExpressionError:
+        kind, text, position = token
+        if kind == 'end':
+            return ExpressionError('unexpected end of expression', position)
+        return ExpressionError(f'unexpected {text!r} at position {position}', position)
+
+    def node(self, name: str, args: tuple, position: int) -> Call:
+        """``Call(name, args)``; raise if the tree gets deeper than ``MAX_DEPTH``."""
+        node = Call(name, args)
+        height = 1 + max((self.heights.get(id(arg), 0) for arg in args), default=0)
+        if height > MAX_DEPTH:
+            raise ExpressionError('expression is nested too deeply', position)
+        self.heights[id(node)] = height
+        return node
+
+    def parse(self):
+        node = self.expr()
+        if self.peek()[0] != 'end':
+            raise self.error(self.peek())
+        return node
+
+    def expr(self):
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            raise ExpressionError('expression is nested too deeply', self.peek()[2])
+        node = self.term()
+        while self.peek()[1] in ('+', '-') and self.peek()[0] == 'op':
+            _, text, position = self.next()
+            node = self.node(_BINARY[text], (node, self.term()), position)
+        self.depth -= 1
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek()[1] in ('*', '/') and self.peek()[0] == 'op':
+            _, text, position = self.next()
+            node = self.node(_BINARY[text], (node, self.unary()), position)
+        return node
+
+    def unary(self):
+        if self.peek()[1] in ('+', '-') and self.peek()[0] == 'op':
+            _, sign, position = self.next()
+            self.depth += 1
+            if self.depth > MAX_DEPTH:
+                raise ExpressionError('expression is nested too deeply', self.peek()[2])
+            operand = self.unary()
+            self.depth -= 1
+            return operand if sign == '+' else self.node('negate', (operand,), position)
+        return self.power()
+
+    def power(self):
+        node = self.postfix()
+        if self.peek()[1] in ('^', '**') and self.peek()[0] == 'op':
+            position = self.next()[2]
+            self.depth += 1
+            if self.depth > MAX_DEPTH:
+                raise ExpressionError('expression is nested too deeply', self.peek()[2])
+            node = self.node('power', (node, self.unary()), position)
+            self.depth -= 1
+        return node
+
+    def postfix(self):
+        node = self.primary()
+        while self.peek()[1] == '!' and self.peek()[0] == 'op':
+            node = self.node('factorial', (node,), self.next()[2])
+        return node
+
+    def primary(self):
+        token = self.next()
+        kind, text, position = token
+        if kind == 'number':
+            return Number(float(text))
+        if kind == 'name':
+            if self.peek()[1] == '(' and self.peek()[0] == 'op':
+                return self.call(text, position)
+            op = FUNCTIONS.get(text)
+            if op is None:
+                if text in OPERATIONS:
+                    raise ExpressionError(f'{text!r} cannot be used in expressions', position)
+                return Variable(text)
+            if op.arity:
+                raise ExpressionError(f'{text!r} is a function and needs arguments', position)
+            return Call(text)
+        if text == '(' and kind == 'op':
+            node = self.expr()
+            self.expect(')')
+            return node
+        raise self.error(token)
+
+    def call(self, name: str, position: int):
+        op = FUNCTIONS.get(name)
+        if op is None:
+            if name in OPERATIONS:
+                raise ExpressionError(f'{name!r} cannot be used in expressions', position)
+            raise ExpressionError(f'unknown function {name!r} at position {position}', position)
+        self.expect('(')
+        args = []
+        if self.peek()[1] != ')':
+            args.append(self.expr())
+            while self.peek()[1] == ',' and self.peek()[0] == 'op':
+                self.next()
+                args.append(self.expr())
+        self.expect(')')
+        if len(args) != op.arity:
+            raise ExpressionError(f'{name} takes {op.arity} argument(s), got {len(args)}', position)
+        return self.node(name, tuple(args), position)
+
+
+def parse(source: str):
+    """AST of an expression; raise ``ExpressionError`` if it is invalid."""
+    _check_length(source)
+    if not source.strip():
+        raise ExpressionError('empty expression', 0)
+    return _Parser(source).parse()
+
+
+def variables(node) -> tuple:
+    """Names of the variables of a tree, sorted."""
+    names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Variable):
+            names.add(node.name)
+        elif isinstance(node, Call):
+            stack.extend(node.args)
+    return tuple(sorted(names))
+
+
+@dataclass(frozen=True)
+class CompiledExpression:
+    """A parsed expression and the function compiled from it.
+
+    ``func`` takes the values of ``variables`` positionally. Calling the
+    expression with keyword bindings raises like the service functions;
+    ``evaluate`` returns ``(result, error_code)`` like
+    ``Operation.evaluate``.
+    """
+
+    source: str
+    tree: object
+    variables: tuple
+    func: Callable = field(repr=False, compare=False)
+    code: str = field(repr=False, compare=False, default='')
+    plan: str = field(repr=False, compare=False, default='')
+
+    def __call__(self, **bindings) -> float:
+        try:
+            args = [bindings[name] for name in self.variables]
+        except KeyError as e:
+            raise ExpressionError(f'no value for variable {e.args[0]!r}', code='unbound_variable') from None
+        return self.func(*args)
+
+    def evaluate(self, bindings=None) -> tuple:
+        """Run the expression without raising; return ``(result, error_code)``."""
+        try:
+            result = self(**(bindings or {}))
+        except ExpressionError as e:
+            return None, e.code
+        except svc.CalculatorError as e:
+            return None, ERROR_CODES.get(str(e)) or getattr(e, 'code', None) or 'calculation_error'
+        except OverflowError:
+            return None, 'overflow'
+        except Exception:
+            return None, 'calculation_error'
+        if isinstance(result, complex):
+            return None, 'domain_error'
+        return result, None
+
+    def explain(self) -> str:
+        """The evaluation plan after optimization, one step per line."""
+        return self.plan
+
+
+def _fold(node):
+    """``Number`` for a call whose arguments are all numbers, if it succeeds.
+
+    A call that raises is kept, so the error is reported when the
+    expression is evaluated, like any other.
+    """
+    try:
+        value = FUNCTIONS[node.name].func(*(arg.value for arg in node.args))
+    except (svc.CalculatorError, ArithmeticError, ValueError):
+        return node
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return node
+    return Number(float(value))
+
+
+def _simplify(node):
+    """Apply identities that are exact for every float, including -0.0, inf and NaN."""
+    name, args = node.name, node.args
+    if name in ('mul', 'div', 'power') and args[1] == Number(1.0):
+        return args[0]
+    if name == 'mul' and args[0] == Number(1.0):
+        return args[1]
+    if name == 'sub' and args[1] == Number(0.0):
+        return args[0]
+    if name == 'negate' and isinstance(args[0], Call) and args[0].name == 'negate':
+        return args[0].args[0]
+    # x^0 drops x, which is only safe when evaluating x cannot fail
+    if name == 'power' and args[1] == Number(0.0) and isinstance(args[0], Variable):
+        return Number(1.0)
+    return node
+
+
+def optimize(tree):
+    """Fold constant subtrees and simplify identities, bottom-up.
+
+    ``pi``, ``e`` and arithmetic on literals become numbers, so
+    ``x * (pi / 180)`` evaluates one multiplication. Operators are not
+    reassociated (``x * pi / 180`` stays two calls) because that would
+    change float rounding.
+    """
+    if not isinstance(tree, Call):
+        return tree
+    node = Call(tree.name, tuple(optimize(arg) for arg in tree.args))
+    if FUNCTIONS[node.name].pure and all(isinstance(arg, Number) for arg in node.args):
+        return _fold(node)
+    return _simplify(node)
+
+
+def _repeated(tree) -> set:
+    """Pure calls that occur more than once in a tree.
+
+    Repeats are not descended into, so the inner calls of a repeated
+    subtree count once.
+    """
+    seen, repeated = set(), set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, Call) or not node.args:
+            continue
+        if node in seen:
+            if FUNCTIONS[node.name].pure:
+                repeated.add(node)
+            continue
+        seen.add(node)
+        stack.extend(node.args)
+    return repeated
+
+
+class _Generator:
+    """Python source for a tree, with repeated subtrees hoisted into temporaries.
+
+    Without repeats the tree is one nested ``return`` expression. With
+    them every call but the outermost is assigned to a local ``t<n>``
+    in evaluation order, and a repeated pure call is referenced by name
+    after its first evaluation; the expression has no branches, so each
+    of them would have been evaluated anyway. Calls run in the same
+    order as in the naive plan, so the first error reported is the
+    same. Operations and non-finite literals become globals. With
+    ``display`` the same plan is rendered with operation and variable
+    names, for ``explain``.
+    """
+
+    def __init__(self, hoist=(), display: bool = False):
+        self.hoist = hoist
+        self.display = display
+        self.namespace = {}
+        self.temporaries = {}
+        self.steps = []
+
+    def emit(self, node, top: bool = False) -> str:
+        if isinstance(node, Number):
+            if math.isfinite(node.value) or self.display:
+                return repr(node.value)
+            name = f'_k{len(self.namespace)}'
+            self.namespace[name] = node.value
+            return name
+        if isinstance(node, Variable):
+            return node.name if self.display else 'v_' + node.name
+        temporary = self.temporaries.get(node)
+        if temporary is not None:
+            return temporary
+        name = node.name if self.display else '_' + node.name
+        self.namespace[name] = FUNCTIONS[node.name].func
+        code = f'{name}({", ".join(self.emit(arg) for arg in node.args)})'
+        if top or not self.hoist:
+            return code
+        # a statement for every call keeps the naive evaluation order
+        temporary = f't{len(self.steps)}'
+        if node in self.hoist:
+            self.temporaries[node] = temporary
+        self.steps.append(f'{temporary} = {code}')
+        return temporary
+
+    def body(self, tree) -> list:
+        """Statements computing ``tree``, ending with ``return``."""
+        result = self.emit(tree, top=True)
+        return [*self.steps, f'return {result}']
+
+
+def compile_tree(tree, source: str = '', optimized: bool = True) -> CompiledExpression:
+    """Compile a tree into a ``CompiledExpression``.
+
+    ``optimized`` runs ``optimize`` and hoists repeated subexpressions;
+    without it every call in the tree is evaluated as written.
+    """
+    names = variables(tree)
+    hoist = ()
+    try:
+        if optimized:
+            tree = optimize(tree)
+            hoist = _repeated(tree)
+        generator = _Generator(hoist)
+        body = '\n'.join('    ' + line for line in generator.body(tree))
+        code = f'def _expression({", ".join("v_" + name for name in names)}):\n{body}\n'
+        namespace = generator.namespace
+        exec(compile(code, f'<expression {source!r}>', 'exec'), namespace)
+        plan = '\n'.join(_Generator(hoist, display=True).body(tree))
+    except (RecursionError, SyntaxError):
+        # trees built by hand rather than by ``parse`` are not depth-checked
+        raise ExpressionError('expression is nested too deeply') from None
+    return CompiledExpression(source, tree, names, namespace['_expression'], code, plan)
+
+
+class ExpressionCache:
+    """Thread-safe LRU map of normalized sources to compiled expressions."""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source: str) -> CompiledExpression:
+        """The compiled expression for ``source``, compiling it on a miss."""
+        key = normalize(source)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+        compiled = compile_tree(parse(source), key)
+        with self._lock:
+            self._entries[key] = compiled
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Counters for monitoring: hits, misses, size."""
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+_cache = ExpressionCache()
+
+
+def compile_expression(source: str) -> CompiledExpression:
+    """Compiled expression for ``source`` from the module-level cache."""
+    return _cache.get(source)
+
+
+def evaluate(source: str, **bindings) -> float:
+    """Compile (or reuse) ``source`` and evaluate it with ``bindings``."""
+    return _cache.get(source)(**bindings)
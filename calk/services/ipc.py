@@ -0,0 +1,377 @@
+"""Shared-memory batch interface for processes on the same host.
+
+Pure Python plus NumPy, no Flask dependencies. A client puts its
+operand columns in POSIX shared memory segments (``multiprocessing.
+shared_memory``) or memory-mapped files and sends a small JSON
+descriptor over a Unix socket; the server maps the same memory,
+evaluates straight from it and writes the results into the client's
+output column in place. Only the descriptor and a short reply cross
+the socket, the columns are never serialized or copied.
+
+One request per line::
+
+    {"op": "add" | "expr": "sqrt(a^2 + b^2)",
+     "dtype": "float64", "length": 1000000,
+     "inputs": {"a": {"segment": "psm_1", "offset": 0},
+                "b": {"file": "/data/b.f64", "offset": 4096}},
+     "out": {"segment": "psm_2", "offset": 0},
+     "errors": {"segment": "psm_2", "offset": 8000000}}
+
+``dtype`` is the type of the input columns (``float64``, ``float32``,
+``int64`` or ``int32``); ``out`` is always float64 and ``errors`` (optional)
+uint8, ``0`` for success or ``1 + ERROR_CODES.index(code)``. Offsets
+are in bytes. The reply is ``{"ok": true, "errors": {code: count}}`` or
+``{"ok": false, "error": {"code", "message"}}``.
+
+Anyone who can connect to the socket can read and write the memory
+the descriptors point at, with the server's permissions: the socket is
+created owner-only (mode ``0600``) and file-backed columns are refused
+unless the server is given a directory (``files``) to confine them to.
+
+Operations and expressions are evaluated with ``services.blocked`` (on
+a ``ParallelEvaluator`` if the server has one), whose last kernel
+writes into the output column directly. ``Client`` does the client
+side: it allocates shared columns, locates arrays inside them and
+decodes error columns.
+"""
+import json
+import mmap
+import os
+import socket
+import socketserver
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from . import batch, blocked
+from .expression import Call, ExpressionCache, ExpressionError, FUNCTIONS, Variable, compile_tree
+from .operations import ERROR_MESSAGES, get_operation
+
+DTYPES = ('float64', 'float32', 'int64', 'int32')
+# error column values: 0 for success, 1 + index of the error code. Every
+# code an operation can report; new codes are only ever appended.
+ERROR_CODES = batch.ERROR_CODES + tuple(code for code in ERROR_MESSAGES if code not in batch.ERROR_CODES)
+_ERROR_VALUES = {code: i + 1 for i, code in enumerate(ERROR_CODES)}
+# descriptors are small; anything longer is not one
+MAX_DESCRIPTOR = 64 * 1024
+
+
+class DescriptorError(ValueError):
+    """The request descriptor is malformed or points outside its memory."""
+
+    code = 'invalid_input'
+
+
+def _map_segment(name: str) -> mmap.mmap:
+    """Map an existing POSIX shared memory segment.
+
+    Opened without ``SharedMemory`` on purpose: before Python 3.13
+    attaching registers the segment with this process's resource
+    tracker, which would unlink the client's segment when the server
+    exits.
+    """
+    import _posixshmem
+    fd = _posixshmem.shm_open('/' + name.lstrip('/'), os.O_RDWR, mode=0o600)
+    try:
+        return mmap.mmap(fd, os.fstat(fd).st_size)
+    finally:
+        os.close(fd)
+
+
+def _map_file(path: str) -> mmap.mmap | bytes:
+    """Map a whole file, read-only if the server may not write it."""
+    writable = os.access(path, os.W_OK)
+    fd = os.open(path, os.O_RDWR if writable else os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        if not size:
+            return b''
+        return mmap.mmap(fd, size, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+
+
+def _confined(path: str, root: str | None) -> str:
+    """The real path of ``path``, which must lie inside ``root``."""
+    if root is None:
+        raise DescriptorError('file columns are disabled on this server')
+    real, root = os.path.realpath(path), os.path.realpath(root)
+    if os.path.commonpath([real, root]) != root:
+        raise DescriptorError(f'file columns must be inside {root}')
+    return real
+
+
+def _column(region, dtype, length: int, writable: bool, files: str | None = None,
+            buffers: dict | None = None) -> np.ndarray:
+    """The ``length`` items of ``dtype`` that ``region`` describes.
+
+    File columns must be inside the directory ``files``. ``buffers``
+    holds the segments and files already mapped for this request: every
+    column of one segment or file is a view of a single mapping, so
+    columns that overlap (``out`` is also an input) share addresses and
+    the evaluator sees that they alias.
+    """
+    if not isinstance(region, dict):
+        raise DescriptorError('column descriptor must be an object')
+    offset = region.get('offset', 0)
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        raise DescriptorError('offset must be a non-negative integer')
+    if buffers is None:
+        buffers = {}
+    nbytes = length * np.dtype(dtype).itemsize
+    try:
+        if 'segment' in region:
+            key, what = ('segment', str(region['segment'])), 'segment'
+            if key not in buffers:
+                buffers[key] = _map_segment(key[1])
+        elif 'file' in region:
+            key, what = ('file', _confined(str(region['file']), files)), 'file'
+            if key not in buffers:
+                buffers[key] = _map_file(key[1])
+        else:
+            raise DescriptorError('column descriptor needs a segment or a file')
+    except OSError as e:
+        raise DescriptorError(f'cannot map column: {e.strerror or e}') from None
+    buffer = buffers[key]
+    if offset + nbytes > len(buffer):
+        raise DescriptorError(f'column extends past the end of its {what}')
+    if not length:
+        return np.empty(0, dtype)
+    column = np.ndarray((length,), dtype, buffer=buffer, offset=offset)
+    if writable and not column.flags.writeable:
+        raise DescriptorError(f'output {what} is read-only')
+    column.flags.writeable = writable
+    return column
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server evaluating descriptors against shared memory.
+
+    ``evaluator`` is an optional ``parallel.ParallelEvaluator``;
+    ``max_cost`` is the per-row cost budget of the exact operations;
+    ``files`` is the directory file-backed columns must be in (``None``:
+    shared memory segments only); ``mode`` the permissions of the socket.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str, evaluator=None, max_cost: float | None = None,
+                 files: str | None = None, mode: int = 0o600):
+        if os.path.exists(path):
+            os.unlink(path)
+        self.evaluator = evaluator
+        self.max_cost = max_cost
+        self.files = files
+        self.mode = mode
+        self.expressions = ExpressionCache()
+        self._programs = {}
+        self.requests = 0
+        self.failures = 0
+        super().__init__(path, _Handler)
+
+    def server_bind(self):
+        super().server_bind()
+        # before listen(): nobody can connect while the mode is the umask's
+        os.chmod(self.server_address, self.mode)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+    def _compiled(self, name: str):
+        # a registry operation as the expression name(a[, b])
+        compiled = self._programs.get(name)
+        if compiled is None:
+            arity = FUNCTIONS[name].arity
+            tree = Call(name, tuple(Variable(v) for v in ('a', 'b')[:arity]))
+            compiled = self._programs[name] = compile_tree(tree, name)
+        return compiled
+
+    def handle_descriptor(self, descriptor) -> dict:
+        """Evaluate one request; return the reply."""
+        self.requests += 1
+        try:
+            counts = self._evaluate(descriptor)
+        except (DescriptorError, ExpressionError) as e:
+            self.failures += 1
+            return {'ok': False, 'error': {'code': e.code, 'message': str(e)}}
+        except Exception as e:
+            # the client must always get a reply, whatever went wrong
+            self.failures += 1
+            return {'ok': False, 'error': {'code': 'calculation_error', 'message': str(e) or type(e).__name__}}
+        return {'ok': True, 'errors': counts}
+
+    def _evaluate(self, descriptor) -> dict:
+        if not isinstance(descriptor, dict):
+            raise DescriptorError('descriptor must be an object')
+        length, dtype = descriptor.get('length'), descriptor.get('dtype', 'float64')
+        if not isinstance(length, int) or isinstance(length, bool) or length < 0:
+            raise DescriptorError('length must be a non-negative integer')
+        if dtype not in DTYPES:
+            raise DescriptorError(f'dtype must be one of {", ".join(DTYPES)}')
+        inputs = descriptor.get('inputs', {})
+        if not isinstance(inputs, dict):
+            raise DescriptorError('inputs must be an object')
+
+        op, source = descriptor.get('op'), descriptor.get('expr')
+        operation = get_operation(op) if isinstance(op, str) else None
+        if isinstance(source, str):
+            compiled = self.expressions.get(source)
+        elif operation is not None and op in FUNCTIONS:
+            compiled = self._compiled(op)
+        elif operation is not None:
+            compiled = None
+        else:
+            raise DescriptorError(f'unknown operation {op!r}')
+
+        # one mapping per segment or file, shared by all columns of the request
+        buffers = {}
+        out = _column(descriptor.get('out'), np.float64, length, True, self.files, buffers)
+        if compiled is None:
+            # exact big-integer operations: element-wise with a cost budget
+            names = ('a', 'b')[:operation.arity]
+            columns = [_column(inputs.get(name), dtype, length, False, self.files, buffers) for name in names]
+            res = batch.evaluate(op, *columns, max_cost=self.max_cost)
+            np.copyto(out, res.values)
+        else:
+            missing = [name for name in compiled.variables if name not in inputs]
+            if missing:
+                raise ExpressionError(f'no value for variable {missing[0]!r}', code='unbound_variable')
+            columns = {name: _column(inputs[name], dtype, length, False, self.files, buffers)
+                       for name in compiled.variables}
+            if self.evaluator is not None:
+                res = self.evaluator.evaluate_expression(compiled, columns, out=out)
+            else:
+                res = blocked.evaluate(compiled, columns, out=out)
+
+        if descriptor.get('errors') is not None:
+            codes = _column(descriptor['errors'], np.uint8, length, True, self.files, buffers)
+            codes[...] = 0
+            for code, mask in res.errors.items():
+                codes[mask] = _ERROR_VALUES.get(code, _ERROR_VALUES['calculation_error'])
+        return {code: int(np.count_nonzero(mask)) for code, mask in res.errors.items()}
+
+    def stats(self) -> dict:
+        """Counters for monitoring: requests, failures."""
+        return {'requests': self.requests, 'failures': self.failures}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_DESCRIPTOR)
+            if not line:
+                return
+            try:
+                descriptor = json.loads(line)
+            except ValueError:
+                reply = {'ok': False, 'error': {'code': 'invalid_input', 'message': 'descriptor is not JSON'}}
+            else:
+                reply = self.server.handle_descriptor(descriptor)
+            self.wfile.write(json.dumps(reply).encode() + b'\n')
+
+
+class RemoteError(Exception):
+    """The server rejected a request."""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class Client:
+    """Client side of the shared-memory interface.
+
+    ``empty(length)`` returns a NumPy array backed by a new shared
+    memory segment owned by the client; fill it in place and pass it
+    (or a contiguous slice of it) to ``evaluate``. Arrays in files
+    opened with ``memmap`` work the same way.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(path)
+        self._reader = self._socket.makefile('rb')
+        self._segments = []
+        self._regions = []
+
+    def empty(self, length: int, dtype='float64') -> np.ndarray:
+        """A new shared column of ``length`` items."""
+        dtype = np.dtype(dtype)
+        segment = shared_memory.SharedMemory(create=True, size=max(1, length * dtype.itemsize))
+        self._segments.append(segment)
+        array = np.ndarray((length,), dtype, buffer=segment.buf)
+        self._regions.append((array.ctypes.data, segment.size, {'segment': segment.name}, 0))
+        return array
+
+    def memmap(self, path: str, length: int, dtype='float64', offset: int = 0, mode: str = 'r+') -> np.memmap:
+        """A column in a memory-mapped file (``mode='w+'`` creates it)."""
+        array = np.memmap(path, dtype, mode, offset, (length,))
+        self._regions.append((array.ctypes.data, array.nbytes, {'file': os.path.abspath(path)}, offset))
+        return array
+
+    def locate(self, array: np.ndarray) -> dict:
+        """Descriptor of an array inside one of the client's columns."""
+        if not array.flags.c_contiguous:
+            raise ValueError('shared columns must be contiguous')
+        address = array.ctypes.data
+        for start, size, region, base in self._regions:
+            if start <= address and address + array.nbytes <= start + size:
+                return {**region, 'offset': base + address - start}
+        raise ValueError('array is not in a shared segment or mapped file of this client')
+
+    def request(self, descriptor: dict) -> dict:
+        """Send one descriptor and return the reply."""
+        self._socket.sendall(json.dumps(descriptor).encode() + b'\n')
+        return json.loads(self._reader.readline())
+
+    def evaluate(self, op: str | None = None, out: np.ndarray | None = None, errors: np.ndarray | None = None,
+                 expr: str | None = None, **inputs) -> dict:
+        """Evaluate ``op`` (or ``expr``) over shared ``inputs`` into ``out``.
+
+        All inputs must have the same length and dtype. Returns the error
+        counts; raises ``RemoteError`` if the request is rejected.
+        """
+        first = next(iter(inputs.values()), out)
+        descriptor = {
+            'length': len(first) if out is None else len(out),
+            'dtype': str(first.dtype) if inputs else 'float64',
+            'inputs': {name: self.locate(array) for name, array in inputs.items()},
+            'out': self.locate(out),
+        }
+        if expr is not None:
+            descriptor['expr'] = expr
+        else:
+            descriptor['op'] = op
+        if errors is not None:
+            descriptor['errors'] = self.locate(errors)
+        reply = self.request(descriptor)
+        if not reply['ok']:
+            raise RemoteError(reply['error']['code'], reply['error']['message'])
+        return reply['errors']
+
+    @staticmethod
+    def error_codes(errors: np.ndarray) -> list:
+        """Decode an error column into codes (``None`` for success)."""
+        names = (None,) + ERROR_CODES
+        return [names[i] for i in errors.tolist()]
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+        self._regions.clear()
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+__all__ = ['Client', 'DescriptorError', 'ERROR_CODES', 'RemoteError', 'Server']
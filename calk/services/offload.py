@@ -0,0 +1,137 @@
+"""Run expensive calculations in a warm process pool with deadlines.
+
+Pure Python, no Flask dependencies. Operations whose estimated cost
+(see ``services.cost``) reaches ``threshold`` are sent to a
+``ProcessPoolExecutor`` so big-integer work that holds the GIL does not
+stall the threads serving cheap requests; everything else runs inline.
+
+Each offloaded call has a deadline. When it passes, the call raises
+``CalculationTimeout``; if the task is already running it cannot be
+cancelled cooperatively, so the pool is replaced and its processes are
+terminated. Calls that were in flight on the old pool fail with
+``OffloadFailed``, as do calls that hit a crashed worker. The replacement
+pool warms up in the background; a call that arrives meanwhile waits for
+its workers before its deadline starts, so spawning them does not count
+against the calculation.
+"""
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import threading
+
+from .calculator_service import CalculatorError
+
+
+class CalculationTimeout(CalculatorError):
+    """An offloaded calculation did not finish before its deadline."""
+
+    code = 'timeout'
+
+
+class OffloadFailed(CalculatorError):
+    """The worker process running a calculation died or was replaced."""
+
+    code = 'offload_failed'
+
+
+def _run(operation, a, b):
+    return operation(a, b)
+
+
+def _ready():
+    return True
+
+
+class Offloader:
+    """Dispatch calls above a cost threshold to a warm process pool."""
+
+    def __init__(self, max_workers: int = 2, threshold: float = 100, timeout: float = 5.0,
+                 start_method: str = 'spawn'):
+        self.max_workers = max_workers
+        self.threshold = threshold
+        self.timeout = timeout
+        self._context = multiprocessing.get_context(start_method)
+        self._lock = threading.Lock()
+        self._executor = None
+        # warm-up tasks of the current pool, done once its workers run
+        self._warmups = []
+        self.offloaded = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def start(self, wait: bool = True):
+        """Create the pool and start every worker process ahead of traffic."""
+        with self._lock:
+            if self._executor is None:
+                self._executor, self._warmups = self._new_pool()
+        if wait:
+            self._warm(self._warmups)
+
+    def _new_pool(self):
+        executor = ProcessPoolExecutor(self.max_workers, mp_context=self._context)
+        return executor, [executor.submit(_ready) for _ in range(self.max_workers)]
+
+    @staticmethod
+    def _warm(warmups):
+        for future in warmups:
+            future.result()
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        """Swap in a fresh pool and kill the processes of ``broken``."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor, self._warmups = self._new_pool()
+        # ProcessPoolExecutor has no public way to stop a running task
+        for process in list((broken._processes or {}).values()):
+            process.terminate()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def call(self, operation, a: float = 0.0, b: float = 0.0, timeout: float | None = None):
+        """Return ``operation(a, b)``, offloaded if its cost reaches the threshold.
+
+        Exceptions raised by the operation in the worker are re-raised here
+        unchanged.
+        """
+        if operation.estimate_cost(a, b) < self.threshold:
+            return operation(a, b)
+        if self._executor is None:
+            self.start(wait=False)
+        with self._lock:
+            executor, warmups = self._executor, self._warmups
+        try:
+            # the deadline covers the calculation, not spawning the workers
+            self._warm(warmups)
+            future = executor.submit(_run, operation, a, b)
+        except BrokenProcessPool:
+            self.failures += 1
+            self._replace_pool(executor)
+            raise OffloadFailed('worker pool unavailable') from None
+        self.offloaded += 1
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            self.timeouts += 1
+            if not future.cancel():
+                self._replace_pool(executor)
+            raise CalculationTimeout('calculation deadline exceeded') from None
+        except BrokenProcessPool:
+            self.failures += 1
+            self._replace_pool(executor)
+            raise OffloadFailed('worker process died') from None
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor, self._warmups = self._executor, None, []
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Counters for monitoring: offloaded calls, timeouts, failures."""
+        return {
+            'workers': self.max_workers,
+            'threshold': self.threshold,
+            'offloaded': self.offloaded,
+            'timeouts': self.timeouts,
+            'failures': self.failures,
+        }
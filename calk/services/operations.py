@@ -0,0 +1,183 @@
+"""Declarative registry of calculator operations.
+
+Pure Python, no Flask dependencies. Each ``Operation`` describes one
+button / API op: its arity, the service function it dispatches to,
+whether it is pure, its cost class and how its ``CalculatorError``
+messages map to stable error codes. Routes, API endpoints and the
+template's button grids are all generated from ``OPERATIONS``, so
+dispatch is a single dict lookup and adding an operation never adds a
+branch to a request handler.
+"""
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable
+
+from . import calculator_service as svc
+from . import cost as _cost
+
+
+def N_(message: str) -> str:
+    """Mark a string for extraction by pybabel without translating it."""
+    return message
+
+
+# Cost classes: 'constant' runs in O(1) float arithmetic, 'bigint' may
+# build big integers whose size depends on the operands.
+COST_CONSTANT = 'constant'
+COST_BIGINT = 'bigint'
+
+# Error code -> untranslated message (msgid of the UI translation).
+ERROR_MESSAGES = {
+    'unknown_operation': N_('Unknown operation'),
+    'division_by_zero': N_('Cannot divide by zero. Please check your values.'),
+    'sqrt_negative': N_('Cannot take square root of a negative number.'),
+    'log_non_positive': N_('Logarithm is only defined for positive numbers.'),
+    'log_invalid_base': N_('Invalid logarithm base. Must be positive and not equal to 1.'),
+    'factorial_invalid': N_('Factorial is only defined for non-negative integers.'),
+    'gamma_pole': N_('Gamma is not defined for zero and negative integers.'),
+    'overflow': N_('Result is too large.'),
+    'domain_error': N_('Result is not a real number.'),
+    'exact_power_invalid': N_('Exact power needs an integer base and a non-negative integer exponent.'),
+    'too_expensive': N_('This calculation is too expensive to run.'),
+    'timeout': N_('The calculation took too long and was cancelled.'),
+    'offload_failed': N_('The calculation could not be completed. Please try again.'),
+    'calculation_error': N_('Calculation error. Please check your input and try again.'),
+    'invalid_expression': N_('Invalid expression.'),
+    'unbound_variable': N_('The expression uses a variable without a value.'),
+}
+
+_DIVISION = {'division by zero': 'division_by_zero'}
+_LOG = {'logarithm of non-positive number': 'log_non_positive'}
+_FACTORIAL = {
+    'factorial of negative or non-integer number': 'factorial_invalid',
+    'factorial result too large': 'overflow',
+    'factorial exceeds digit budget': 'overflow',
+}
+_TRIG = {'trigonometric function of infinity': 'domain_error'}
+_GAMMA = {'gamma of non-positive integer': 'gamma_pole', 'gamma result too large': 'overflow'}
+
+
+@dataclass(frozen=True)
+class Operation:
+    """One calculator operation.
+
+    ``errors`` maps the message of a ``CalculatorError`` raised by
+    ``func`` to an error code in ``ERROR_MESSAGES``. ``label`` and
+    ``symbol`` drive the button in the UI; ``group`` is ``'basic'``,
+    ``'engineering'`` or ``None`` for operations without a button.
+    ``batch`` names the vectorized counterpart in ``services.batch``.
+    ``estimate(a, b)`` predicts the cost of a call (see ``services.cost``);
+    without one every call costs ``cost.CONSTANT_COST``.
+    """
+
+    name: str
+    arity: int
+    func: Callable
+    pure: bool = True
+    cost: str = COST_CONSTANT
+    errors: dict = field(default_factory=dict)
+    label: str | None = None
+    symbol: str | None = None
+    group: str | None = None
+    batch: str | None = None
+    estimate: Callable | None = None
+
+    def __call__(self, a: float = 0.0, b: float = 0.0) -> float:
+        return self.func(*(a, b)[:self.arity])
+
+    def __reduce_ex__(self, protocol):
+        # Registered operations pickle by name (e.g. to reach a worker
+        # process) and unpickle as the plain registry entry.
+        if self.name in OPERATIONS:
+            return get_operation, (self.name,)
+        return super().__reduce_ex__(protocol)
+
+    def error_code(self, exc: Exception) -> str | None:
+        """Error code for an exception raised by ``func``, if it is known."""
+        return self.errors.get(str(exc)) or getattr(exc, 'code', None)
+
+    def estimate_cost(self, a: float = 0.0, b: float = 0.0) -> float:
+        """Cost of ``self(a, b)`` estimated without running it."""
+        if self.estimate is None:
+            return _cost.CONSTANT_COST
+        return self.estimate(a, b)
+
+    def evaluate(self, a: float = 0.0, b: float = 0.0, runner: Callable | None = None) -> tuple:
+        """Run the operation without raising; return ``(result, error_code)``.
+
+        ``runner(operation, a, b)`` replaces the direct call, e.g. to add
+        admission control or offloading around it.
+        """
+        try:
+            result = self(a, b) if runner is None else runner(self, a, b)
+        except svc.CalculatorError as e:
+            return None, self.error_code(e) or 'calculation_error'
+        except OverflowError:
+            return None, 'overflow'
+        except Exception:
+            return None, 'calculation_error'
+        if isinstance(result, complex):
+            return None, 'domain_error'
+        return result, None
+
+
+_REGISTRY = (
+    # Basic operations
+    Operation('add', 2, svc.add, label=N_('Add'), symbol='+', group='basic', batch='add'),
+    Operation('sub', 2, svc.sub, label=N_('Subtract'), symbol='−', group='basic', batch='sub'),
+    Operation('mul', 2, svc.mul, label=N_('Multiply'), symbol='×', group='basic', batch='mul'),
+    Operation('div', 2, svc.div, errors=_DIVISION,
+              label=N_('Divide'), symbol='÷', group='basic', batch='div'),
+    Operation('square', 1, svc.square, label=N_('Square A'), symbol='x²', group='basic', batch='square'),
+    Operation('sqrt', 1, svc.sqrt, errors={'sqrt of negative number': 'sqrt_negative'},
+              label=N_('Sqrt A'), symbol='√', group='basic', batch='sqrt'),
+    Operation('reciprocal', 1, svc.reciprocal, errors=_DIVISION,
+              label=N_('Reciprocal'), symbol='1/x', group='basic', batch='reciprocal'),
+    Operation('negate', 1, svc.negate, label=N_('Negate'), symbol='+/−', group='basic', batch='negate'),
+    # Engineering functions (single operand)
+    Operation('sin', 1, partial(svc.sin, in_degrees=True), errors=_TRIG,
+              label=N_('Sine'), symbol='sin', group='engineering', batch='sin'),
+    Operation('cos', 1, partial(svc.cos, in_degrees=True), errors=_TRIG,
+              label=N_('Cosine'), symbol='cos', group='engineering', batch='cos'),
+    Operation('tan', 1, partial(svc.tan, in_degrees=True), errors=_TRIG,
+              label=N_('Tangent'), symbol='tan', group='engineering', batch='tan'),
+    Operation('log', 1, svc.log10, errors=_LOG,
+              label=N_('Log10'), symbol='log', group='engineering', batch='log10'),
+    Operation('ln', 1, svc.ln, errors=_LOG,
+              label=N_('Natural Log'), symbol='ln', group='engineering', batch='ln'),
+    Operation('exp', 1, svc.exp, label=N_('Exponential'), symbol='eˣ', group='engineering', batch='exp'),
+    Operation('factorial', 1, svc.factorial, errors=_FACTORIAL,
+              label=N_('Factorial'), symbol='n!', group='engineering', batch='factorial'),
+    Operation('percent', 1, svc.percent, label=N_('Percent'), symbol='%', group='engineering', batch='percent'),
+    # Two-operand engineering
+    Operation('power', 2, svc.power, errors={'division by zero in power': 'division_by_zero'},
+              label=N_('Power'), symbol='aˣ', group='engineering', batch='power'),
+    # Constants
+    Operation('pi', 0, svc.get_pi, label=N_('Pi'), symbol='π', group='engineering', batch='get_pi'),
+    Operation('e', 0, svc.get_e, label=N_('Euler'), symbol='e', group='engineering', batch='get_e'),
+    # Operations without a button
+    Operation('log_base', 2, svc.log,
+              errors={**_LOG, 'invalid logarithm base': 'log_invalid_base'}, batch='log'),
+    Operation('gamma', 1, svc.gamma, errors=_GAMMA),
+    Operation('lgamma', 1, svc.lgamma, errors=_GAMMA),
+    Operation('factorial_exact', 1, svc.factorial_exact, cost=COST_BIGINT, errors=_FACTORIAL,
+              estimate=_cost.factorial_digits),
+    Operation('power_exact', 2, svc.power_exact, cost=COST_BIGINT,
+              errors={
+                  'exact power needs integer base and non-negative integer exponent': 'exact_power_invalid',
+                  'power exceeds digit budget': 'overflow',
+              },
+              estimate=_cost.power_digits),
+)
+
+OPERATIONS = {op.name: op for op in _REGISTRY}
+
+GROUPS = {
+    group: tuple(op for op in _REGISTRY if op.group == group)
+    for group in ('basic', 'engineering')
+}
+
+
+def get_operation(name: str | None) -> Operation | None:
+    """Look up an operation by name; ``None`` if it is not registered."""
+    return OPERATIONS.get(name)
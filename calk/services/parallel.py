@@ -0,0 +1,330 @@
+"""Batch evaluation fanned out over all cores, in adaptively sized chunks.
+
+Pure Python plus NumPy, no Flask dependencies. ``ParallelEvaluator``
+has the same ``evaluate`` / ``evaluate_many`` interface as
+``services.batch`` and returns the same ``BatchResult``, so callers can
+use either. Inputs below ``min_items`` run inline; larger ones are cut
+into chunks that are evaluated concurrently:
+
+- operations with a vectorized kernel, and expressions evaluated with
+  ``services.blocked``, run on a thread pool: NumPy releases the GIL
+  inside its kernels, so threads use every core without copying;
+- operations without one (``gamma``, ``lgamma``, ...) are element-wise
+  Python loops that hold the GIL, so they run on a process pool. The
+  operands and the result column live in one ``SharedMemory`` segment;
+  workers read and write their slice in place and only send back the
+  indexes of failed elements.
+
+The chunk size adapts to the measured per-item cost: the first chunk
+of an operation runs inline and is timed, later chunks are sized to
+take about ``chunk_seconds`` each, and the estimate is refined from
+every chunk (an exponential moving average kept per operation or
+expression, in an LRU table of ``max_costs`` entries). Each
+chunk writes to its own slice of the result, so the output order never
+depends on scheduling.
+"""
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import math
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import threading
+import time
+
+import numpy as np
+
+from . import batch, blocked
+from .operations import get_operation
+
+DEFAULT_CHUNK_SECONDS = 0.005
+DEFAULT_MIN_ITEMS = 65536
+MIN_CHUNK = 256
+MAX_CHUNK = 1 << 20
+# cost estimates kept: every operation plus a few hundred expressions
+DEFAULT_MAX_COSTS = 1024
+# weight of the newest measurement in the per-item cost estimate
+_SMOOTHING = 0.3
+
+
+def _fallback_chunk(segment: str, size: int, name: str, start: int, stop: int, max_cost=None):
+    """Worker side: evaluate rows ``start:stop`` of a shared-memory batch.
+
+    The segment holds the ``a``, ``b`` and result columns back to back.
+    Returns ``{code: relative indexes}`` and the time spent.
+    """
+    began = time.perf_counter()
+    shm = shared_memory.SharedMemory(name=segment)
+    try:
+        columns = np.ndarray((3, size), dtype=np.float64, buffer=shm.buf)
+        res = batch._scalar_fallback(get_operation(name), columns[0, start:stop],
+                                     columns[1, start:stop], max_cost)
+        columns[2, start:stop] = res.values
+        errors = {code: np.flatnonzero(mask) for code, mask in res.errors.items()}
+        del columns
+    finally:
+        shm.close()
+    return errors, time.perf_counter() - began
+
+
+def _ready():
+    return True
+
+
+class ParallelEvaluator:
+    """Chunked, multi-core drop-in for ``batch.evaluate`` / ``evaluate_many``.
+
+    ``workers=None`` uses every CPU. ``processes=False`` keeps the
+    pure-Python operations on the calling thread. ``max_costs`` bounds
+    the per-item cost table, whose expression keys come from clients.
+    """
+
+    def __init__(self, workers: int | None = None, chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
+                 min_items: int = DEFAULT_MIN_ITEMS, processes: bool = True,
+                 start_method: str = 'spawn', max_costs: int = DEFAULT_MAX_COSTS):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_seconds = chunk_seconds
+        self.min_items = min_items
+        self.processes = processes
+        self._context = multiprocessing.get_context(start_method)
+        self._lock = threading.Lock()
+        self._threads = None
+        self._pool = None
+        self.max_costs = max_costs
+        self._costs = OrderedDict()
+        self.parallel_calls = 0
+        self.chunks = 0
+
+    # pools
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(self.workers, thread_name_prefix='calk-batch')
+            return self._threads
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=self._context)
+                for future in [self._pool.submit(_ready) for _ in range(self.workers)]:
+                    future.result()
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            threads, self._threads = self._threads, None
+            pool, self._pool = self._pool, None
+        if threads is not None:
+            threads.shutdown(wait=True)
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    # chunking
+
+    def cost(self, key) -> float | None:
+        """Measured seconds per item for ``key`` (an operation or expression)."""
+        return self._costs.get(key)
+
+    def _record(self, key, items: int, seconds: float):
+        if items:
+            measured = seconds / items
+            with self._lock:
+                previous = self._costs.get(key)
+                self._costs[key] = measured if previous is None else (
+                    previous + _SMOOTHING * (measured - previous))
+                self._costs.move_to_end(key)
+                while len(self._costs) > self.max_costs:
+                    self._costs.popitem(last=False)
+
+    def chunk_size(self, key, remaining: int) -> int:
+        """Items per chunk: about ``chunk_seconds`` of work, and enough
+        chunks to give every worker something to do."""
+        per_item = self._costs.get(key)
+        size = MAX_CHUNK if not per_item else int(self.chunk_seconds / per_item)
+        size = min(size, math.ceil(remaining / self.workers))
+        return max(MIN_CHUNK, min(size, MAX_CHUNK))
+
+    def _chunks(self, key, size: int, start: int) -> list:
+        bounds = []
+        while start < size:
+            stop = min(size, start + self.chunk_size(key, size - start))
+            bounds.append((start, stop))
+            start = stop
+        return bounds
+
+    def _run(self, key, size: int, run_inline, submit, collect):
+        """Time a first chunk inline unless the cost is known, then fan out.
+
+        ``run_inline(start, stop)`` evaluates a chunk on this thread;
+        ``submit(start, stop)`` returns a future and ``collect(start,
+        stop, result)`` stores its result and returns the seconds spent.
+        """
+        start = 0
+        if key not in self._costs:
+            start = min(size, MIN_CHUNK * 4)
+            began = time.perf_counter()
+            run_inline(0, start)
+            self._record(key, start, time.perf_counter() - began)
+        bounds = self._chunks(key, size, start)
+        futures = [(lo, hi, submit(lo, hi)) for lo, hi in bounds]
+        items, seconds = 0, 0.0
+        for lo, hi, future in futures:
+            seconds += collect(lo, hi, future.result())
+            items += hi - lo
+        self._record(key, items, seconds)
+        self.parallel_calls += 1
+        self.chunks += len(bounds)
+
+    # evaluation
+
+    def evaluate(self, name: str, a, b=None, max_cost=None) -> batch.BatchResult:
+        """Parallel ``batch.evaluate``; same arguments and result."""
+        a, b = batch._operands(a, 0.0 if b is None else b)
+        operation = get_operation(name)
+        if operation is None or a.size < self.min_items:
+            return batch.evaluate(name, a, b, max_cost)
+        if operation.batch is None:
+            if not self.processes:
+                return batch.evaluate(name, a, b, max_cost)
+            return self._evaluate_processes(name, a, b, max_cost)
+        return self._evaluate_threads(name, a, b, max_cost)
+
+    def _evaluate_threads(self, name, a, b, max_cost):
+        shape = a.shape
+        a, b = a.reshape(-1), b.reshape(-1)
+        values = np.empty(a.size)
+        errors = {}
+
+        def store(lo, hi, res):
+            values[lo:hi] = res.values
+            for code, mask in res.errors.items():
+                errors.setdefault(code, np.zeros(a.size, dtype=bool))[lo:hi] = mask
+
+        def run_inline(lo, hi):
+            store(lo, hi, batch.evaluate(name, a[lo:hi], b[lo:hi], max_cost))
+
+        def task(lo, hi):
+            began = time.perf_counter()
+            res = batch.evaluate(name, a[lo:hi], b[lo:hi], max_cost)
+            return res, time.perf_counter() - began
+
+        def collect(lo, hi, result):
+            res, seconds = result
+            store(lo, hi, res)
+            return seconds
+
+        pool = self._thread_pool()
+        self._run(name, a.size, run_inline, lambda lo, hi: pool.submit(task, lo, hi), collect)
+        return batch.BatchResult(values.reshape(shape),
+                                 {code: mask.reshape(shape) for code, mask in errors.items()})
+
+    def _evaluate_processes(self, name, a, b, max_cost):
+        shape, size = a.shape, a.size
+        shm = shared_memory.SharedMemory(create=True, size=max(1, 3 * size * 8))
+        try:
+            columns = np.ndarray((3, size), dtype=np.float64, buffer=shm.buf)
+            columns[0] = a.reshape(-1)
+            columns[1] = b.reshape(-1)
+            errors = {}
+
+            def store(lo, code, indexes):
+                errors.setdefault(code, np.zeros(size, dtype=bool))[lo + indexes] = True
+
+            def run_inline(lo, hi):
+                res = batch._scalar_fallback(get_operation(name), columns[0, lo:hi], columns[1, lo:hi], max_cost)
+                columns[2, lo:hi] = res.values
+                for code, mask in res.errors.items():
+                    store(lo, code, np.flatnonzero(mask))
+
+            def collect(lo, hi, result):
+                chunk_errors, seconds = result
+                for code, indexes in chunk_errors.items():
+                    store(lo, code, indexes)
+                return seconds
+
+            pool = self._process_pool()
+            self._run(name, size, run_inline,
+                      lambda lo, hi: pool.submit(_fallback_chunk, shm.name, size, name, lo, hi, max_cost),
+                      collect)
+            values = columns[2].copy().reshape(shape)
+            del columns
+        finally:
+            shm.close()
+            shm.unlink()
+        return batch.BatchResult(values, {code: mask.reshape(shape) for code, mask in errors.items()})
+
+    def evaluate_many(self, names, a, b=None, max_cost=None) -> batch.BatchResult:
+        """Parallel ``batch.evaluate_many``: each operation's rows are evaluated with ``evaluate``."""
+        names = np.asarray(names, dtype=object)
+        if names.size < self.min_items:
+            return batch.evaluate_many(names, a, b, max_cost)
+        a, b = batch._operands(a, 0.0 if b is None else b)
+        a, b = np.broadcast_to(a, names.shape), np.broadcast_to(b, names.shape)
+        values = np.empty(names.shape)
+        errors = {}
+        for name in dict.fromkeys(names.tolist()):
+            rows = names == name
+            part = self.evaluate(name, a[rows], b[rows], max_cost)
+            values[rows] = part.values
+            for code, mask in part.errors.items():
+                errors.setdefault(code, np.zeros(names.shape, dtype=bool))[rows] = mask
+        return batch.BatchResult(values, errors)
+
+    def evaluate_expression(self, expression, columns: dict, out=None) -> batch.BatchResult:
+        """Parallel ``blocked.evaluate``: chunks of the columns on the thread pool."""
+        program = blocked.BlockedProgram(expression.tree, expression.variables)
+        arrays = {name: np.asarray(column) for name, column in columns.items()}
+        shape = next((column.shape for column in arrays.values() if column.ndim), ())
+        if not shape and out is not None:
+            # scalars only: the value is broadcast into ``out``
+            shape = out.shape
+        size = math.prod(shape)
+        if size < self.min_items:
+            return program.run(columns, out)
+        if out is None:
+            out = np.empty(shape)
+        elif out.shape != shape or out.dtype != np.float64:
+            raise ValueError(f'out must be a float64 array of shape {shape}')
+        flat = out.reshape(-1)
+        if out.size and not np.shares_memory(flat, out):
+            raise ValueError('out must be contiguous')
+        for name, column in arrays.items():
+            if column.ndim and column.shape != shape:
+                raise ValueError(f'column {name!r} has shape {column.shape}, expected {shape}')
+        arrays = {name: column.reshape(-1) if column.ndim else column for name, column in arrays.items()}
+        errors = {}
+
+        def chunk(lo, hi):
+            return program.run({name: column[lo:hi] if column.ndim else column
+                                for name, column in arrays.items()}, flat[lo:hi])
+
+        def store(lo, hi, res):
+            for code, mask in res.errors.items():
+                errors.setdefault(code, np.zeros(size, dtype=bool))[lo:hi] = mask
+
+        def task(lo, hi):
+            began = time.perf_counter()
+            res = chunk(lo, hi)
+            return res, time.perf_counter() - began
+
+        def collect(lo, hi, result):
+            res, seconds = result
+            store(lo, hi, res)
+            return seconds
+
+        pool = self._thread_pool()
+        self._run('expr:' + expression.source, size, lambda lo, hi: store(lo, hi, chunk(lo, hi)),
+                  lambda lo, hi: pool.submit(task, lo, hi), collect)
+        return batch.BatchResult(out, {code: mask.reshape(shape) for code, mask in errors.items()})
+
+    def stats(self) -> dict:
+        """Counters for monitoring: workers, parallel calls, chunks, per-item costs."""
+        with self._lock:
+            costs = dict(self._costs)
+        return {
+            'workers': self.workers,
+            'parallel_calls': self.parallel_calls,
+            'chunks': self.chunks,
+            'costs': costs,
+        }
@@ -0,0 +1,138 @@
+"""Chunked evaluation of CSV / JSONL streams with bounded memory.
+
+The input is consumed lazily, ``chunk_size`` rows at a time: each chunk
+is parsed, evaluated with one ``batch.evaluate_many`` call and written
+out before the next one is read, so memory stays flat regardless of the
+size of the input. Both functions return generators of output text
+suitable for a streaming (chunked) HTTP response or a file. ``max_cost``
+is the per-row cost budget passed on to ``batch.evaluate_many``;
+``evaluator`` replaces the ``batch`` module, e.g. with a
+``parallel.ParallelEvaluator`` to spread large chunks over all cores.
+
+CSV input needs a header row with ``op`` and ``a`` columns (``b`` is
+optional); the output repeats every input column and appends ``result``
+and ``error``. JSONL input has one ``{"op", "a", "b"}`` object per line;
+each output line is the input object plus ``result`` or ``error``.
+"""
+import csv
+import io
+import json
+from itertools import islice
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from . import batch
+from .operations import get_operation
+
+DEFAULT_CHUNK_SIZE = 4096
+
+
+class StreamFormatError(ValueError):
+    """The stream cannot be evaluated at all (e.g. missing CSV columns)."""
+
+
+def _parse_rows(rows: list, get) -> tuple[list, np.ndarray, np.ndarray, set]:
+    """Operation names, operand columns and invalid row indexes for a chunk.
+
+    ``get(row, key)`` extracts a field from one row; empty or missing
+    operands are only an error if the operation's arity needs them.
+    """
+    n = len(rows)
+    names = [None] * n
+    a, b = np.zeros(n), np.zeros(n)
+    invalid = set()
+    for i, row in enumerate(rows):
+        try:
+            op = get(row, 'op')
+        except (TypeError, KeyError, IndexError):
+            invalid.add(i)
+            continue
+        operation = get_operation(op) if isinstance(op, str) else None
+        if operation is None:
+            continue
+        names[i] = op
+        try:
+            for column, key in zip((a, b), ('a', 'b')[:operation.arity]):
+                value = get(row, key)
+                if isinstance(value, bool) or value is None or value == '':
+                    raise ValueError(value)
+                column[i] = float(value)
+        except (TypeError, ValueError, KeyError, IndexError):
+            invalid.add(i)
+    return names, a, b, invalid
+
+
+def _evaluate_chunk(rows: list, get, max_cost=None, evaluator=batch) -> list:
+    """``(value, error_code)`` for every row of a chunk, in order."""
+    names, a, b, invalid = _parse_rows(rows, get)
+    res = evaluator.evaluate_many(names, a, b, max_cost)
+    codes = [None] * len(rows)
+    for code, mask in res.errors.items():
+        for i in np.flatnonzero(mask):
+            codes[i] = code
+    for i in invalid:
+        codes[i] = 'invalid_input'
+    return list(zip(res.values.tolist(), codes))
+
+
+def evaluate_csv(lines: Iterable[str], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_cost: float | None = None, evaluator=batch) -> Iterator[str]:
+    """Evaluate a CSV stream; yield the output CSV one chunk at a time.
+
+    Raises ``StreamFormatError`` on the first ``next()`` if the header is
+    missing the ``op`` or ``a`` column.
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if not header or 'op' not in header or 'a' not in header:
+        raise StreamFormatError('CSV header must contain op and a columns')
+    index = {name: i for i, name in enumerate(header)}
+
+    def get(row, key):
+        i = index.get(key)
+        return row[i] if i is not None and i < len(row) else ''
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(header + ['result', 'error'])
+    yield out.getvalue()
+
+    while True:
+        rows = list(islice(reader, chunk_size))
+        if not rows:
+            return
+        out.seek(0)
+        out.truncate()
+        for row, (value, code) in zip(rows, _evaluate_chunk(rows, get, max_cost, evaluator)):
+            writer.writerow(row + (['', code] if code else [repr(value), '']))
+        yield out.getvalue()
+
+
+def evaluate_jsonl(lines: Iterable[str], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   max_cost: float | None = None, evaluator=batch) -> Iterator[str]:
+    """Evaluate a JSON Lines stream; yield output lines one chunk at a time."""
+    def get(row, key):
+        return row[key] if key in row else None
+
+    lines = (line for line in lines if line.strip())
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        rows = []
+        for line in chunk:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            rows.append(row if isinstance(row, dict) else None)
+        out = []
+        for row, (value, code) in zip(rows, _evaluate_chunk(rows, get, max_cost, evaluator)):
+            row = dict(row or {})
+            if code:
+                row['error'] = code
+            else:
+                row['result'] = batch.json_number(value)
+            out.append(json.dumps(row, ensure_ascii=False))
+        yield '\n'.join(out) + '\n'
@@ -0,0 +1,82 @@
+const flagMap = {
+  'en': '🇬🇧',
+  'ru': '🇷🇺',
+  'fr': '🇫🇷',
+  'de': '🇩🇪',
+  'es': '🇪🇸',
+  'it': '🇮🇹',
+  'zh': '🇨🇳',
+  'ka': '🇬🇪',
+  'hy': '🇦🇲'
+};
+
+function updateFlagDisplay() {
+  const select = document.getElementById('language-select');
+  const flag = document.getElementById('lang-flag');
+  const selectedLang = select.value;
+  flag.textContent = flagMap[selectedLang] || '🌐';
+}
+
+// Update flag on page load
+document.addEventListener('DOMContentLoaded', updateFlagDisplay);
+
+function toggleMode(mode) {
+  const basicOps = document.querySelector('.ops');
+  const engineeringSection = document.getElementById('engineering-section');
+  const basicBtn = document.querySelector('.basic-btn');
+  const engBtn = document.querySelector('.eng-btn');
+
+  if (mode === 'engineering') {
+    basicOps.style.display = 'none';
+    engineeringSection.classList.add('active');
+    basicBtn.classList.remove('active');
+    engBtn.classList.add('active');
+  } else {
+    basicOps.style.display = 'grid';
+    engineeringSection.classList.remove('active');
+    basicBtn.classList.add('active');
+    engBtn.classList.remove('active');
+  }
+}
+
+function changeLanguage(lang) {
+  // Set cookie with proper format and reload page
+  const date = new Date();
+  date.setTime(date.getTime() + (365 * 24 * 60 * 60 * 1000));
+  document.cookie = "lang=" + lang + "; expires=" + date.toUTCString() + "; path=/";
+  window.location.href = '/';
+}
+
+// Tooltip management
+document.addEventListener('DOMContentLoaded', function() {
+  const tooltip = document.getElementById('welcome-tooltip');
+  const closeButton = document.getElementById('close-tooltip');
+
+  // Check if tooltip is forced to show (for debug)
+  const isForceShow = tooltip.style.display === 'flex';
+
+  // Check if user has seen tooltip before
+  if (!isForceShow && !localStorage.getItem('tooltipShown')) {
+    tooltip.style.display = 'flex';
+    localStorage.setItem('tooltipShown', 'true');
+  } else if (!isForceShow) {
+    tooltip.style.display = 'none';
+  }
+
+  // Close button functionality
+  if (closeButton) {
+    closeButton.addEventListener('click', function() {
+      tooltip.style.display = 'none';
+      // Also mark as shown if this is debug tooltip
+      localStorage.setItem('tooltipShown', 'true');
+    });
+  }
+
+  // Close tooltip when clicking outside
+  document.addEventListener('click', function(event) {
+    if (!tooltip.contains(event.target) && tooltip.style.display === 'flex') {
+      tooltip.style.display = 'none';
+      localStorage.setItem('tooltipShown', 'true');
+    }
+  });
+});
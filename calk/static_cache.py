@@ -0,0 +1,105 @@
+"""In-memory cache of the static folder.
+
+The static assets are a small, fixed set that only changes between
+deploys, so with ``STATIC_MEMORY_CACHE`` enabled they are read once at
+startup and served from memory: no stat, open or read per request, and
+the body is handed to the WSGI server as the stored ``bytes`` object.
+Each file gets a strong ETag (content hash) and its Last-Modified time;
+conditional and ``Range`` requests are answered from memory too.
+
+Files larger than ``max_file_size``, or beyond ``max_total_size`` in
+total, are left on disk and served by Flask's ``send_from_directory``,
+which already streams through ``wsgi.file_wrapper`` (sendfile) when the
+server provides it.
+"""
+from dataclasses import dataclass
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import current_app, request
+
+
+@dataclass(frozen=True)
+class StaticFile:
+    body: bytes
+    mimetype: str
+    etag: str
+    mtime: float
+
+
+class StaticMemoryCache:
+    """Files of a static folder, loaded into memory at startup."""
+
+    def __init__(self, folder: str, max_file_size: int = 1024 * 1024,
+                 max_total_size: int = 32 * 1024 * 1024):
+        self.folder = folder
+        self.max_file_size = max_file_size
+        self.max_total_size = max_total_size
+        self._files = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self.load()
+
+    def load(self):
+        """(Re)read the static folder; returns the number of files loaded."""
+        files, total = {}, 0
+        for root, _dirs, names in os.walk(self.folder):
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                if stat.st_size > self.max_file_size or total + stat.st_size > self.max_total_size:
+                    continue
+                with open(path, 'rb') as f:
+                    body = f.read()
+                total += len(body)
+                filename = os.path.relpath(path, self.folder).replace(os.sep, '/')
+                files[filename] = StaticFile(
+                    body, mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                    hashlib.sha256(body).hexdigest()[:32], stat.st_mtime)
+        self._files = files
+        return len(files)
+
+    def __contains__(self, filename) -> bool:
+        return filename in self._files
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    @property
+    def size(self) -> int:
+        return sum(len(f.body) for f in self._files.values())
+
+    def send(self, filename: str, mimetype: str | None = None):
+        """A response for ``filename`` from memory, or ``None`` if it is not loaded.
+
+        ``mimetype`` overrides the type guessed from the stored name (used
+        for precompressed ``.gz`` / ``.br`` variants).
+        """
+        entry = self._files.get(filename)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        response = current_app.response_class(entry.body, mimetype=mimetype or entry.mimetype)
+        response.set_etag(entry.etag)
+        response.last_modified = entry.mtime
+        response = response.make_conditional(request, accept_ranges=True,
+                                             complete_length=len(entry.body))
+        with self._lock:
+            self.hits += 1
+            self.bytes_served += response.content_length or 0
+        return response
+
+    def stats(self) -> dict:
+        """Counters for monitoring: hits, misses, bytes served, files and bytes held."""
+        return {
+            'files': len(self._files),
+            'size': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes_served': self.bytes_served,
+        }
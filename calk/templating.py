@@ -0,0 +1,43 @@
+"""Template compilation caches and the warm-up step for fast cold starts.
+
+A new worker compiles ``index.html`` on its first render, which makes
+the first request per worker slow. Two opt-in settings remove that:
+
+- ``JINJA_BYTECODE_CACHE_DIR``: compiled templates are stored there with
+  Jinja's ``FileSystemBytecodeCache`` and shared by every worker and
+  restart, so only the first process after a deploy compiles anything;
+- ``WARM_ON_START``: ``create_app`` calls ``warm(app)``, which compiles
+  every template and renders the page once per locale (filling the page
+  cache when it is enabled) before the app serves traffic.
+"""
+import os
+
+from jinja2 import FileSystemBytecodeCache
+
+
+def init_app(app):
+    directory = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def warm(app) -> list:
+    """Compile every template and render the page for each locale.
+
+    With the page cache, the shell that POST results are stitched into
+    is cached for each locale too. Returns the names of the compiled
+    templates.
+    """
+    from .routes.main import render_page, render_shell
+
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    cache = app.extensions.get('page_cache')
+    for locale in app.extensions['locales'].locales:
+        with app.test_request_context('/', headers={'Accept-Language': locale}):
+            render_page(locale)
+            if cache is not None:
+                render_shell(cache, locale)
+    return names
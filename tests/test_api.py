@@ -0,0 +1,238 @@
+"""Tests for the JSON calculation API."""
+import pytest
+from flask import template_rendered
+
+
+@pytest.fixture
+def rendered(app):
+    """Record templates rendered while the test runs."""
+    recorded = []
+
+    def record(sender, template, context, **extra):
+        recorded.append(template.name)
+
+    template_rendered.connect(record, app)
+    yield recorded
+    template_rendered.disconnect(record, app)
+
+
+class TestCalcEndpoint:
+    """Tests for /api/v1/calc."""
+
+    def test_get(self, client):
+        res = client.get('/api/v1/calc?op=add&a=2&b=3')
+        assert res.status_code == 200
+        assert res.get_json() == {'op': 'add', 'result': 5.0}
+
+    def test_post_json(self, client):
+        res = client.post('/api/v1/calc', json={'op': 'power', 'a': 2, 'b': 10})
+        assert res.get_json()['result'] == 1024.0
+
+    def test_post_form(self, client):
+        res = client.post('/api/v1/calc', data={'op': 'sqrt', 'a': '16'})
+        assert res.get_json()['result'] == 4.0
+
+    def test_constant_needs_no_operands(self, client):
+        res = client.get('/api/v1/calc?op=pi')
+        assert res.get_json()['result'] == pytest.approx(3.141592653589793)
+
+    def test_does_not_render_templates(self, client, rendered):
+        client.get('/api/v1/calc?op=mul&a=2&b=3')
+        client.post('/api/v1/calc', json={'op': 'div', 'a': 1, 'b': 0})
+        assert rendered == []
+
+    def test_no_cookies_set(self, client):
+        res = client.get('/api/v1/calc?op=add&a=1&b=1')
+        assert 'Set-Cookie' not in res.headers
+
+    def test_non_finite_result_as_string(self, client):
+        res = client.get('/api/v1/calc?op=add&a=inf&b=1')
+        assert res.get_json()['result'] == 'inf'
+
+
+class TestCalcErrors:
+    """Structured error responses from /api/v1/calc."""
+
+    @pytest.mark.parametrize('query,code', [
+        ('op=div&a=1&b=0', 'division_by_zero'),
+        ('op=sqrt&a=-4', 'sqrt_negative'),
+        ('op=ln&a=0', 'log_non_positive'),
+        ('op=log_base&a=10&b=1', 'log_invalid_base'),
+        ('op=factorial&a=2.5', 'factorial_invalid'),
+        ('op=power&a=10&b=400', 'overflow'),
+        ('op=power&a=-8&b=0.5', 'domain_error'),
+    ])
+    def test_calculation_errors(self, client, query, code):
+        res = client.get('/api/v1/calc?' + query)
+        assert res.status_code == 422
+        assert res.get_json()['error']['code'] == code
+
+    def test_unknown_operation(self, client):
+        res = client.get('/api/v1/calc?op=nope&a=1')
+        assert res.status_code == 400
+        assert res.get_json()['error']['code'] == 'unknown_operation'
+
+    @pytest.mark.parametrize('payload', [
+        {'op': 'add', 'a': 'abc', 'b': 1},
+        {'op': 'add', 'a': 1},
+        {'op': 'add', 'a': True, 'b': 1},
+        {'op': 'add', 'a': [1], 'b': 1},
+    ])
+    def test_invalid_operands(self, client, payload):
+        res = client.post('/api/v1/calc', json=payload)
+        assert res.status_code == 400
+        assert res.get_json()['error']['code'] == 'invalid_input'
+
+    def test_invalid_json_body(self, client):
+        res = client.post('/api/v1/calc', json=[1, 2])
+        assert res.status_code == 400
+        res = client.post('/api/v1/calc', json={'op': ['add']})
+        assert res.get_json()['error']['code'] == 'unknown_operation'
+
+
+class TestBatchEndpoint:
+    """Tests for /api/v1/batch."""
+
+    def test_items_keep_order(self, client):
+        items = [
+            {'op': 'add', 'a': 1, 'b': 2},
+            {'op': 'div', 'a': 1, 'b': 0},
+            {'op': 'sqrt', 'a': 9},
+            {'op': 'add', 'a': 10, 'b': 5},
+            {'op': 'pi'},
+        ]
+        res = client.post('/api/v1/batch', json={'items': items})
+        assert res.status_code == 200
+        results = res.get_json()['results']
+        assert results[0] == {'result': 3.0}
+        assert results[1]['error']['code'] == 'division_by_zero'
+        assert results[2] == {'result': 3.0}
+        assert results[3] == {'result': 15.0}
+        assert results[4]['result'] == pytest.approx(3.141592653589793)
+
+    def test_bare_list(self, client):
+        res = client.post('/api/v1/batch', json=[{'op': 'mul', 'a': 3, 'b': 4}])
+        assert res.get_json()['results'] == [{'result': 12.0}]
+
+    def test_per_item_errors(self, client):
+        items = [{'op': 'nope', 'a': 1}, {'op': 'add', 'a': 'x', 'b': 1}, 'junk', {'op': 'neg'}]
+        results = client.post('/api/v1/batch', json=items).get_json()['results']
+        codes = [r['error']['code'] for r in results]
+        assert codes == ['unknown_operation', 'invalid_input', 'unknown_operation', 'unknown_operation']
+
+    def test_columnar_single_op(self, client):
+        res = client.post('/api/v1/batch', json={'op': 'div', 'a': [1, 4, 9], 'b': [1, 0, 3]})
+        body = res.get_json()
+        assert body['results'] == [1.0, None, 3.0]
+        assert body['errors'] == [None, 'division_by_zero', None]
+
+    def test_columnar_mixed_ops_broadcast_b(self, client):
+        res = client.post('/api/v1/batch', json={'op': ['add', 'mul', 'sqrt'], 'a': [2, 3, -1], 'b': 10})
+        body = res.get_json()
+        assert body['results'] == [12.0, 30.0, None]
+        assert body['errors'] == [None, None, 'sqrt_negative']
+
+    def test_columnar_bad_elements(self, client):
+        res = client.post('/api/v1/batch', json={'op': 'add', 'a': [1, None, '3', 'x', False], 'b': [1, 2, 3, 4, 5]})
+        body = res.get_json()
+        assert body['results'] == [2.0, None, 6.0, None, None]
+        assert body['errors'] == [None, 'invalid_input', None, 'invalid_input', 'invalid_input']
+        # the same values in the items form
+        items = [{'op': 'add', 'a': a, 'b': 1} for a in (None, '3', 'x', False)]
+        results = client.post('/api/v1/batch', json=items).get_json()['results']
+        assert [r.get('error', {}).get('code') for r in results] == ['invalid_input', None, 'invalid_input', 'invalid_input']
+
+    def test_columnar_bad_broadcast_operand(self, client):
+        res = client.post('/api/v1/batch', json={'op': ['add', 'mul'], 'a': [1, 2], 'b': [None]})
+        assert res.get_json()['errors'] == ['invalid_input', 'invalid_input']
+
+    def test_columnar_invalid(self, client):
+        assert client.post('/api/v1/batch', json={'op': 'add', 'a': [1, 2], 'b': None}).status_code == 400
+        assert client.post('/api/v1/batch', json={'op': 'add', 'a': [[1]], 'b': [1]}).status_code == 400
+        assert client.post('/api/v1/batch', json={'op': ['add'], 'a': [1, 2]}).status_code == 400
+        assert client.post('/api/v1/batch', data='{', content_type='application/json').status_code == 400
+
+    def test_max_items(self, app, client):
+        app.config['API_BATCH_MAX_ITEMS'] = 3
+        try:
+            res = client.post('/api/v1/batch', json={'op': 'add', 'a': [1, 2, 3, 4], 'b': 1})
+            assert res.status_code == 413
+            assert res.get_json()['error']['code'] == 'too_many_items'
+        finally:
+            app.config['API_BATCH_MAX_ITEMS'] = 10000
+
+    def test_max_body_size(self, app, client):
+        app.config['API_BATCH_MAX_BYTES'] = 64
+        try:
+            res = client.post('/api/v1/batch', json={'op': 'add', 'a': list(range(100)), 'b': 1})
+            assert res.status_code == 413
+            assert res.get_json()['error']['code'] == 'payload_too_large'
+        finally:
+            app.config['API_BATCH_MAX_BYTES'] = 2 * 1024 * 1024
+
+    def test_ten_thousand_items(self, client, rendered):
+        n = 10000
+        res = client.post('/api/v1/batch', json={'op': 'add', 'a': list(range(n)), 'b': 1})
+        results = res.get_json()['results']
+        assert len(results) == n
+        assert results[-1] == n
+        assert rendered == []
+
+
+class TestStreamEndpoint:
+    """Tests for /api/v1/stream."""
+
+    def test_csv_upload(self, client):
+        body = 'op,a,b\nadd,1,2\ndiv,1,0\n'
+        res = client.post('/api/v1/stream', data=body, content_type='text/csv')
+        assert res.status_code == 200
+        assert res.mimetype == 'text/csv'
+        assert 'Content-Length' not in res.headers
+        assert res.data.decode().splitlines() == ['op,a,b,result,error', 'add,1,2,3.0,', 'div,1,0,,division_by_zero']
+
+    def test_jsonl_upload(self, client):
+        body = '{"op": "square", "a": 3}\n{"op": "sqrt", "a": -1}\n'
+        res = client.post('/api/v1/stream?format=jsonl', data=body)
+        assert res.mimetype == 'application/x-ndjson'
+        lines = res.data.decode().splitlines()
+        assert '"result": 9.0' in lines[0]
+        assert '"error": "sqrt_negative"' in lines[1]
+
+    def test_chunk_size_from_config(self, app, client):
+        app.config['STREAM_CHUNK_SIZE'] = 2
+        try:
+            body = 'op,a,b\n' + 'add,1,1\n' * 5
+            res = client.post('/api/v1/stream', data=body, content_type='text/csv')
+            assert len(list(res.response)) == 1 + 3
+        finally:
+            app.config['STREAM_CHUNK_SIZE'] = 4096
+
+    def test_bad_header(self, client):
+        res = client.post('/api/v1/stream', data='x,y\n1,2\n', content_type='text/csv')
+        assert res.status_code == 400
+        assert res.get_json()['error']['code'] == 'invalid_input'
+
+    def test_unsupported_format(self, client):
+        assert client.post('/api/v1/stream?format=xml', data='').status_code == 400
+
+
+class TestFactorialEngine:
+    """Large factorials fail fast with a specific error."""
+
+    def test_form_shows_overflow_message(self, client):
+        res = client.post('/', data={'a': '100000', 'b': '', 'operation': 'factorial'})
+        assert 'Result is too large.' in res.data.decode('utf-8')
+
+    def test_overflow_message_translated(self, client):
+        client.set_cookie('lang', 'ru')
+        res = client.post('/', data={'a': '171', 'b': '', 'operation': 'factorial'})
+        assert 'Результат слишком большой.' in res.data.decode('utf-8')
+
+    def test_api_codes(self, client):
+        assert client.get('/api/v1/calc?op=factorial&a=1e6').get_json()['error']['code'] == 'overflow'
+        assert client.get('/api/v1/calc?op=gamma&a=-2').get_json()['error']['code'] == 'gamma_pole'
+        assert client.get('/api/v1/calc?op=lgamma&a=1e6').status_code == 200
+
+    def test_exact_factorial(self, client):
+        assert client.get('/api/v1/calc?op=factorial_exact&a=30').get_json()['result'] == 265252859812191058636308480000000
+        assert client.get('/api/v1/calc?op=factorial_exact&a=5000').get_json()['error']['code'] == 'too_expensive'
@@ -125,6 +125,17 @@ class TestAppErrorHandling:
         text = res.data.decode('utf-8')
         assert 'error' in text.lower()
 
+    def test_same_error_codes_as_api(self):
+        """Test that the form reports the error the API reports, translated."""
+        app = create_app()
+        client = app.test_client()
+
+        for a, b, message in (('10', '400', 'Result is too large.'), ('-8', '0.5', 'Result is not a real number.')):
+            api = client.get(f'/api/v1/calc?op=power&a={a}&b={b}').get_json()
+            assert api['error']['message'] == message
+            res = client.post('/', data={'a': a, 'b': b, 'operation': 'power'})
+            assert message in res.data.decode('utf-8')
+
 
 class TestAppLanguageHandling:
     """Test language handling in the Flask application."""
@@ -0,0 +1,124 @@
+"""Tests for the static asset build and precompressed serving."""
+import sys
+import os
+import gzip
+import json
+import shutil
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk import create_app
+from calk import assets
+
+STATIC = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'calk', 'static')
+
+
+class TestMinifiers:
+    """Minification removes comments and whitespace only."""
+
+    def test_css(self):
+        css = '/* title */\n.a  >  .b {\n  color: red;\n  font: 1rem "Courier New";\n}\n'
+        assert assets.minify_css(css) == '.a>.b{color:red;font:1rem "Courier New"}'
+
+    def test_js_keeps_urls_in_strings(self):
+        js = '// comment\nfunction f() {\n    return "http://x";\n}\n\n'
+        assert assets.minify_js(js) == 'function f() {\nreturn "http://x";\n}\n'
+
+    def test_svg(self):
+        svg = '<svg>\n  <!-- note -->\n  <rect  x="1"/>\n</svg>\n'
+        assert assets.minify_svg(svg) == '<svg><rect x="1"/></svg>'
+
+
+class TestBuild:
+    """The build writes hashed, minified and compressed files plus a manifest."""
+
+    @pytest.fixture
+    def static(self, tmp_path):
+        folder = tmp_path / 'static'
+        shutil.copytree(STATIC, folder, ignore=shutil.ignore_patterns('dist'))
+        return folder
+
+    def test_manifest(self, static):
+        manifest = assets.build(str(static))
+        assert set(manifest) == {'css/style.css', 'js/app.js', 'img/favicon.svg'}
+        assert manifest['css/style.css'].startswith('dist/css/style.')
+        assert json.loads((static / 'dist' / 'manifest.json').read_text()) == manifest
+
+    def test_outputs(self, static):
+        built = static / assets.build(str(static))['css/style.css']
+        data = built.read_bytes()
+        assert len(data) < (static / 'css' / 'style.css').stat().st_size
+        assert assets.fingerprint(data) in built.name
+        assert gzip.decompress(built.with_name(built.name + '.gz').read_bytes()) == data
+        assert built.with_name(built.name + '.br').exists() == (assets.brotli is not None)
+
+    def test_reproducible_and_replaces_output(self, static):
+        first = assets.build(str(static))
+        stale = static / 'dist' / 'stale.css'
+        stale.write_text('x')
+        assert assets.build(str(static)) == first
+        assert not stale.exists()
+
+    def test_manifest_load(self, static):
+        assert not assets.AssetManifest.load(str(static))
+        assets.build(str(static))
+        manifest = assets.AssetManifest.load(str(static))
+        built = manifest.resolve('css/style.css')
+        assert built in manifest and 'css/style.css' not in manifest
+        assert manifest.resolve('other.png') == 'other.png'
+
+
+@pytest.fixture
+def built_app():
+    # builds into the real static folder, so remove the output afterwards
+    dist = os.path.join(STATIC, 'dist')
+    if os.path.exists(dist):
+        pytest.skip('a dist folder already exists')
+    result = create_app().test_cli_runner().invoke(args=['assets', 'build'])
+    assert result.exit_code == 0 and 'css/style.css -> dist/css/style.' in result.output
+    yield create_app()
+    shutil.rmtree(dist)
+
+
+class TestServing:
+    """url_for resolves through the manifest; variants follow Accept-Encoding."""
+
+    def test_url_for_uses_manifest(self, built_app):
+        page = built_app.test_client().get('/').data.decode('utf-8')
+        manifest = built_app.extensions['asset_manifest']
+        for source in ('css/style.css', 'js/app.js', 'img/favicon.svg'):
+            assert f'"/static/{manifest.resolve(source)}"' in page
+
+    def test_gzip_variant(self, built_app):
+        url = '/static/' + built_app.extensions['asset_manifest'].resolve('css/style.css')
+        response = built_app.test_client().get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        assert response.content_encoding == 'gzip'
+        assert response.mimetype == 'text/css'
+        assert 'Accept-Encoding' in response.vary
+        assert response.cache_control.immutable
+        assert gzip.decompress(response.data).startswith(b':root{')
+
+    def test_identity_variant(self, built_app):
+        url = '/static/' + built_app.extensions['asset_manifest'].resolve('css/style.css')
+        response = built_app.test_client().get(url, headers={'Accept-Encoding': 'identity'})
+        assert response.content_encoding is None
+        assert response.data.startswith(b':root{')
+
+    def test_source_files_still_served(self, built_app):
+        response = built_app.test_client().get('/static/css/style.css')
+        assert response.status_code == 200
+        assert response.content_encoding is None
+        assert not response.cache_control.immutable
+
+    def test_variants_from_memory(self, built_app):
+        class MemoryConfig:
+            STATIC_MEMORY_CACHE = True
+        app = create_app(MemoryConfig)
+        url = '/static/' + app.extensions['asset_manifest'].resolve('css/style.css')
+        response = app.test_client().get(url, headers={'Accept-Encoding': 'gzip'})
+        assert response.content_encoding == 'gzip'
+        assert response.mimetype == 'text/css'
+        assert gzip.decompress(response.data).startswith(b':root{')
+        assert app.extensions['static_cache'].stats()['hits'] == 1
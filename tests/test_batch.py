@@ -0,0 +1,138 @@
+"""Tests for the vectorized batch service."""
+import sys
+import os
+import math
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk.services import batch
+from calk.services import calculator_service as svc
+from calk.services.operations import get_operation
+
+
+class TestBatchMatchesScalar:
+    """Batch results agree with the scalar service element by element."""
+
+    @pytest.mark.parametrize('name', ['add', 'sub', 'mul', 'div', 'power'])
+    def test_binary_operations(self, name):
+        a = np.array([1.0, 2.5, 3.0, 10.0])
+        b = np.array([2.0, 4.0, -1.5, 3.0])
+        res = getattr(batch, name)(a, b)
+        assert res.values == pytest.approx([getattr(svc, name)(x, y) for x, y in zip(a, b)])
+        assert res.errors == {}
+
+    @pytest.mark.parametrize('name', ['square', 'sin', 'cos', 'tan', 'exp', 'negate', 'reciprocal', 'percent'])
+    def test_unary_operations(self, name):
+        a = np.array([0.5, 1.0, 30.0, -45.0])
+        res = getattr(batch, name)(a)
+        assert res.values == pytest.approx([getattr(svc, name)(x) for x in a])
+        assert res.errors == {}
+
+    def test_accepts_lists_and_buffers(self):
+        assert batch.add([1, 2], [3, 4]).values.tolist() == [4.0, 6.0]
+        buf = np.array([1.0, 4.0, 9.0]).tobytes()
+        assert batch.sqrt(np.frombuffer(buf)).values.tolist() == [1.0, 2.0, 3.0]
+
+    def test_scalar_broadcasts_against_column(self):
+        res = batch.mul(np.arange(4), 2)
+        assert res.values.tolist() == [0.0, 2.0, 4.0, 6.0]
+
+    def test_factorial_table(self):
+        res = batch.factorial([0, 1, 5, 10, 170])
+        assert res.values.tolist() == [svc.factorial(n) for n in (0, 1, 5, 10, 170)]
+
+    def test_log_with_base_column(self):
+        res = batch.log([8, 100], [2, 10])
+        assert res.values == pytest.approx([3.0, 2.0])
+
+
+class TestBatchErrorMasks:
+    """Domain errors are reported per element instead of raising."""
+
+    def test_division_by_zero(self):
+        res = batch.div([1, 2, 3], [1, 0, 3])
+        assert res.errors['division_by_zero'].tolist() == [False, True, False]
+        assert math.isnan(res.values[1])
+        assert res.values[2] == 1.0
+        assert res.error_at(1) == 'division_by_zero'
+        assert res.error_at(0) is None
+
+    def test_sqrt_negative(self):
+        res = batch.sqrt([4, -1, 9])
+        assert res.ok.tolist() == [True, False, True]
+        assert res.error_count == 1
+        assert list(res.errors) == ['sqrt_negative']
+
+    def test_log_non_positive_and_invalid_base(self):
+        res = batch.log([0, 10, 10], [10, 1, 10])
+        assert res.error_at(0) == 'log_non_positive'
+        assert res.error_at(1) == 'log_invalid_base'
+        assert res.values[2] == pytest.approx(1.0)
+
+    def test_ln_and_log10_non_positive(self):
+        assert batch.ln([-1, 1]).error_at(0) == 'log_non_positive'
+        assert batch.log10([0, 10]).error_at(0) == 'log_non_positive'
+
+    def test_factorial_invalid_and_overflow(self):
+        res = batch.factorial([-1, 2.5, 171, 3, np.nan])
+        assert res.errors['factorial_invalid'].tolist() == [True, True, False, False, True]
+        assert res.errors['overflow'].tolist() == [False, False, True, False, False]
+        assert res.values[3] == 6.0
+
+    def test_power_errors(self):
+        res = batch.power([0, -8, 10, 2], [-1, 1 / 3, 400, 3])
+        assert res.error_at(0) == 'division_by_zero'
+        assert res.error_at(1) == 'domain_error'
+        assert res.error_at(2) == 'overflow'
+        assert res.values[3] == 8.0
+
+    def test_exp_overflow(self):
+        res = batch.exp([1, 1000])
+        assert res.error_at(1) == 'overflow'
+        assert res.values[0] == pytest.approx(math.e)
+
+    def test_trig_of_infinity(self):
+        assert batch.sin([np.inf]).error_at(0) == 'domain_error'
+
+    @pytest.mark.parametrize('name', ['factorial', 'sin', 'cos', 'tan', 'sqrt', 'ln', 'exp', 'gamma'])
+    def test_same_error_codes_as_scalar(self, name):
+        """/calc and /batch report the same code for the same input."""
+        operation = get_operation(name)
+        a = [np.inf, -np.inf, np.nan, 171.0, -1.0, 0.0, 2.5]
+        res = batch.evaluate(name, a)
+        assert [res.error_at(i) for i in range(len(a))] == [operation.evaluate(x)[1] for x in a]
+
+    def test_each_element_reported_once(self):
+        res = batch.log([0], [1])
+        assert list(res.errors) == ['log_non_positive']
+
+    def test_all_error_codes_documented(self):
+        res = batch.reciprocal([0])
+        assert set(res.errors) <= set(batch.ERROR_CODES)
+
+
+def test_constants_fill_shape():
+    assert batch.get_pi(np.zeros(3)).values.tolist() == [math.pi] * 3
+    assert batch.get_e([1, 2]).values.tolist() == [math.e] * 2
+
+
+class TestEvaluateByName:
+    """Dispatch through the operation registry."""
+
+    def test_evaluate_uses_registry_names(self):
+        assert batch.evaluate('log', [100]).values.tolist() == [2.0]
+        assert batch.evaluate('log_base', [8], [2]).values == pytest.approx([3.0])
+        assert batch.evaluate('pi', [0, 0]).values.tolist() == [math.pi] * 2
+
+    def test_evaluate_unknown_operation(self):
+        res = batch.evaluate('nope', [1, 2])
+        assert res.errors['unknown_operation'].all()
+
+    def test_evaluate_many_scatters_in_order(self):
+        res = batch.evaluate_many(['add', 'sqrt', 'add', 'div'], [1, -4, 3, 1], [2, 0, 4, 0])
+        assert res.values[[0, 2]].tolist() == [3.0, 7.0]
+        assert res.error_at(1) == 'sqrt_negative'
+        assert res.error_at(3) == 'division_by_zero'
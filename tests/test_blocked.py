@@ -0,0 +1,183 @@
+"""Tests for blocked evaluation of expressions over large columns."""
+import sys
+import os
+import tracemalloc
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk.services.blocked import BlockedProgram, evaluate
+from calk.services.expression import ExpressionError, compile_expression
+
+rng = np.random.default_rng(0)
+A, B, C = rng.uniform(-5, 5, 5001), rng.uniform(-5, 5, 5001), rng.uniform(-360, 360, 5001)
+
+
+def _scalar(compiled, columns):
+    """Values and error codes of the compiled scalar function, element by element."""
+    values, codes = [], []
+    for i in range(len(next(iter(columns.values())))):
+        value, code = compiled.evaluate({name: float(column[i]) for name, column in columns.items()})
+        values.append(np.nan if code else value)
+        codes.append(code)
+    return np.array(values), codes
+
+
+class TestMatchesScalar:
+    """Blocked results and error codes match the scalar compiled expression."""
+
+    @pytest.mark.parametrize('source', [
+        'sqrt(a^2 + b^2) * sin(c)',
+        'sqrt(a) + ln(b) - log(a * b)',
+        'a / b + (a / b)^2 - 1/a',
+        'a^b + b^-1 + a^0.5',
+        'exp(a * 200) + cos(c) * tan(c)',
+        'factorial(a) + gamma(b) + lgamma(b)',
+        'log_base(a, b) + percent(c) + square(a) - reciprocal(b) + -c',
+        'sin(c * (pi / 180)) * sin(c * (pi / 180)) + e',
+    ])
+    @pytest.mark.parametrize('block_size', [1, 7, 1000, 100000])
+    def test_values_and_codes(self, source, block_size):
+        compiled = compile_expression(source)
+        columns = {name: column for name, column in zip('abc', (A, B, C)) if name in compiled.variables}
+        res = evaluate(compiled, columns, block_size=block_size)
+        values, codes = _scalar(compiled, columns)
+        np.testing.assert_allclose(res.values, values, rtol=1e-12, equal_nan=True)
+        assert [res.error_at(i) for i in range(A.size)] == codes
+
+    def test_scalar_columns_broadcast(self):
+        res = evaluate('a * k + 1', {'a': np.arange(5.0), 'k': 2})
+        assert res.values.tolist() == [1, 3, 5, 7, 9]
+
+    def test_scalar_columns_take_the_shape_of_out(self):
+        out = np.empty((2, 3))
+        assert evaluate('a * 2 + 1', {'a': 2}, out=out).values.tolist() == [[5.0] * 3] * 2
+        res = evaluate('1 / x', {'x': 0}, out=np.empty(4))
+        assert res.errors['division_by_zero'].tolist() == [True] * 4
+        assert evaluate('pi', {}, out=np.empty(2)).values.tolist() == [np.pi] * 2
+
+    @pytest.mark.parametrize('source,code', [
+        ('sqrt(a)^0', 'sqrt_negative'),
+        ('(a / b)^0', 'division_by_zero'),
+    ])
+    def test_failed_slots_stay_nan(self, source, code):
+        a, b = np.array([-1., 4., 0.]), np.array([1., 0., 2.])
+        compiled = compile_expression(source)
+        columns = {name: column for name, column in (('a', a), ('b', b)) if name in compiled.variables}
+        res = evaluate(compiled, columns)
+        failed = res.errors[code]
+        assert failed.tolist() == [code == 'sqrt_negative', code == 'division_by_zero', False]
+        assert np.isnan(res.values[failed]).all()
+        assert (res.values[~failed] == 1).all()
+        # in place: the output is also the input
+        columns['a'] = a.copy()
+        res = evaluate(compiled, columns, out=columns['a'])
+        assert np.isnan(res.values[failed]).all()
+
+    def test_trivial_programs(self):
+        assert evaluate('a', {'a': A}).values.tolist() == A.tolist()
+        assert evaluate('2 * pi', {}).values == pytest.approx(2 * np.pi)
+
+
+class TestBuffers:
+    """Registers, output arrays and shapes."""
+
+    def test_registers_reused(self):
+        program = BlockedProgram(compile_expression('((a + 1) * 2 - 3) / 4 + 5').tree)
+        assert len(program.instructions) == 5
+        assert program.registers == 2
+
+    def test_shared_subexpression_one_instruction(self):
+        program = BlockedProgram(compile_expression('sin(a) * sin(a) + sin(a)').tree)
+        assert [i.name for i in program.instructions] == ['sin', 'mul', 'add']
+
+    def test_writes_into_out(self):
+        out = np.empty(A.size)
+        res = evaluate('a * 2', {'a': A}, out=out)
+        assert res.values is out
+        np.testing.assert_array_equal(out, A * 2)
+
+    def test_out_may_be_an_input(self):
+        x = A * 200
+        expected = evaluate('exp(x)', {'x': x.copy()})
+        res = evaluate('exp(x)', {'x': x}, out=x, block_size=333)
+        np.testing.assert_array_equal(x, expected.values)
+        assert res.errors['overflow'].tolist() == expected.errors['overflow'].tolist()
+
+    def test_shape_kept(self):
+        res = evaluate('sqrt(a)', {'a': A[:5000].reshape(50, 100)})
+        assert res.values.shape == (50, 100)
+        assert res.errors['sqrt_negative'].shape == (50, 100)
+
+    def test_integer_columns_not_copied(self):
+        a = np.arange(10, dtype=np.int32)
+        assert evaluate('a / 2', {'a': a}).values.tolist() == (a / 2).tolist()
+
+    def test_bad_arguments(self):
+        with pytest.raises(ExpressionError):
+            evaluate('a + b', {'a': A})
+        with pytest.raises(ValueError):
+            evaluate('a + b', {'a': A, 'b': B[:10]})
+        with pytest.raises(ValueError):
+            evaluate('a', {'a': A}, out=np.empty(A.size, dtype=np.float32))
+
+
+class TestMemory:
+    """Peak memory against the same formula in plain NumPy."""
+
+    N = 2_000_000
+
+    def test_peak_memory_vs_naive_numpy(self):
+        a, b, c = (rng.uniform(1, 5, self.N) for _ in range(3))
+        out = np.empty(self.N)
+        compiled = compile_expression('sqrt(a^2 + b^2) * sin(c) + ln(a * b)')
+
+        def naive():
+            return np.sqrt(a ** 2 + b ** 2) * np.sin(np.radians(c)) + np.log(a * b)
+
+        def blocked():
+            return evaluate(compiled, {'a': a, 'b': b, 'c': c}, out=out).values
+
+        def peak(func):
+            func()
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return peak
+
+        naive_peak, blocked_peak = peak(naive), peak(blocked)
+        np.testing.assert_allclose(out, naive())
+        # naive NumPy holds several full-size temporaries; blocked only a few blocks
+        assert naive_peak > 2 * self.N * 8
+        assert blocked_peak < self.N * 8 / 4
+
+
+class TestExprColumns:
+    """Columns in /api/v1/expr go through the blocked evaluator."""
+
+    def test_columns(self, client):
+        res = client.post('/api/v1/expr', json={'expr': 'sqrt(a) * k', 'vars': {'a': [4, 9, -1], 'k': 2}})
+        assert res.get_json() == {'expr': 'sqrt(a) * k', 'results': [4.0, 6.0, None],
+                                  'errors': [None, None, 'sqrt_negative']}
+
+    @pytest.mark.parametrize('variables,status', [
+        ({'a': [1, 2], 'b': [1]}, 400),
+        ({'a': [[1]], 'b': 1}, 400),
+        ({'a': [1, 2]}, 400),
+    ])
+    def test_invalid(self, client, variables, status):
+        res = client.post('/api/v1/expr', json={'expr': 'a + b', 'vars': variables})
+        assert res.status_code == status
+
+    def test_bad_elements(self, client):
+        res = client.post('/api/v1/expr', json={'expr': 'a + b', 'vars': {'a': [1, None, 'x', True, '3'], 'b': 1}})
+        assert res.get_json()['results'] == [2.0, None, None, None, 4.0]
+        assert res.get_json()['errors'] == [None, 'invalid_input', 'invalid_input', 'invalid_input', None]
+
+    def test_too_many_items(self, app, client):
+        size = app.config['API_BATCH_MAX_ITEMS'] + 1
+        res = client.post('/api/v1/expr', json={'expr': 'a', 'vars': {'a': [0] * size}})
+        assert res.status_code == 413
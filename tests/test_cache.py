@@ -0,0 +1,161 @@
+"""Tests for the memoization layer."""
+import sys
+import os
+import math
+from dataclasses import replace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk import create_app
+from calk.services import calculator_service as svc
+from calk.services.cache import ResultCache, TinyLFUPolicy
+from calk.services.operations import OPERATIONS
+
+
+class CountingOperation:
+    """Wrap a registry entry and count how often it is really executed."""
+
+    def __init__(self, name, **changes):
+        self.calls = 0
+        op = OPERATIONS[name]
+        self.op = replace(op, func=self._count(op.func), **changes)
+
+    def _count(self, func):
+        def wrapped(*args):
+            self.calls += 1
+            return func(*args)
+        return wrapped
+
+
+class TestResultCache:
+    """Hits, misses and key semantics."""
+
+    def test_hit_after_miss(self):
+        cache = ResultCache(8)
+        sin = CountingOperation('sin')
+        assert cache.call(sin.op, 30) == pytest.approx(0.5)
+        assert cache.call(sin.op, 30) == pytest.approx(0.5)
+        assert sin.calls == 1
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_unused_operand_not_in_key(self):
+        cache = ResultCache(8)
+        sqrt = CountingOperation('sqrt')
+        cache.call(sqrt.op, 9, 1)
+        cache.call(sqrt.op, 9, 2)
+        assert sqrt.calls == 1
+
+    def test_signed_zero_keys_differ(self):
+        cache = ResultCache(8)
+        neg = OPERATIONS['negate']
+        assert math.copysign(1, cache.call(neg, 0.0)) == -1
+        assert math.copysign(1, cache.call(neg, -0.0)) == 1
+
+    def test_nan_keys_share_an_entry(self):
+        cache = ResultCache(8)
+        add = CountingOperation('add')
+        assert math.isnan(cache.call(add.op, float('nan'), 1))
+        assert math.isnan(cache.call(add.op, float('nan'), 1))
+        assert add.calls == 1
+
+    def test_domain_errors_are_cached(self):
+        cache = ResultCache(8)
+        div = CountingOperation('div')
+        for _ in range(3):
+            with pytest.raises(svc.DivisionByZeroError, match='division by zero'):
+                cache.call(div.op, 1, 0)
+        assert div.calls == 1
+
+    def test_impure_operations_bypass_cache(self):
+        cache = ResultCache(8)
+        add = CountingOperation('add', pure=False)
+        cache.call(add.op, 1, 2)
+        cache.call(add.op, 1, 2)
+        assert add.calls == 2
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        cache = ResultCache(2)
+        add = OPERATIONS['add']
+        cache.call(add, 1, 1)
+        cache.call(add, 2, 2)
+        cache.call(add, 1, 1)
+        cache.call(add, 3, 3)
+        assert cache.stats()['evictions'] == 1
+        assert cache.key(add, 1, 1) in cache._data
+        assert cache.key(add, 2, 2) not in cache._data
+
+    def test_wrapped_registry_operations(self):
+        cache = ResultCache(8)
+        op = cache.get_operation('power')
+        assert op(2, 8) == 256
+        assert op(2, 8) == 256
+        assert op.evaluate(0, -1) == (None, 'division_by_zero')
+        assert cache.stats()['hits'] == 1
+        assert cache.get_operation('nope') is None
+
+    def test_invalid_configuration(self):
+        with pytest.raises(ValueError):
+            ResultCache(0)
+        with pytest.raises(ValueError):
+            ResultCache(8, policy='fifo')
+
+
+class TestTinyLFU:
+    """Admission keeps frequently used entries."""
+
+    def test_frequency_estimate(self):
+        policy = TinyLFUPolicy(16)
+        for _ in range(5):
+            policy.record('hot')
+        policy.record('cold')
+        assert policy.frequency('hot') >= 5
+        assert policy.frequency('cold') >= 1
+        assert policy.admit('hot', 'cold')
+        assert not policy.admit('cold', 'hot')
+
+    def test_one_off_keys_do_not_flush_hot_entries(self):
+        cache = ResultCache(64, policy='tinylfu')
+        add = OPERATIONS['add']
+        for _ in range(5):
+            for i in range(64):
+                cache.call(add, i, 0)
+        for i in range(1000, 1200):
+            cache.call(add, i, 0)
+        # The sketch may overestimate a few one-off keys, but the hot set survives
+        kept = sum(cache.key(add, i, 0) in cache._data for i in range(64))
+        assert kept >= 60
+        assert cache.stats()['rejections'] >= 190
+
+    def test_aging_halves_counters(self):
+        policy = TinyLFUPolicy(1)
+        for _ in range(9):
+            policy.record('k')
+        assert policy.frequency('k') == 9
+        policy.record('k')
+        assert policy.frequency('k') == 5
+
+
+class TestAppIntegration:
+    """The cache is opt-in through the app config."""
+
+    def test_disabled_by_default(self):
+        assert 'result_cache' not in create_app().extensions
+
+    def test_routes_use_cache(self):
+        class CachedConfig:
+            RESULT_CACHE_SIZE = 16
+            RESULT_CACHE_POLICY = 'tinylfu'
+
+        app = create_app(CachedConfig)
+        client = app.test_client()
+        client.post('/', data={'a': '30', 'b': '', 'operation': 'sin'})
+        client.get('/api/v1/calc?op=sin&a=30')
+        res = client.post('/', data={'a': '1', 'b': '0', 'operation': 'div'})
+        assert 'Cannot divide by zero' in res.data.decode('utf-8')
+        stats = app.extensions['result_cache'].stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 2
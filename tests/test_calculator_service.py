@@ -104,3 +104,56 @@ def test_negate():
 def test_constants():
     assert pytest.approx(svc.get_pi(), 1e-9) == math.pi
     assert pytest.approx(svc.get_e(), 1e-9) == math.e
+
+
+def test_factorial_table_matches_math():
+    for n in (0, 1, 10, 20, 100, 170):
+        assert svc.factorial(n) == float(math.factorial(n))
+
+
+def test_factorial_overflow_is_rejected_early():
+    for n in (171, 100000, 1e300, float('inf')):
+        with pytest.raises(svc.ResultOverflowError):
+            svc.factorial(n)
+
+
+def test_factorial_invalid_arguments():
+    for a in (-1, 2.5, float('nan'), float('-inf')):
+        with pytest.raises(svc.CalculatorError, match='factorial of negative or non-integer'):
+            svc.factorial(a)
+
+
+def test_factorial_worst_case_latency():
+    import time
+    start = time.perf_counter()
+    for n in (170, 171, 10**6, 10**15):
+        try:
+            svc.factorial(n)
+        except svc.ResultOverflowError:
+            pass
+    assert time.perf_counter() - start < 0.01
+
+
+def test_factorial_digits():
+    for n in (0, 1, 5, 25, 100, 1000):
+        assert svc.factorial_digits(n) == len(str(math.factorial(n)))
+
+
+def test_factorial_exact_with_digit_budget():
+    assert svc.factorial_exact(25) == math.factorial(25)
+    assert svc.factorial_exact(100, max_digits=158) == math.factorial(100)
+    with pytest.raises(svc.ResultOverflowError, match='digit budget'):
+        svc.factorial_exact(100, max_digits=157)
+    with pytest.raises(svc.ResultOverflowError):
+        svc.factorial_exact(10**9)
+
+
+def test_gamma_and_lgamma():
+    assert svc.gamma(6) == pytest.approx(120)
+    assert svc.gamma(0.5) == pytest.approx(math.sqrt(math.pi))
+    assert svc.lgamma(100001) == pytest.approx(math.lgamma(100001))
+    with pytest.raises(svc.ResultOverflowError):
+        svc.gamma(200)
+    for a in (0, -3):
+        with pytest.raises(svc.CalculatorError, match='gamma of non-positive integer'):
+            svc.gamma(a)
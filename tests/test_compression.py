@@ -0,0 +1,159 @@
+"""Tests for the response compression middleware."""
+import sys
+import os
+import gzip
+import zlib
+
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk import create_app
+from calk.compression import CompressionMiddleware, GzipEncoder, negotiate
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+@pytest.fixture
+def app():
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _wsgi_client(response, **kwargs):
+    return Client(CompressionMiddleware(response, **kwargs))
+
+
+class TestNegotiation:
+    """Encodings are picked by q-value, then by preference."""
+
+    @pytest.mark.parametrize('header,expected', [
+        ('gzip', 'gzip'),
+        ('deflate, gzip;q=0.5', 'gzip'),
+        ('gzip;q=0', None),
+        ('identity', None),
+        ('', None),
+        ('*', 'gzip'),
+    ])
+    def test_gzip_only(self, header, expected):
+        assert negotiate(header, {'gzip': GzipEncoder}) == expected
+
+    def test_preference_and_q_values(self):
+        encoders = {'br': GzipEncoder, 'gzip': GzipEncoder}
+        assert negotiate('gzip, br', encoders) == 'br'
+        assert negotiate('gzip, br;q=0.5', encoders) == 'gzip'
+
+
+class TestPages:
+    """HTML and JSON from the app are compressed when accepted."""
+
+    def test_index_gzip(self, client):
+        plain = client.get('/')
+        response = client.get('/', headers=GZIP)
+        assert response.content_encoding == 'gzip'
+        assert 'Accept-Encoding' in response.vary and 'Accept-Language' in response.vary
+        assert int(response.headers['Content-Length']) == len(response.data) < len(plain.data)
+        assert gzip.decompress(response.data) == plain.data
+
+    def test_no_accept_encoding_is_identity(self, client):
+        response = client.get('/')
+        assert response.content_encoding is None
+        assert b'<html' in response.data
+
+    def test_head_not_compressed(self, client):
+        assert client.head('/', headers=GZIP).content_encoding is None
+
+    def test_post_result_compressed(self, client):
+        response = client.post('/', data={'operation': 'add', 'a': '2', 'b': '3'}, headers=GZIP)
+        assert b'5.0' in gzip.decompress(response.data)
+
+    def test_small_body_skipped(self, client):
+        response = client.get('/api/v1/calc?op=add&a=1&b=2', headers=GZIP)
+        assert response.content_encoding is None
+        assert response.json['result'] == 3
+
+    def test_disabled(self):
+        class Config:
+            COMPRESSION = False
+        response = create_app(Config).test_client().get('/', headers=GZIP)
+        assert response.content_encoding is None
+
+
+class TestValidators:
+    """Encoded responses have their own ETag, and 304s still work."""
+
+    def test_etag_suffix_and_304(self, client):
+        plain_etag = client.get('/').get_etag()[0]
+        response = client.get('/', headers=GZIP)
+        assert response.get_etag()[0] == plain_etag + '-gzip'
+        again = client.get('/', headers={**GZIP, 'If-None-Match': response.headers['ETag']})
+        assert again.status_code == 304
+        assert again.get_etag()[0] == plain_etag + '-gzip'
+
+    def test_304_of_uncompressed_response_keeps_etag(self, client):
+        url = '/api/v1/calc?op=add&a=1&b=2'
+        response = client.get(url, headers=GZIP)
+        assert response.content_encoding is None
+        again = client.get(url, headers={**GZIP, 'If-None-Match': response.headers['ETag']})
+        assert again.status_code == 304
+        assert again.headers['ETag'] == response.headers['ETag']
+
+    def test_compressed_page_cached(self, app, client):
+        first = client.get('/', headers=GZIP).data
+        second = client.get('/', headers=GZIP).data
+        assert first == second
+        stats = app.extensions['compression'].stats()
+        assert stats['compressed'] == 1 and stats['cache_hits'] == 1
+
+    def test_cache_keyed_by_etag(self, app, client):
+        client.get('/', headers={**GZIP, 'Accept-Language': 'en'})
+        ru = client.get('/', headers={**GZIP, 'Accept-Language': 'ru'})
+        assert 'current_lang=ru' in gzip.decompress(ru.data).decode('utf-8')
+        assert app.extensions['compression'].stats()['compressed'] == 2
+
+
+class TestStreaming:
+    """Streamed responses are compressed chunk by chunk."""
+
+    def test_stream_endpoint(self, app, client):
+        app.config['STREAM_CHUNK_SIZE'] = 2
+        body = 'op,a,b\n' + 'add,1,1\n' * 5
+        response = client.post('/api/v1/stream', data=body, content_type='text/csv', headers=GZIP)
+        assert response.content_encoding == 'gzip'
+        assert 'Content-Length' not in response.headers
+        pieces = list(response.response)
+        assert len(pieces) == 1 + 3 + 1  # header, three chunks, trailer
+        # every piece but the trailer is flushed, so it decodes on arrival
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        assert decoder.decompress(pieces[0]) == b'op,a,b,result,error\n'
+        text = (decoder.decompress(b''.join(pieces[1:])) + decoder.flush()).decode()
+        assert text.splitlines() == ['add,1,1,2.0,'] * 5
+
+
+class TestSkipped:
+    """Responses that must not be transformed pass through untouched."""
+
+    def test_already_encoded(self):
+        app = Response(b'x' * 1000, headers={'Content-Encoding': 'br'}, mimetype='text/plain')
+        response = _wsgi_client(app).get('/', headers=GZIP)
+        assert response.headers['Content-Encoding'] == 'br'
+        assert response.data == b'x' * 1000
+
+    def test_not_compressible_type(self):
+        app = Response(b'x' * 1000, mimetype='image/png')
+        assert _wsgi_client(app).get('/', headers=GZIP).data == b'x' * 1000
+
+    def test_no_transform(self):
+        app = Response(b'x' * 1000, mimetype='text/plain', headers={'Cache-Control': 'no-transform'})
+        assert 'Content-Encoding' not in _wsgi_client(app).get('/', headers=GZIP).headers
+
+    def test_threshold(self):
+        app = Response(b'x' * 100, mimetype='text/plain')
+        assert 'Content-Encoding' not in _wsgi_client(app, min_size=101).get('/', headers=GZIP).headers
+        assert _wsgi_client(app, min_size=100).get('/', headers=GZIP).headers['Content-Encoding'] == 'gzip'
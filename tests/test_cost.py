@@ -0,0 +1,100 @@
+"""Tests for cost estimation and admission control."""
+import sys
+import os
+import math
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk import create_app
+from calk.services import calculator_service as svc
+from calk.services import batch, cost
+from calk.services.operations import OPERATIONS
+
+
+class TestEstimates:
+    """Estimators predict result size without computing it."""
+
+    @pytest.mark.parametrize('a,b', [(2, 100), (10, 999), (-3, 77), (7, 0), (1, 10**9)])
+    def test_power_digits(self, a, b):
+        assert cost.power_digits(a, b) == len(str(abs(a ** b)))
+
+    @pytest.mark.parametrize('n', [0, 1, 10, 100, 1000])
+    def test_factorial_digits(self, n):
+        assert cost.factorial_digits(n) == len(str(math.factorial(n)))
+
+    def test_invalid_arguments_are_cheap(self):
+        assert cost.factorial_digits(-1) == cost.CONSTANT_COST
+        assert cost.power_digits(2, -5) == cost.CONSTANT_COST
+        assert cost.factorial_digits(float('inf')) == math.inf
+
+    @pytest.mark.parametrize('a,b', [(2.5, 10**6), (10, 10**6 + 0.5), (2.5, 0.5)])
+    def test_non_integer_power_is_rejected_not_refused(self, a, b):
+        assert cost.power_digits(a, b) == cost.CONSTANT_COST
+        res = batch.evaluate('power_exact', [a], [b], max_cost=100)
+        assert res.error_at(0) == 'exact_power_invalid'
+
+    def test_float_operations_are_constant(self):
+        for name in ('add', 'power', 'factorial', 'sin'):
+            assert OPERATIONS[name].estimate_cost(1e300, 1e300) == cost.CONSTANT_COST
+
+    def test_estimate_is_fast_for_hostile_input(self):
+        start = time.perf_counter()
+        OPERATIONS['power_exact'].estimate_cost(10**15, 10**15)
+        OPERATIONS['factorial_exact'].estimate_cost(10**15)
+        assert time.perf_counter() - start < 0.01
+
+
+class TestCheck:
+    """cost.check enforces a budget before running anything."""
+
+    def test_within_budget(self):
+        assert cost.check(OPERATIONS['power_exact'], 2, 10, budget=10) == 4
+
+    def test_over_budget(self):
+        with pytest.raises(cost.CostLimitExceeded) as exc:
+            cost.check(OPERATIONS['power_exact'], 2, 10**6, budget=1000)
+        assert isinstance(exc.value, svc.CalculatorError)
+        assert OPERATIONS['power_exact'].error_code(exc.value) == 'too_expensive'
+
+    def test_no_budget(self):
+        assert cost.check(OPERATIONS['factorial_exact'], 10**6) > 10**6
+
+    def test_batch_rows_over_budget_are_skipped(self):
+        res = batch.evaluate('power_exact', [2, 2], [10, 10**7], max_cost=100)
+        assert res.values[0] == 1024
+        assert res.error_at(1) == 'too_expensive'
+
+
+class TestAdmissionInRoutes:
+    """Requests above COST_BUDGET are rejected with a translated message."""
+
+    def test_form_rejects_expensive_request(self, client):
+        start = time.perf_counter()
+        res = client.post('/', data={'a': '2', 'b': '100000000', 'operation': 'power_exact'})
+        assert time.perf_counter() - start < 0.5
+        assert 'This calculation is too expensive to run.' in res.data.decode('utf-8')
+
+    def test_rejection_message_translated(self, client):
+        client.set_cookie('lang', 'de')
+        res = client.post('/', data={'a': '100000', 'b': '', 'operation': 'factorial_exact'})
+        assert 'Diese Berechnung ist zu aufwendig.' in res.data.decode('utf-8')
+
+    def test_api_rejects_expensive_request(self, client):
+        res = client.get('/api/v1/calc?op=power_exact&a=3&b=5000')
+        assert res.status_code == 422
+        assert res.get_json()['error']['code'] == 'too_expensive'
+        assert client.get('/api/v1/calc?op=power_exact&a=3&b=5').get_json()['result'] == 243
+
+    def test_budget_is_configurable(self):
+        class Unlimited:
+            COST_BUDGET = None
+
+        client = create_app(Unlimited).test_client()
+        res = client.get('/api/v1/calc?op=power_exact&a=3&b=5000')
+        assert res.get_json()['result'] == 3 ** 5000
+        # the function's own digit budget still applies
+        res = client.get('/api/v1/calc?op=power_exact&a=3&b=10000')
+        assert res.get_json()['error']['code'] == 'overflow'
@@ -0,0 +1,284 @@
+"""Tests for the infix expression parser, compiler and cache."""
+import sys
+import os
+import math
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk.services import blocked, calculator_service as svc
+from calk.services.expression import (
+    MAX_DEPTH, Call, ExpressionCache, ExpressionError, Number, Variable,
+    compile_expression, compile_tree, evaluate, normalize, optimize, parse,
+)
+
+
+class TestParse:
+    """Precedence, associativity and the AST shape."""
+
+    def test_operators_are_registry_calls(self):
+        assert parse('a + 2 * b') == Call('add', (Variable('a'), Call('mul', (Number(2.0), Variable('b')))))
+
+    @pytest.mark.parametrize('source,expected', [
+        ('1 + 2 * 3', 7),
+        ('(1 + 2) * 3', 9),
+        ('10 - 4 - 3', 3),
+        ('2 ^ 3 ^ 2', 512),
+        ('2 ** 3', 8),
+        ('-2 ^ 2', -4),
+        ('2 ^ -1', 0.5),
+        ('3! ^ 2', 36),
+        ('--3', 3),
+        ('.5e1 + 1E-1', 5.1),
+        ('sqrt(3^2 + 4^2) * sin(30)', 2.5),
+        ('log_base(8, 2)', 3),
+        ('2 * pi', 2 * math.pi),
+        ('ln(e)', 1),
+    ])
+    def test_values(self, source, expected):
+        assert evaluate(source) == pytest.approx(expected)
+
+    @pytest.mark.parametrize('source,position', [
+        ('', 0),
+        ('1 +', 3),
+        ('(1 + 2', 6),
+        ('1 $ 2', 2),
+        ('a b', 2),
+        ('sqrt(1, 2)', 0),
+        ('foo(1)', 0),
+        ('sin', 0),
+        ('factorial_exact(3)', 0),
+        ('sqrt 4', 0),
+        ('2 (3)', 2),
+    ])
+    def test_invalid(self, source, position):
+        with pytest.raises(ExpressionError) as info:
+            parse(source)
+        assert info.value.position == position
+        assert info.value.code == 'invalid_expression'
+
+    def test_nesting_is_bounded(self):
+        with pytest.raises(ExpressionError):
+            parse('(' * (MAX_DEPTH + 1) + '1' + ')' * (MAX_DEPTH + 1))
+        with pytest.raises(ExpressionError):
+            parse('-' * (MAX_DEPTH + 1) + '1')
+
+    @pytest.mark.parametrize('source', [
+        '+'.join(['x'] * 400),
+        '*'.join(['x'] * 400),
+        'x' + '!' * 210,
+        'sqrt(' * 30 + 'x' + ')' * 30 + '!' * 30,
+    ])
+    def test_chains_are_bounded(self, source):
+        with pytest.raises(ExpressionError) as info:
+            parse(source)
+        assert info.value.code == 'invalid_expression'
+
+    def test_chains_within_the_limit(self):
+        assert compile_expression('+'.join(['x'] * MAX_DEPTH))(x=1) == MAX_DEPTH
+        assert compile_expression('3' + '!' * 2)() == 720
+
+    def test_deep_hand_built_trees(self):
+        tree = Variable('x')
+        for _ in range(1000):
+            tree = Call('negate', (Call('square', (tree,)),))
+        with pytest.raises(ExpressionError):
+            compile_tree(tree, optimized=False)
+
+    def test_error_is_calculator_error(self):
+        assert issubclass(ExpressionError, svc.CalculatorError)
+
+
+class TestCompiled:
+    """Compiled expressions call the service functions directly."""
+
+    def test_variables_sorted(self):
+        assert compile_expression('b * a + b').variables == ('a', 'b')
+
+    def test_rebinding(self):
+        hyp = compile_expression('sqrt(a^2 + b^2)')
+        assert hyp(a=3, b=4) == 5
+        assert hyp(a=5, b=12) == 13
+
+    def test_literals_inlined(self):
+        compiled = compile_expression('x * 2.5 + pi')
+        assert '2.5' in compiled.code
+        assert compiled.func.__code__.co_argcount == 1
+
+    def test_degrees_like_the_ui(self):
+        assert evaluate('sin(x)', x=90) == pytest.approx(1)
+
+    @pytest.mark.parametrize('source,code', [
+        ('1 / 0', 'division_by_zero'),
+        ('sqrt(-1)', 'sqrt_negative'),
+        ('ln(0)', 'log_non_positive'),
+        ('log_base(8, 1)', 'log_invalid_base'),
+        ('(-1)!', 'factorial_invalid'),
+        ('exp(1000)', 'overflow'),
+        ('x + 1', 'unbound_variable'),
+    ])
+    def test_evaluate_error_codes(self, source, code):
+        assert compile_expression(source).evaluate() == (None, code)
+
+    def test_unbound_variable_raises(self):
+        with pytest.raises(ExpressionError) as info:
+            evaluate('x + y', x=1)
+        assert info.value.code == 'unbound_variable'
+
+
+class TestOptimize:
+    """Constant folding, identities and hoisting of repeated subexpressions."""
+
+    @pytest.mark.parametrize('source,expected', [
+        ('pi', Number(math.pi)),
+        ('2 * e', Number(2 * math.e)),
+        ('x * (pi / 180)', Call('mul', (Variable('x'), Number(math.pi / 180)))),
+        ('sqrt(16) + 3!', Number(10.0)),
+        ('x * 1 - 0', Variable('x')),
+        ('1 * x / 1', Variable('x')),
+        ('--x', Variable('x')),
+        ('x ^ 1', Variable('x')),
+        ('x ^ 0', Number(1.0)),
+    ])
+    def test_rewrites(self, source, expected):
+        assert optimize(parse(source)) == expected
+
+    @pytest.mark.parametrize('source', ['x + 0', '0 - x', 'x * 0', 'x - -0', 'sqrt(-1) ^ 0'])
+    def test_inexact_identities_kept(self, source):
+        tree, optimized = parse(source), optimize(parse(source))
+        assert isinstance(optimized, Call) and optimized.name == tree.name
+
+    def test_failing_constants_not_folded(self):
+        compiled = compile_expression('1 / 0 + x')
+        assert 'div(1.0, 0.0)' in compiled.explain()
+        assert compiled.evaluate({'x': 1}) == (None, 'division_by_zero')
+
+    def test_signed_zero_literals_differ(self):
+        assert Number(0.0) != Number(-0.0)
+        assert Number(math.nan) == Number(math.nan)
+        assert evaluate('(x - 0) + (x - -0)', x=-0.0) == 0.0
+
+    def test_repeated_subexpressions_hoisted(self):
+        compiled = compile_expression('sin(x * (pi/180)) * sin(x * (pi/180)) + cos(x * (pi/180))')
+        assert compiled.explain().splitlines() == [
+            f't0 = mul(x, {math.pi / 180!r})',
+            't1 = sin(t0)',
+            't2 = mul(t1, t1)',
+            't3 = cos(t0)',
+            'return add(t2, t3)',
+        ]
+        assert compiled.code.count('_sin(') == 1
+        assert compile_expression('sin(x) * cos(x)').explain() == 'return mul(sin(x), cos(x))'
+
+    @pytest.mark.parametrize('source,bindings', [
+        ('sqrt(y) + ln(x) * ln(x)', {'x': 0, 'y': -1}),
+        ('1 / y + sqrt(x) - sqrt(x)', {'x': -1, 'y': 0}),
+        ('ln(y) * (x - 1)! + (x - 1)! / y', {'x': 0.5, 'y': 0}),
+    ])
+    def test_hoisting_keeps_the_first_error(self, source, bindings):
+        tree = parse(source)
+        optimized, naive = compile_tree(tree), compile_tree(tree, optimized=False)
+        code = naive.evaluate(bindings)[1]
+        assert code is not None
+        assert optimized.evaluate(bindings)[1] == code
+        columns = {name: np.array([value], dtype=float) for name, value in bindings.items()}
+        assert blocked.evaluate(optimized, columns).error_at(0) == code
+
+    @pytest.mark.parametrize('source', [
+        'sin(x*(pi/180))^2 + cos(x*(pi/180))^2',
+        'sqrt(a^2 + b^2) / sqrt(a^2 + b^2) + ln(a^2 + b^2)',
+        '(a - b)! + (a - b)! * 2 - e^(a - b)',
+        'x * 1 + x ^ 0 - --x',
+    ])
+    def test_same_results_as_naive(self, source):
+        tree = parse(source)
+        optimized, naive = compile_tree(tree), compile_tree(tree, optimized=False)
+        for a, b in ((5.0, 3.0), (7.0, 2.0), (-0.0, 4.0)):
+            bindings = {'a': a, 'b': b, 'x': a}
+            assert optimized.evaluate(bindings) == pytest.approx(naive.evaluate(bindings), nan_ok=True)
+
+
+class TestCache:
+    """Compiled expressions are reused by normalized source."""
+
+    def test_whitespace_insensitive(self):
+        cache = ExpressionCache()
+        assert cache.get('a+b') is cache.get(' a + b ')
+        assert cache.stats() == {'size': 1, 'hits': 1, 'misses': 1}
+        assert normalize(' a +\tb ') == 'a + b'
+
+    @pytest.mark.parametrize('source,other', [('1 2', '12'), ('x 2', 'x2'), ('a* *b', 'a**b')])
+    def test_whitespace_between_tokens_kept(self, source, other):
+        cache = ExpressionCache()
+        cache.get(other)
+        assert normalize(source) != normalize(other)
+        with pytest.raises(ExpressionError):
+            cache.get(source)
+
+    def test_bounded_lru(self):
+        cache = ExpressionCache(maxsize=2)
+        first = cache.get('1 + 1')
+        cache.get('2 + 2')
+        cache.get('1 + 1')
+        cache.get('3 + 3')
+        assert len(cache) == 2
+        assert cache.get('1 + 1') is first
+        assert cache.stats()['misses'] == 3
+
+    def test_invalid_not_cached(self):
+        cache = ExpressionCache()
+        with pytest.raises(ExpressionError):
+            cache.get('1 +')
+        assert len(cache) == 0
+
+
+class TestExprEndpoint:
+    """Tests for /api/v1/expr."""
+
+    def test_get_with_variables(self, client):
+        res = client.get('/api/v1/expr', query_string={'expr': 'sqrt(a^2+b^2)*sin(30)', 'a': '3', 'b': '4'})
+        assert res.status_code == 200
+        assert res.get_json()['result'] == pytest.approx(2.5)
+
+    def test_post_json(self, client):
+        res = client.post('/api/v1/expr', json={'expr': 'x! + pi', 'vars': {'x': 3}})
+        assert res.get_json()['result'] == pytest.approx(6 + math.pi)
+
+    def test_post_form(self, client):
+        res = client.post('/api/v1/expr', data={'expr': 'a / 4', 'a': '2'})
+        assert res.get_json() == {'expr': 'a / 4', 'result': 0.5}
+
+    def test_uses_app_cache(self, app, client):
+        cache = app.extensions['expressions']
+        cache.clear()
+        for a in ('1', '2', '3'):
+            client.get('/api/v1/expr', query_string={'expr': 'a * 10', 'a': a})
+        assert len(cache) == 1
+
+    @pytest.mark.parametrize('params,status,code', [
+        ({'expr': '1 +'}, 400, 'invalid_expression'),
+        ({'expr': 'a + 1'}, 400, 'unbound_variable'),
+        ({'expr': 'a + 1', 'a': 'x'}, 400, 'invalid_input'),
+        ({}, 400, 'invalid_input'),
+        ({'expr': '1 / 0'}, 422, 'division_by_zero'),
+        ({'expr': '+'.join(['1'] * 400)}, 400, 'invalid_expression'),
+        ({'expr': '3' + '!' * 210}, 400, 'invalid_expression'),
+    ])
+    def test_errors(self, client, params, status, code):
+        res = client.get('/api/v1/expr', query_string=params)
+        assert res.status_code == status
+        assert res.get_json()['error']['code'] == code
+
+    def test_explain(self, client):
+        res = client.get('/api/v1/expr', query_string={'expr': 'x * (pi / 180) + x * (pi / 180)',
+                                                        'x': '90', 'explain': '1'})
+        body = res.get_json()
+        assert body['result'] == pytest.approx(math.pi)
+        assert body['plan'] == [f't0 = mul(x, {math.pi / 180!r})', 'return add(t0, t0)']
+        assert 'plan' not in client.get('/api/v1/expr?expr=1').get_json()
+
+    def test_invalid_json_body(self, client):
+        res = client.post('/api/v1/expr', json=[1, 2])
+        assert res.status_code == 400
@@ -0,0 +1,93 @@
+"""Tests for the per-locale page shell stitched with the result region."""
+import sys
+import os
+
+import pytest
+from flask import render_template, template_rendered
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk import create_app
+from calk.routes.main import RESULT_PLACEHOLDER
+from calk.services.operations import ERROR_MESSAGES
+
+
+@pytest.fixture
+def app():
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def rendered(app):
+    names = []
+
+    def record(sender, template, context, **extra):
+        names.append(template.name)
+    template_rendered.connect(record, app)
+    yield names
+    template_rendered.disconnect(record, app)
+
+
+def _full_render(app, locale, **context):
+    with app.test_request_context('/', headers={'Accept-Language': locale}):
+        return render_template('index.html', current_lang=locale, **context).encode('utf-8')
+
+
+class TestStitching:
+    """POSTs render only the result region once the shell is cached."""
+
+    def test_shell_rendered_once(self, client, rendered):
+        for a in ('1', '2', '3'):
+            response = client.post('/', data={'operation': 'add', 'a': a, 'b': '1'})
+            assert f'{float(a) + 1}'.encode() in response.data
+        assert rendered == ['index.html', '_result.html', '_result.html', '_result.html']
+
+    @pytest.mark.parametrize('locale,form,result,error', [
+        ('en', {'operation': 'add', 'a': '2', 'b': '3'}, 5.0, None),
+        ('ru', {'operation': 'div', 'a': '1', 'b': '0'}, None, ERROR_MESSAGES['division_by_zero']),
+        ('de', {'operation': 'add', 'a': 'x'}, None, 'Invalid input for A'),
+    ])
+    def test_same_bytes_as_full_render(self, app, client, locale, form, result, error):
+        if error is not None:
+            error = app.extensions['catalogs'].gettext(locale, error)
+        response = client.post('/', data=form, headers={'Accept-Language': locale})
+        assert response.data == _full_render(app, locale, result=result, error=error)
+        assert int(response.headers['Content-Length']) == len(response.data)
+
+    def test_halves_stored_pre_split(self, app, client):
+        client.post('/', data={'operation': 'add', 'a': '1', 'b': '1'})
+        shell = app.extensions['page_cache'].get(('en', 'shell'))
+        head, tail = shell.parts
+        assert head + RESULT_PLACEHOLDER.encode() + tail == shell.body
+        response = client.post('/', data={'operation': 'add', 'a': '2', 'b': '2'})
+        chunks = list(response.response)
+        assert chunks[0] is head and chunks[2] is tail
+
+    def test_placeholder_never_leaks(self, client):
+        client.get('/')
+        response = client.post('/', data={'operation': 'sqrt', 'a': '9'})
+        assert RESULT_PLACEHOLDER.encode() not in response.data
+        assert RESULT_PLACEHOLDER.encode() not in client.get('/').data
+
+    def test_shell_per_locale(self, app, client):
+        client.post('/', data={'operation': 'add', 'a': '1', 'b': '1'}, headers={'Accept-Language': 'fr'})
+        client.post('/', data={'operation': 'add', 'a': '1', 'b': '1'}, headers={'Accept-Language': 'ka'})
+        assert set(app.extensions['page_cache']._pages) == {('fr', 'shell'), ('ka', 'shell')}
+
+    def test_shell_invalidated_with_locale(self, app, client, rendered):
+        client.post('/', data={'operation': 'add', 'a': '1', 'b': '1'})
+        app.extensions['page_cache'].invalidate('en')
+        client.post('/', data={'operation': 'add', 'a': '1', 'b': '1'})
+        assert rendered.count('index.html') == 2
+
+    def test_without_page_cache(self):
+        class Config:
+            PAGE_CACHE = False
+        app = create_app(Config)
+        response = app.test_client().post('/', data={'operation': 'add', 'a': '2', 'b': '3'})
+        assert response.data == _full_render(app, 'en', result=5.0, error=None)
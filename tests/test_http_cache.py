@@ -0,0 +1,111 @@
+"""Tests for the HTTP caching policy layer."""
+import sys
+import os
+import re
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk import create_app
+
+
+def _static_url(page, path):
+    return re.search(rf'"(/static/{re.escape(path)}\?v=[0-9a-f]+)"', page.data.decode('utf-8')).group(1)
+
+
+class TestStaticAssets:
+    """Versioned static URLs are cached forever, unversioned ones briefly."""
+
+    def test_url_for_adds_content_version(self, client):
+        url = _static_url(client.get('/'), 'css/style.css')
+        assert url.startswith('/static/css/style.css?v=')
+
+    def test_versioned_is_immutable(self, client):
+        url = _static_url(client.get('/'), 'css/style.css')
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.cache_control.immutable
+        assert response.cache_control.max_age == 31536000
+        assert response.cache_control.public
+
+    def test_unversioned_is_short_lived(self, client):
+        response = client.get('/static/css/style.css')
+        assert response.status_code == 200
+        assert response.cache_control.max_age == 3600
+        assert not response.cache_control.immutable
+
+    def test_missing_file_not_stored(self, client):
+        response = client.get('/static/nope.css')
+        assert response.status_code == 404
+        assert response.cache_control.no_store
+
+    def test_version_is_stable(self, app):
+        policy = app.extensions['http_cache']
+        assert policy.static_version('css/style.css') == policy.static_version('css/style.css')
+        assert policy.static_version('missing.css') is None
+
+
+class TestDynamicResponses:
+    """Locale negotiation, validators and unsafe methods."""
+
+    def test_index_varies_on_locale_inputs(self, client):
+        response = client.get('/')
+        assert set(response.vary) >= {'Cookie', 'Accept-Language'}
+        assert response.cache_control.public
+        assert response.get_etag()[0]
+
+    def test_post_is_no_store(self, client):
+        response = client.post('/', data={'operation': 'add', 'a': '1', 'b': '2'})
+        assert response.cache_control.no_store
+        assert 'Accept-Language' in response.vary
+
+    def test_language_redirect_is_no_store(self, client):
+        response = client.get('/?lang=ru')
+        assert response.status_code == 302
+        assert response.cache_control.no_store
+
+    def test_api_get_has_validators_and_no_vary(self, client):
+        response = client.get('/api/v1/calc?op=add&a=1&b=2')
+        etag = response.get_etag()[0]
+        assert etag and response.cache_control.max_age == 86400
+        assert 'Accept-Language' not in response.vary
+        again = client.get('/api/v1/calc?op=add&a=1&b=2', headers={'If-None-Match': f'"{etag}"'})
+        assert again.status_code == 304
+
+    def test_api_errors_are_not_stored(self, client):
+        response = client.get('/api/v1/calc?op=div&a=1&b=0')
+        assert response.status_code == 422
+        assert response.cache_control.no_store
+
+    def test_api_post_is_no_store(self, client):
+        response = client.post('/api/v1/calc', json={'op': 'add', 'a': 1, 'b': 2})
+        assert response.cache_control.no_store
+
+
+class TestConfiguration:
+    """Policies are configurable per endpoint."""
+
+    def test_per_endpoint_override(self):
+        class Config:
+            HTTP_CACHE_CONTROL = {'main.index': 'private, max-age=5'}
+        response = create_app(Config).test_client().get('/')
+        assert response.cache_control.private
+        assert response.cache_control.max_age == 5
+
+    def test_default_applies_to_unlisted_endpoints(self):
+        class Config:
+            HTTP_CACHE_CONTROL = {}
+            HTTP_CACHE_DEFAULT = 'public, max-age=7'
+        response = create_app(Config).test_client().get('/api/v1/calc?op=add&a=1&b=2')
+        assert response.cache_control.max_age == 7
+
+    @pytest.mark.parametrize('setting', ['HTTP_CACHE_DEFAULT', 'HTTP_CACHE_UNCACHEABLE'])
+    def test_none_leaves_header_alone(self, setting):
+        class Config:
+            HTTP_CACHE_CONTROL = {}
+        setattr(Config, setting, None)
+        client = create_app(Config).test_client()
+        response = client.get('/api/v1/calc?op=add&a=1&b=2') if setting == 'HTTP_CACHE_DEFAULT' \
+            else client.post('/api/v1/calc', json={'op': 'add', 'a': 1, 'b': 2})
+        assert 'Cache-Control' not in response.headers
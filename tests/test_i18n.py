@@ -0,0 +1,231 @@
+"""Tests for the frozen translation catalogs."""
+import sys
+import os
+import shutil
+import threading
+import time
+
+import pytest
+import flask_babel
+from flask import request
+from babel.messages.mofile import write_mo
+from babel.messages.pofile import read_po
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk import create_app
+from calk import i18n
+from calk.services.operations import ERROR_MESSAGES
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+LOCALES = ['en', 'ru', 'fr', 'de', 'es', 'it', 'zh', 'ka', 'hy']
+
+with open(os.path.join(ROOT, 'messages.pot'), 'rb') as f:
+    MSGIDS = [m.id for m in read_po(f) if m.id and isinstance(m.id, str)]
+
+
+@pytest.fixture(scope='module')
+def app():
+    return create_app()
+
+
+class TestCatalogs:
+    """Tables are loaded for every locale and match Flask-Babel."""
+
+    def test_all_locales_loaded(self, app):
+        catalogs = app.extensions['catalogs']
+        assert set(catalogs.tables) == set(LOCALES)
+        assert catalogs.gettext('ru', 'Add') == 'Сложить'
+
+    def test_tables_are_read_only(self, app):
+        with pytest.raises(TypeError):
+            app.extensions['catalogs'].tables['ru']['Add'] = 'x'
+
+    @pytest.mark.parametrize('locale', LOCALES)
+    def test_same_as_flask_babel(self, app, locale):
+        catalogs = app.extensions['catalogs']
+        with app.test_request_context(headers={'Accept-Language': locale}):
+            for msgid in MSGIDS:
+                assert catalogs.gettext(locale, msgid) == flask_babel.gettext(msgid), msgid
+
+    def test_fallbacks(self, app):
+        catalogs = app.extensions['catalogs']
+        assert catalogs.gettext('ru', 'No such message') == 'No such message'
+        assert catalogs.gettext('xx', 'Add') == 'Add'
+
+    def test_interpolation(self):
+        catalogs = i18n.Catalogs([], ['en'])
+        assert catalogs.gettext('en', '%(n)s items', n=3) == '3 items'
+        assert catalogs.gettext('en', '100%') == '100%'
+
+
+class TestRequestGettext:
+    """Routes and templates translate with the request's locale."""
+
+    def test_route_gettext(self, app):
+        with app.test_request_context(headers={'Accept-Language': 'ru'}):
+            assert i18n.gettext('Unknown operation') == app.extensions['catalogs'].gettext(
+                'ru', 'Unknown operation')
+            assert i18n.current_translator() is app.extensions['catalogs'].translator('ru')
+
+    def test_rendered_page(self, app):
+        client = app.test_client()
+        text = client.get('/', headers={'Accept-Language': 'ru'}).data.decode('utf-8')
+        assert 'Сложить' in text
+        error = client.post('/', data={'operation': 'div', 'a': '1', 'b': '0'},
+                            headers={'Accept-Language': 'ru'}).data.decode('utf-8')
+        assert app.extensions['catalogs'].gettext('ru', ERROR_MESSAGES['division_by_zero']) in error
+
+    def test_error_messages_translated(self, app):
+        catalogs = app.extensions['catalogs']
+        for locale in app.extensions['locales'].supported:
+            po = os.path.join(ROOT, 'translations', locale, 'LC_MESSAGES', 'messages.po')
+            with open(po, 'rb') as f:
+                catalog = read_po(f, locale=locale)
+            missing = [message for message in ERROR_MESSAGES.values() if not catalog.get(message)]
+            assert missing == [], locale
+        assert catalogs.gettext('ru', ERROR_MESSAGES['domain_error']) == 'Результат не является действительным числом.'
+        text = app.test_client().post('/', data={'operation': 'sin', 'a': 'inf'},
+                                      headers={'Accept-Language': 'ru'}).data.decode('utf-8')
+        assert 'Результат не является действительным числом.' in text
+
+
+class TestLocaleNegotiation:
+    """Accept-Language negotiation is memoized and driven by LANGUAGES."""
+
+    @pytest.mark.parametrize('header', [
+        'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+        'de-CH, fr;q=0.9',
+        'pt-BR,pt;q=0.9',
+        'zh-CN',
+        '*',
+        '',
+        'hy;q=0.1, ka;q=0.5',
+    ])
+    def test_same_as_werkzeug(self, app, header):
+        with app.test_request_context(headers={'Accept-Language': header}):
+            expected = request.accept_languages.best_match(LOCALES) or 'en'
+        assert app.extensions['locales'].negotiate(header) == expected
+
+    def test_memoized(self):
+        negotiator = i18n.LocaleNegotiator(LOCALES)
+        for _ in range(3):
+            assert negotiator.negotiate('fr-FR,fr;q=0.9') == 'fr'
+        assert negotiator.stats() == {'size': 1, 'hits': 2, 'misses': 1}
+
+    def test_bounded(self):
+        negotiator = i18n.LocaleNegotiator(LOCALES, maxsize=2)
+        for header in ('ru', 'fr', 'de'):
+            negotiator.negotiate(header)
+        assert negotiator.stats()['size'] == 2
+        negotiator.negotiate('ru')
+        assert negotiator.stats()['misses'] == 4
+
+    def test_cache_disabled(self):
+        negotiator = i18n.LocaleNegotiator(LOCALES, maxsize=0)
+        assert negotiator.negotiate('ru') == 'ru'
+        assert negotiator.negotiate('ru') == 'ru'
+        assert negotiator.stats() == {'size': 0, 'hits': 0, 'misses': 2}
+
+        class Config:
+            LOCALE_CACHE_SIZE = 0
+        assert create_app(Config).test_client().get('/', headers={'Accept-Language': 'fr'}).status_code == 200
+
+    def test_concurrent_eviction(self):
+        negotiator = i18n.LocaleNegotiator(LOCALES, maxsize=4)
+
+        def negotiate(start):
+            for i in range(start, start + 2000):
+                negotiator.negotiate(f'fr;q=0.{i % 10}, x-{i}')
+
+        threads = [threading.Thread(target=negotiate, args=(n * 1000,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert negotiator.stats()['size'] <= 4
+
+    def test_cookie_wins(self, app):
+        client = app.test_client()
+        client.set_cookie('lang', 'de')
+        text = client.get('/', headers={'Accept-Language': 'ru'}).data.decode('utf-8')
+        assert 'current_lang=de' in text
+
+    def test_languages_config_is_the_source(self):
+        class Config:
+            LANGUAGES = {'en': 'English', 'ru': 'Русский'}
+        client = create_app(Config).test_client()
+        assert client.get('/?lang=ru').status_code == 302
+        assert client.get('/?lang=fr').status_code == 200
+        text = client.get('/', headers={'Accept-Language': 'fr, ru;q=0.5'}).data.decode('utf-8')
+        assert 'current_lang=ru' in text
+
+
+class TestCatalogHotReload:
+    """Changed .mo files are swapped in per locale without a restart."""
+
+    @pytest.fixture
+    def translations(self, tmp_path):
+        shutil.copytree(os.path.join(ROOT, 'translations'), tmp_path / 'translations')
+        return tmp_path / 'translations'
+
+    @staticmethod
+    def write_catalog(translations, locale, add_label):
+        po = os.path.join(ROOT, 'translations', locale, 'LC_MESSAGES', 'messages.po')
+        with open(po, 'rb') as f:
+            catalog = read_po(f, locale=locale)
+        catalog.get('Add').string = add_label
+        mo = translations / locale / 'LC_MESSAGES' / 'messages.mo'
+        with open(mo, 'wb') as f:
+            write_mo(f, catalog)
+        # make sure the change is visible even on coarse mtime filesystems
+        stat = os.stat(mo)
+        os.utime(mo, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def make_app(self, translations, interval=3600):
+        class Config:
+            BABEL_TRANSLATION_DIRECTORIES = str(translations)
+            CATALOG_RELOAD_INTERVAL = interval
+        return create_app(Config)
+
+    def test_poll_swaps_one_locale(self, translations):
+        app = self.make_app(translations)
+        client = app.test_client()
+        for locale in ('ru', 'en'):
+            client.get('/', headers={'Accept-Language': locale})
+        assert len(app.extensions['page_cache']) == 2
+
+        self.write_catalog(translations, 'ru', 'Плюс')
+        assert app.extensions['catalog_watcher'].poll() == ['ru']
+        assert app.extensions['catalogs'].gettext('ru', 'Add') == 'Плюс'
+        # only the ru page was dropped
+        assert len(app.extensions['page_cache']) == 1
+        text = client.get('/', headers={'Accept-Language': 'ru'}).data.decode('utf-8')
+        assert 'Плюс' in text and 'Сложить' not in text
+        assert app.extensions['catalog_watcher'].poll() == []
+
+    def test_request_keeps_its_catalog(self, translations):
+        app = self.make_app(translations)
+        with app.test_request_context(headers={'Accept-Language': 'ru'}):
+            translate = i18n.current_translator()
+            self.write_catalog(translations, 'ru', 'Плюс')
+            app.extensions['catalog_watcher'].poll()
+            assert i18n.gettext('Add') == translate('Add') == 'Сложить'
+        assert app.extensions['catalogs'].gettext('ru', 'Add') == 'Плюс'
+
+    def test_broken_catalog_keeps_previous(self, translations):
+        app = self.make_app(translations)
+        (translations / 'ru' / 'LC_MESSAGES' / 'messages.mo').write_bytes(b'not a catalog')
+        watcher = app.extensions['catalog_watcher']
+        assert watcher.poll() == []
+        assert watcher.stats() == {'reloads': 0, 'errors': 1}
+        assert app.extensions['catalogs'].gettext('ru', 'Add') == 'Сложить'
+
+    def test_background_thread(self, translations):
+        app = self.make_app(translations, interval=0.05)
+        self.write_catalog(translations, 'fr', 'Plus')
+        deadline = time.monotonic() + 10
+        while app.extensions['catalogs'].gettext('fr', 'Add') != 'Plus':
+            assert time.monotonic() < deadline, 'catalog was not reloaded'
+            time.sleep(0.02)
+        app.extensions['catalog_watcher'].stop()
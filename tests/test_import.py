@@ -0,0 +1,67 @@
+"""Import-time regression tests: the service layer must not pull in Flask."""
+import sys
+import os
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WEB_MODULES = ('flask', 'flask_babel', 'jinja2', 'werkzeug', 'babel')
+
+# Generous for slow CI machines; the import takes ~4 ms on a laptop,
+# importing Flask and Flask-Babel took several hundred.
+MAX_IMPORT_SECONDS = 0.025
+
+
+def _run(code, *args, stdin=None):
+    return subprocess.run([sys.executable, *args, '-c', code], cwd=ROOT, input=stdin,
+                          capture_output=True, text=True, check=True)
+
+
+def _loaded_web_modules(module):
+    code = (f'import sys, {module}\n'
+            f'print(" ".join(m for m in {WEB_MODULES!r} if m in sys.modules))')
+    return _run(code).stdout.split()
+
+
+class TestLightweightImport:
+    """Pure-service imports stay free of web dependencies."""
+
+    @pytest.mark.parametrize('module', [
+        'calk',
+        'calk.services.calculator_service',
+        'calk.services.operations',
+        'calk.services.cost',
+        'calk.services.expression',
+        'calk.services.ipc',
+        'calk.__main__',
+    ])
+    def test_no_web_dependencies(self, module):
+        assert _loaded_web_modules(module) == []
+
+    def test_create_app_imports_flask_lazily(self):
+        code = ('import sys, calk\n'
+                'assert "flask" not in sys.modules\n'
+                'app = calk.create_app()\n'
+                'print(type(app).__module__, calk.babel is not None)')
+        assert _run(code).stdout.split() == ['flask.app', 'True']
+
+    def test_service_import_time(self):
+        # -X importtime reports cumulative microseconds per module on stderr
+        def measure():
+            stderr = _run('import calk.services.calculator_service', '-X', 'importtime').stderr
+            for line in stderr.splitlines():
+                fields = [f.strip() for f in line.split('|')]
+                if fields[-1] == 'calk.services.calculator_service':
+                    return int(fields[1]) / 1e6
+            raise AssertionError(stderr)
+
+        assert min(measure() for _ in range(3)) < MAX_IMPORT_SECONDS
+
+
+def test_cli_evaluates_csv_from_stdin():
+    out = _run('from calk.__main__ import main; main([])',
+               stdin='op,a,b\nadd,1,2\ndiv,1,0\n').stdout
+    assert out.splitlines() == ['op,a,b,result,error', 'add,1,2,3.0,', 'div,1,0,,division_by_zero']
@@ -0,0 +1,307 @@
+"""Tests for the shared-memory batch interface over a Unix socket."""
+import sys
+import os
+import json
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from calk.services import batch, blocked
+from calk.services.ipc import ERROR_CODES, Client, RemoteError, Server
+from calk.services.operations import ERROR_MESSAGES
+from calk.services.parallel import ParallelEvaluator
+
+rng = np.random.default_rng(0)
+
+
+def _serve(path, **kwargs):
+    server = Server(path, **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+
+@pytest.fixture
+def socket_path():
+    # AF_UNIX paths are short; keep them out of deep pytest tmp dirs
+    directory = tempfile.mkdtemp(prefix='calk-')
+    yield os.path.join(directory, 'calk.sock')
+    os.rmdir(directory)
+
+
+@pytest.fixture
+def server(socket_path, tmp_path):
+    server, thread = _serve(socket_path, max_cost=1000, files=str(tmp_path))
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.fixture
+def client(server):
+    with Client(server.server_address) as client:
+        yield client
+
+
+class TestEvaluate:
+    """Results are written into the client's output column in place."""
+
+    def test_operation(self, client):
+        a, b, out = client.empty(1000), client.empty(1000), client.empty(1000)
+        a[:] = rng.uniform(-5, 5, 1000)
+        b[:] = rng.uniform(-5, 5, 1000)
+        b[::100] = 0
+        errors = client.evaluate('div', out=out, a=a, b=b)
+        expected = batch.evaluate('div', a, b)
+        np.testing.assert_array_equal(out, expected.values)
+        assert errors == {'division_by_zero': 10}
+
+    def test_expression(self, client):
+        a, out = client.empty(5000), client.empty(5000)
+        a[:] = rng.uniform(-5, 5, 5000)
+        errors = client.evaluate(expr='sqrt(a) * k', out=out, a=a, k=client.empty(5000))
+        assert errors == {'sqrt_negative': int(np.count_nonzero(a < 0))}
+        np.testing.assert_array_equal(np.isnan(out), a < 0)
+
+    def test_error_column(self, client):
+        a, out, codes = client.empty(4), client.empty(4), client.empty(4, np.uint8)
+        a[:] = [4, -1, 0, 9]
+        client.evaluate('sqrt', out=out, errors=codes, a=a)
+        assert client.error_codes(codes) == [None, 'sqrt_negative', None, None]
+        assert out[[0, 2, 3]].tolist() == [2, 0, 3]
+
+    def test_error_codes_of_exact_operations(self, client):
+        a, b, out, codes = client.empty(3), client.empty(3), client.empty(3), client.empty(3, np.uint8)
+        a[:], b[:] = [2, 2.5, 3], [10, 2, 0.5]
+        errors = client.evaluate('power_exact', out=out, errors=codes, a=a, b=b)
+        assert errors == {'exact_power_invalid': 2}
+        assert client.error_codes(codes) == [None, 'exact_power_invalid', 'exact_power_invalid']
+        assert out[0] == 1024
+
+    def test_error_codes_cover_all_messages(self):
+        assert set(ERROR_MESSAGES) <= set(ERROR_CODES)
+        assert ERROR_CODES[:len(batch.ERROR_CODES)] == batch.ERROR_CODES
+
+    def test_constants(self, client):
+        out, codes = client.empty(4), client.empty(4, np.uint8)
+        assert client.evaluate('pi', out=out) == {}
+        assert out.tolist() == [np.pi] * 4
+        assert client.evaluate(expr='2 + 3', out=out) == {}
+        assert out.tolist() == [5.0] * 4
+        assert client.evaluate(expr='1 / 0', out=out, errors=codes) == {'division_by_zero': 4}
+        assert client.error_codes(codes) == ['division_by_zero'] * 4
+
+    def test_empty_columns(self, client):
+        block = client.empty(10)
+        assert client.evaluate('sqrt', out=block[:0], a=block[:0]) == {}
+
+    def test_slices_of_one_segment(self, client):
+        block = client.empty(3000)
+        a, b, out = block[:1000], block[1000:2000], block[2000:]
+        a[:], b[:] = np.arange(1000), 2
+        client.evaluate('power', out=out, a=a, b=b)
+        assert out.tolist() == (np.arange(1000.0) ** 2).tolist()
+
+    def test_in_place(self, client):
+        a = client.empty(1000)
+        a[:] = np.arange(1000)
+        client.evaluate(expr='a * 2 + 1', out=a, a=a)
+        assert a.tolist() == (np.arange(1000.0) * 2 + 1).tolist()
+
+    @pytest.mark.parametrize('op,values,others,code', [
+        ('sqrt', [-4, 4, 9], None, 'sqrt_negative'),
+        ('ln', [1, 0, -2], None, 'log_non_positive'),
+        ('reciprocal', [1, 0, 2], None, 'division_by_zero'),
+        ('div', [1, 3, 2], [2, 0, 4], 'division_by_zero'),
+    ])
+    def test_in_place_errors(self, client, op, values, others, code):
+        block = client.empty(6)
+        a, b = block[:3], block[3:]
+        a[:] = values
+        b[:] = others or 0
+        inputs = {'a': a, 'b': b} if others else {'a': a}
+        expected = batch.evaluate(op, *(np.array(column) for column in inputs.values()))
+        codes = client.empty(3, np.uint8)
+        errors = client.evaluate(op, out=a, errors=codes, **inputs)
+        assert errors == {code: int(np.count_nonzero(expected.errors[code]))}
+        assert client.error_codes(codes) == [code if failed else None for failed in expected.errors[code]]
+        np.testing.assert_array_equal(a, expected.values)
+
+    def test_in_place_memory_mapped_file(self, client, tmp_path):
+        a = client.memmap(str(tmp_path / 'a.f64'), 3, mode='w+')
+        a[:] = [-4, 4, 9]
+        a.flush()
+        assert client.evaluate('sqrt', out=a, a=a) == {'sqrt_negative': 1}
+        assert np.isnan(a[0]) and a[1:].tolist() == [2, 3]
+
+    @pytest.mark.parametrize('dtype', ['float32', 'int64', 'int32'])
+    def test_input_dtypes(self, client, dtype):
+        a, out = client.empty(100, dtype), client.empty(100)
+        a[:] = np.arange(100)
+        client.evaluate('square', out=out, a=a)
+        assert out.tolist() == (np.arange(100.0) ** 2).tolist()
+
+    def test_exact_operations_with_cost_budget(self, client):
+        a, out = client.empty(3), client.empty(3)
+        a[:] = [5, 1e6, -1]
+        client.evaluate('factorial_exact', out=out, a=a)
+        expected = batch.evaluate('factorial_exact', a, max_cost=1000)
+        np.testing.assert_array_equal(out, expected.values)
+        assert expected.errors['too_expensive'][1]
+
+    def test_memory_mapped_files(self, client, tmp_path):
+        a = client.memmap(str(tmp_path / 'a.f64'), 1000, mode='w+')
+        out = client.memmap(str(tmp_path / 'out.f64'), 1000, offset=4096, mode='w+')
+        a[:] = np.arange(1000)
+        a.flush()
+        client.evaluate('sqrt', out=out, a=a)
+        assert out.tolist() == np.sqrt(np.arange(1000.0)).tolist()
+        stored = np.fromfile(tmp_path / 'out.f64', dtype=np.float64)[512:]
+        assert stored.tolist() == out.tolist()
+
+    def test_many_requests_per_connection(self, client, server):
+        a, out = client.empty(10), client.empty(10)
+        a[:] = np.arange(10)
+        for k in range(50):
+            client.evaluate(expr=f'a + {k}', out=out, a=a)
+            assert out[0] == k
+        assert server.stats() == {'requests': 50, 'failures': 0}
+
+    def test_parallel_evaluator(self, socket_path):
+        evaluator = ParallelEvaluator(workers=2, min_items=0)
+        server, thread = _serve(socket_path, evaluator=evaluator)
+        try:
+            with Client(socket_path) as client:
+                a, out = client.empty(100000), client.empty(100000)
+                a[:] = rng.uniform(0, 10, a.size)
+                client.evaluate(expr='sqrt(a) + ln(a)', out=out, a=a)
+                expected = blocked.evaluate('sqrt(a) + ln(a)', {'a': np.array(a)})
+                np.testing.assert_array_equal(out, expected.values)
+            assert evaluator.stats()['parallel_calls'] == 1
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+            evaluator.shutdown()
+
+
+class TestInvalid:
+    """Bad descriptors are rejected without touching memory."""
+
+    def test_unknown_operation(self, client):
+        a = client.empty(3)
+        with pytest.raises(RemoteError) as e:
+            client.evaluate('nope', out=a, a=a)
+        assert e.value.code == 'invalid_input'
+
+    def test_invalid_expression(self, client):
+        a = client.empty(3)
+        with pytest.raises(RemoteError) as e:
+            client.evaluate(expr='a +', out=a, a=a)
+        assert e.value.code == 'invalid_expression'
+        with pytest.raises(RemoteError) as e:
+            client.evaluate(expr='a + b', out=a, a=a)
+        assert e.value.code == 'unbound_variable'
+
+    @pytest.mark.parametrize('key,value', [
+        ('length', -1),
+        ('length', 10 ** 6),
+        ('dtype', 'complex128'),
+        ('inputs', []),
+        ('out', {'segment': 'calk-missing-segment'}),
+        ('out', {'file': '/nonexistent/out.f64'}),
+        ('out', lambda region: {**region, 'offset': 8}),
+        ('out', lambda region: {**region, 'offset': -8}),
+        ('out', {'offset': 0}),
+        ('out', None),
+    ])
+    def test_bad_descriptors(self, client, server, key, value):
+        a = client.empty(10)
+        descriptor = {'op': 'sqrt', 'length': 10, 'dtype': 'float64',
+                      'inputs': {'a': client.locate(a)}, 'out': client.locate(a)}
+        descriptor[key] = value(descriptor[key]) if callable(value) else value
+        reply = client.request(descriptor)
+        assert reply['ok'] is False
+        assert reply['error']['code'] == 'invalid_input'
+        assert server.stats()['failures'] == 1
+
+    def test_not_json(self, server):
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.connect(server.server_address)
+            sock.sendall(b'{nope\n')
+            reply = json.loads(sock.makefile('rb').readline())
+        assert reply['error']['code'] == 'invalid_input'
+
+    def test_unexpected_failure_replies(self, client, server, monkeypatch):
+        def broken(*args, **kwargs):
+            raise RuntimeError('kernel exploded')
+        monkeypatch.setattr(blocked, 'evaluate', broken)
+        a = client.empty(3)
+        with pytest.raises(RemoteError) as e:
+            client.evaluate('sqrt', out=a, a=a)
+        assert e.value.code == 'calculation_error'
+        assert client.evaluate('power_exact', out=a, a=a, b=a) == {}
+
+    def test_files_confined_to_directory(self, client, tmp_path):
+        outside = tempfile.NamedTemporaryFile(suffix='.f64')
+        outside.write(bytes(80))
+        outside.flush()
+        os.symlink(outside.name, tmp_path / 'link.f64')
+        a = client.empty(10)
+        for path in (outside.name, str(tmp_path / 'link.f64'), str(tmp_path / '..' / 'x.f64')):
+            reply = client.request({'op': 'sqrt', 'length': 10, 'inputs': {'a': client.locate(a)},
+                                    'out': {'file': path, 'offset': 0}})
+            assert reply['ok'] is False
+            assert 'inside' in reply['error']['message']
+        assert bytes(open(outside.name, 'rb').read()) == bytes(80)
+        outside.close()
+
+    def test_files_disabled_by_default(self, socket_path, tmp_path):
+        server, thread = _serve(socket_path)
+        try:
+            with Client(socket_path) as client:
+                a = client.memmap(str(tmp_path / 'a.f64'), 10, mode='w+')
+                with pytest.raises(RemoteError) as e:
+                    client.evaluate('sqrt', out=a, a=a)
+                assert 'disabled' in str(e.value)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+    def test_socket_owner_only(self, server):
+        assert os.stat(server.server_address).st_mode & 0o777 == 0o600
+
+    def test_array_outside_client_memory(self, client):
+        with pytest.raises(ValueError):
+            client.locate(np.empty(3))
+        with pytest.raises(ValueError):
+            client.locate(client.empty(10)[::2])
+
+
+class TestCli:
+    """``python -m calk --ipc SOCKET`` serves until interrupted."""
+
+    def test_serve(self, socket_path):
+        process = subprocess.Popen([sys.executable, '-m', 'calk', '--ipc', socket_path], cwd=ROOT,
+                                   stderr=subprocess.PIPE, text=True)
+        try:
+            assert process.stderr.readline().startswith('serving on')
+            with Client(socket_path) as client:
+                a, out = client.empty(100), client.empty(100)
+                a[:] = np.arange(100)
+                client.evaluate('negate', out=out, a=a)
+                assert out.tolist() == (-np.arange(100.0)).tolist()
+        finally:
+            process.send_signal(signal.SIGINT)
+            assert process.wait(timeout=10) == 0
+        assert not os.path.exists(socket_path)
@@ -0,0 +1,110 @@
+"""Tests for the process-pool offload of expensive calculations."""
+import sys
+import os
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk import create_app
+from calk.services import calculator_service as svc
+from calk.services.offload import CalculationTimeout, OffloadFailed, Offloader
+from calk.services.operations import OPERATIONS, Operation
+
+
+def sleep_for(a):
+    time.sleep(a)
+    return a
+
+
+def crash(a):
+    os._exit(1)
+
+
+def is_worker(a):
+    return float(os.getpid() != int(a))
+
+
+SLOW = Operation('sleep_for', 1, sleep_for)
+CRASH = Operation('crash', 1, crash)
+IS_WORKER = Operation('is_worker', 1, is_worker)
+
+
+@pytest.fixture(scope='module')
+def offloader():
+    pool = Offloader(max_workers=1, threshold=10, timeout=2.0)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+class TestOffloader:
+    """Dispatch, deadlines and recovery."""
+
+    def test_cheap_operations_run_inline(self, offloader):
+        before = offloader.offloaded
+        assert offloader.call(OPERATIONS['add'], 2, 3) == 5
+        assert offloader.offloaded == before
+
+    def test_expensive_operations_run_in_worker(self, offloader):
+        before = offloader.offloaded
+        assert offloader.call(OPERATIONS['power_exact'], 2, 200) == 2 ** 200
+        assert offloader.offloaded == before + 1
+
+    def test_runs_in_another_process(self):
+        pool = Offloader(max_workers=1, threshold=0)
+        try:
+            assert pool.call(IS_WORKER, os.getpid()) == 1.0
+        finally:
+            pool.shutdown()
+
+    def test_worker_errors_are_reraised(self, offloader):
+        with pytest.raises(svc.CalculatorError, match='exact power needs integer base'):
+            offloader.call(OPERATIONS['power_exact'], 2.5, 100)
+
+    def test_deadline_cancels_and_recovers(self):
+        pool = Offloader(max_workers=1, threshold=0, timeout=0.5)
+        try:
+            start = time.perf_counter()
+            with pytest.raises(CalculationTimeout):
+                pool.call(SLOW, 30)
+            assert time.perf_counter() - start < 5
+            assert pool.call(SLOW, 0) == 0
+            assert pool.stats()['timeouts'] == 1
+        finally:
+            pool.shutdown()
+
+    def test_crashed_worker_is_replaced(self):
+        pool = Offloader(max_workers=1, threshold=0)
+        try:
+            with pytest.raises(OffloadFailed):
+                pool.call(CRASH, 0)
+            assert pool.call(SLOW, 0) == 0
+            assert pool.stats()['failures'] == 1
+        finally:
+            pool.shutdown()
+
+
+def test_registered_operations_pickle_by_name():
+    import pickle
+    assert pickle.loads(pickle.dumps(OPERATIONS['sin'])) is OPERATIONS['sin']
+
+
+def test_app_offloads_expensive_requests():
+    class OffloadConfig:
+        OFFLOAD_WORKERS = 1
+        OFFLOAD_COST_THRESHOLD = 10
+        RESULT_CACHE_SIZE = 16
+
+    app = create_app(OffloadConfig)
+    offloader = app.extensions['offloader']
+    try:
+        client = app.test_client()
+        res = client.get('/api/v1/calc?op=power_exact&a=2&b=100')
+        assert res.get_json()['result'] == 2 ** 100
+        res = client.post('/', data={'a': '30', 'b': '', 'operation': 'factorial_exact'})
+        assert '265252859812191058636308480000000' in res.data.decode('utf-8')
+        assert offloader.stats()['offloaded'] == 2
+    finally:
+        offloader.shutdown()
@@ -0,0 +1,78 @@
+"""Tests for the declarative operation registry."""
+import sys
+import os
+import math
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk import create_app
+from calk.services import batch
+from calk.services import calculator_service as svc
+from calk.services.operations import ERROR_MESSAGES, GROUPS, OPERATIONS, get_operation
+
+
+class TestRegistry:
+    """Registry entries are complete and dispatch to the service layer."""
+
+    def test_lookup(self):
+        assert get_operation('add') is OPERATIONS['add']
+        assert get_operation('nope') is None
+        assert get_operation(None) is None
+
+    @pytest.mark.parametrize('name,a,b,expected', [
+        ('add', 2, 3, 5),
+        ('div', 10, 4, 2.5),
+        ('sqrt', 9, 0, 3),
+        ('sin', 90, 0, 1),
+        ('log', 100, 0, 2),
+        ('power', 2, 10, 1024),
+        ('log_base', 8, 2, 3),
+        ('pi', 0, 0, math.pi),
+    ])
+    def test_dispatch(self, name, a, b, expected):
+        assert get_operation(name)(a, b) == pytest.approx(expected)
+
+    def test_arity_ignores_extra_operands(self):
+        assert OPERATIONS['negate'](5, 99) == -5
+        assert OPERATIONS['e'](1, 2) == math.e
+
+    def test_error_codes_are_known(self):
+        for op in OPERATIONS.values():
+            for code in op.errors.values():
+                assert code in ERROR_MESSAGES
+
+    @pytest.mark.parametrize('name,a,b,code', [
+        ('div', 1, 0, 'division_by_zero'),
+        ('reciprocal', 0, 0, 'division_by_zero'),
+        ('power', 0, -1, 'division_by_zero'),
+        ('sqrt', -1, 0, 'sqrt_negative'),
+        ('ln', 0, 0, 'log_non_positive'),
+        ('log_base', 10, 1, 'log_invalid_base'),
+        ('factorial', 2.5, 0, 'factorial_invalid'),
+    ])
+    def test_error_mapping(self, name, a, b, code):
+        op = OPERATIONS[name]
+        with pytest.raises(svc.CalculatorError) as exc:
+            op(a, b)
+        assert op.error_code(exc.value) == code
+
+    def test_batch_kernels_exist(self):
+        for op in OPERATIONS.values():
+            if op.batch is not None:
+                assert callable(getattr(batch, op.batch))
+
+    def test_buttons_have_labels(self):
+        for group in GROUPS.values():
+            for op in group:
+                assert op.label and op.symbol
+
+
+def test_template_buttons_generated_from_registry():
+    client = create_app().test_client()
+    text = client.get('/').data.decode('utf-8')
+    for group in GROUPS.values():
+        for op in group:
+            assert f'value="{op.name}" aria-label="{op.label}"' in text
+    assert 'value="log_base"' not in text
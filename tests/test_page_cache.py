@@ -0,0 +1,169 @@
+"""Tests for the per-locale rendered page cache."""
+import sys
+import os
+
+import pytest
+from flask import template_rendered
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk import create_app
+from calk.page_cache import PageCache
+
+
+@pytest.fixture
+def app():
+    # a fresh app per test: the shared session app keeps its page cache
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def renders(app):
+    recorded = []
+
+    def record(sender, template, context, **extra):
+        recorded.append(context.get('current_lang'))
+    template_rendered.connect(record, app)
+    yield recorded
+    template_rendered.disconnect(record, app)
+
+
+class TestPageCache:
+    """Entries, ETags and invalidation."""
+
+    def test_put_and_get(self):
+        cache = PageCache()
+        page = cache.put(('en', False), b'<html>')
+        assert cache.get(('en', False)) is page
+        assert cache.get(('ru', False)) is None
+        assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+    def test_etag_depends_on_body(self):
+        cache = PageCache()
+        assert cache.put('a', b'x').etag == cache.put('b', b'x').etag
+        assert cache.put('a', b'x').etag != cache.put('a', b'y').etag
+
+    def test_invalidate_one_locale(self):
+        cache = PageCache()
+        cache.put(('en', False), b'en')
+        cache.put(('en', True), b'en tooltip')
+        cache.put(('ru', False), b'ru')
+        cache.invalidate('en')
+        assert cache.get(('en', False)) is None and cache.get(('en', True)) is None
+        assert cache.get(('ru', False)) is not None
+        cache.invalidate()
+        assert len(cache) == 0
+
+    def test_watched_file_change_clears(self, tmp_path):
+        catalog = tmp_path / 'messages.mo'
+        catalog.write_bytes(b'v1')
+        (tmp_path / 'messages.po').write_bytes(b'v1')
+        changed = []
+        cache = PageCache([(str(tmp_path), ('.mo',))], check_interval=0,
+                          on_change=lambda: changed.append(True))
+        cache.put(('en', False), b'page')
+
+        # unwatched suffix: no effect
+        os.utime(tmp_path / 'messages.po', ns=(1, 1))
+        assert cache.get(('en', False)) is not None
+
+        os.utime(catalog, ns=(1, 1))
+        assert cache.get(('en', False)) is None
+        assert changed == [True] and cache.stats()['reloads'] == 1
+
+    def test_check_is_throttled(self, tmp_path):
+        page = tmp_path / 'index.html'
+        page.write_text('v1')
+        cache = PageCache([(str(tmp_path), ())], check_interval=3600)
+        cache.put('en', b'page')
+        os.utime(page, ns=(1, 1))
+        assert cache.get('en') is not None
+        assert cache.check(force=True)
+        assert cache.get('en') is None
+
+    def test_put_after_invalidate_discarded(self):
+        cache = PageCache()
+        en, ru = cache.generation('en'), cache.generation('ru')
+        cache.invalidate('en')
+        cache.put(('en', False), b'stale', en)
+        cache.put(('ru', False), b'ru', ru)
+        assert cache.get(('en', False)) is None
+        assert cache.get(('ru', False)) is not None
+        current = cache.generation('ru')
+        cache.invalidate()
+        assert cache.put(('ru', False), b'stale', current).body == b'stale'
+        assert len(cache) == 0
+
+
+class TestCachedIndex:
+    """GET / is rendered once per locale and supports conditional requests."""
+
+    def test_rendered_once_per_locale(self, client, renders):
+        first = client.get('/', headers={'Accept-Language': 'ru'})
+        second = client.get('/', headers={'Accept-Language': 'ru'})
+        client.get('/', headers={'Accept-Language': 'fr'})
+        assert first.data == second.data
+        assert renders == ['ru', 'fr']
+
+    def test_strong_etag_and_304(self, client):
+        response = client.get('/')
+        etag, weak = response.get_etag()
+        assert etag and not weak
+        again = client.get('/', headers={'If-None-Match': f'"{etag}"'})
+        assert again.status_code == 304
+        assert again.data == b''
+
+    def test_etag_differs_per_locale(self, client):
+        en = client.get('/', headers={'Accept-Language': 'en'}).get_etag()[0]
+        ru = client.get('/', headers={'Accept-Language': 'ru'}).get_etag()[0]
+        assert en != ru
+        assert client.get('/', headers={'Accept-Language': 'ru', 'If-None-Match': f'"{en}"'}
+                          ).status_code == 200
+
+    def test_tooltip_page_cached_separately(self, client):
+        index = client.get('/')
+        tooltip = client.get('/debug/tooltip')
+        assert b'display: flex !important' in tooltip.data
+        assert b'display: flex !important' not in index.data
+        assert index.get_etag() != tooltip.get_etag()
+
+    def test_post_not_cached(self, app, client):
+        client.get('/')
+        response = client.post('/', data={'operation': 'add', 'a': '2', 'b': '3'})
+        assert b'5.0' in response.data
+        assert response.get_etag() == (None, None)
+        # only the page and the result-less shell are stored
+        assert set(app.extensions['page_cache']._pages) == {('en', False), ('en', 'shell')}
+
+    @pytest.mark.parametrize('method', ['GET', 'POST'])
+    def test_render_during_catalog_reload_not_cached(self, app, client, method):
+        """A catalog reload lands while a page is being rendered with the old one."""
+        catalogs, cache = app.extensions['catalogs'], app.extensions['page_cache']
+        reloaded = []
+
+        @app.context_processor
+        def reload_catalog():
+            if not reloaded:
+                reloaded.append(True)
+                catalogs.install('en', {'Calculator': 'Reloaded calculator'})
+                cache.invalidate('en')
+            return {}
+
+        data = {'operation': 'add', 'a': '1', 'b': '2'} if method == 'POST' else None
+        first = client.open('/', method=method, data=data)
+        assert b'Reloaded calculator' not in first.data
+        assert len(cache) == 0
+        assert b'Reloaded calculator' in client.open('/', method=method, data=data).data
+
+    def test_disabled(self):
+        class NoCache:
+            PAGE_CACHE = False
+        app = create_app(NoCache)
+        response = app.test_client().get('/')
+        assert response.status_code == 200
+        assert 'page_cache' not in app.extensions
@@ -0,0 +1,155 @@
+"""Tests for multi-core batch evaluation with adaptive chunking."""
+import sys
+import os
+import subprocess
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from calk import create_app
+from calk.services import batch, blocked, stream
+from calk.services.expression import compile_expression
+from calk.services.parallel import MAX_CHUNK, MIN_CHUNK, ParallelEvaluator
+
+rng = np.random.default_rng(0)
+A, B = rng.uniform(-5, 200, 50001), rng.uniform(-5, 5, 50001)
+
+
+@pytest.fixture(scope='module')
+def evaluator():
+    evaluator = ParallelEvaluator(workers=2, min_items=0, chunk_seconds=1e-4)
+    yield evaluator
+    evaluator.shutdown()
+
+
+def _assert_same(res, expected):
+    np.testing.assert_array_equal(res.values, expected.values)
+    assert res.errors.keys() == expected.errors.keys()
+    for code, mask in expected.errors.items():
+        np.testing.assert_array_equal(res.errors[code], mask)
+
+
+class TestSameAsBatch:
+    """Chunked results are identical to one ``batch`` call, in the same order."""
+
+    @pytest.mark.parametrize('name', ['add', 'div', 'sin', 'power', 'factorial', 'log_base', 'pi'])
+    def test_thread_kernels(self, evaluator, name):
+        _assert_same(evaluator.evaluate(name, A, B), batch.evaluate(name, A, B))
+
+    @pytest.mark.parametrize('name', ['gamma', 'lgamma'])
+    def test_process_kernels(self, evaluator, name):
+        a, b = A[:20000], B[:20000]
+        _assert_same(evaluator.evaluate(name, a, b), batch.evaluate(name, a, b))
+
+    def test_process_kernels_with_cost_budget(self, evaluator):
+        a = np.tile([5.0, 2000.0, -1.0], 1000)
+        _assert_same(evaluator.evaluate('factorial_exact', a, max_cost=100),
+                     batch.evaluate('factorial_exact', a, max_cost=100))
+
+    def test_evaluate_many(self, evaluator):
+        names = np.array(['add', 'gamma', 'sqrt', 'nope'] * 5000, dtype=object)
+        a, b = A[:names.size], B[:names.size]
+        _assert_same(evaluator.evaluate_many(names, a, b), batch.evaluate_many(names, a, b))
+
+    def test_expression(self, evaluator):
+        compiled = compile_expression('sqrt(a) * ln(b) + a^b - gamma(b)')
+        columns = {'a': A, 'b': B}
+        out = np.empty(A.size)
+        res = evaluator.evaluate_expression(compiled, columns, out=out)
+        assert res.values is out
+        _assert_same(res, blocked.evaluate(compiled, columns))
+
+    def test_2d_and_scalar_operands(self, evaluator):
+        a = A[:50000].reshape(500, 100)
+        _assert_same(evaluator.evaluate('mul', a, 3.0), batch.evaluate('mul', a, 3.0))
+        compiled = compile_expression('a * k')
+        res = evaluator.evaluate_expression(compiled, {'a': a, 'k': 3.0})
+        np.testing.assert_array_equal(res.values, a * 3.0)
+        out = np.empty(5000)
+        evaluator.evaluate_expression(compile_expression('k + 1'), {'k': 2.0}, out=out)
+        assert out.tolist() == [3.0] * 5000
+
+    def test_small_inputs_inline(self):
+        evaluator = ParallelEvaluator(workers=2, min_items=1000)
+        evaluator.evaluate('add', A[:999], B[:999])
+        assert evaluator.stats()['parallel_calls'] == 0
+        assert evaluator._threads is None
+
+
+class TestAdaptiveChunks:
+    """Chunk sizes follow the measured per-item cost."""
+
+    def test_cost_measured(self, evaluator):
+        evaluator.evaluate('sqrt', A, B)
+        assert 0 < evaluator.cost('sqrt') < 1e-3
+        assert evaluator.cost('gamma') > evaluator.cost('sqrt')
+
+    def test_chunk_size_from_cost(self):
+        evaluator = ParallelEvaluator(workers=4, chunk_seconds=0.01)
+        evaluator._costs.update(cheap=1e-9, dear=1e-5, huge=1.0)
+        assert evaluator.chunk_size('cheap', 10 ** 9) == MAX_CHUNK
+        assert evaluator.chunk_size('dear', 10 ** 9) == pytest.approx(1000, abs=1)
+        assert evaluator.chunk_size('huge', 10 ** 9) == MIN_CHUNK
+        # never fewer chunks than workers
+        assert evaluator.chunk_size('cheap', 40000) == 10000
+
+    def test_cost_table_bounded(self):
+        evaluator = ParallelEvaluator(workers=2, min_items=0, max_costs=3)
+        a = A[:2000]
+        evaluator.evaluate('sqrt', a)
+        for k in range(5):
+            evaluator.evaluate_expression(compile_expression(f'a + {k}'), {'a': a})
+        assert len(evaluator.stats()['costs']) == 3
+        assert evaluator.cost('sqrt') is None
+        assert evaluator.cost('expr:a + 4') is not None
+        evaluator.shutdown()
+
+    def test_first_chunk_probes_inline(self):
+        evaluator = ParallelEvaluator(workers=2, min_items=0)
+        evaluator.evaluate('exp', A, B)
+        assert evaluator.cost('exp') is not None
+        evaluator.shutdown()
+
+
+class TestIntegration:
+    """Batch, stream, expression and CLI paths use the evaluator when enabled."""
+
+    @pytest.fixture
+    def app(self):
+        class Config:
+            PARALLEL_WORKERS = 2
+            PARALLEL_MIN_ITEMS = 0
+        app = create_app(Config)
+        yield app
+        app.extensions['parallel'].shutdown()
+
+    def test_cost_table_sized_by_expression_cache(self, app):
+        assert app.extensions['parallel'].max_costs > app.config['EXPRESSION_CACHE_SIZE']
+
+    def test_disabled_by_default(self):
+        assert 'parallel' not in create_app().extensions
+
+    def test_batch_columns(self, app):
+        a = A[:5000].tolist()
+        res = app.test_client().post('/api/v1/batch', json={'op': 'sqrt', 'a': a})
+        expected = batch.evaluate('sqrt', a)
+        assert res.get_json()['errors'] == [expected.error_at(i) for i in range(len(a))]
+        assert app.extensions['parallel'].stats()['parallel_calls'] >= 1
+
+    def test_expr_columns(self, app):
+        res = app.test_client().post('/api/v1/expr', json={'expr': 'a * 2', 'vars': {'a': list(range(3000))}})
+        assert res.get_json()['results'] == [2.0 * i for i in range(3000)]
+
+    def test_stream(self, app):
+        rows = 'op,a,b\n' + ''.join(f'div,{i},{i % 3}\n' for i in range(3000))
+        res = app.test_client().post('/api/v1/stream', data=rows, content_type='text/csv')
+        assert res.get_data(as_text=True) == ''.join(stream.evaluate_csv(rows.splitlines(True)))
+
+    def test_cli_workers(self):
+        rows = 'op,a,b\n' + ''.join(f'mul,{i},2\n' for i in range(5000))
+        out = subprocess.run([sys.executable, '-m', 'calk', '--workers', '2'], cwd=ROOT, input=rows,
+                             capture_output=True, text=True, check=True).stdout
+        assert out.splitlines()[-1] == 'mul,4999,2,9998.0,'
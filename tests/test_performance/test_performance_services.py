@@ -0,0 +1,167 @@
+"""Benchmarks of the calculation services against their slower alternatives."""
+import sys
+import os
+import tempfile
+import threading
+import time
+
+import flask_babel
+import numpy as np
+import pytest
+from babel.messages.pofile import read_po
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from calk import create_app, i18n
+from calk.services import blocked, calculator_service as svc
+from calk.services.expression import compile_expression, compile_tree, parse
+from calk.services.ipc import Client, Server
+from calk.services.parallel import ParallelEvaluator
+
+rng = np.random.default_rng(0)
+
+
+def _best_of_interleaved(*funcs, rounds=7):
+    """Best time of each function, measured in alternating rounds so load
+    from other processes hits all of them alike."""
+    best = [float('inf')] * len(funcs)
+    for _ in range(rounds):
+        for i, func in enumerate(funcs):
+            start = time.perf_counter()
+            func()
+            best[i] = min(best[i], time.perf_counter() - start)
+    return best
+
+
+@pytest.mark.performance
+class TestExpressionPerformance:
+    """Compiled expressions against hand-written and unoptimized calls."""
+
+    def test_rebinding_costs_only_the_arithmetic(self):
+        """A cached expression vs the same calls written out by hand."""
+        compiled = compile_expression('sqrt(a^2 + b^2) * sin(c)')
+        sin = compiled.func.__globals__['_sin']
+
+        def direct(a, b, c):
+            return svc.mul(svc.sqrt(svc.add(svc.power(a, 2.0), svc.power(b, 2.0))), sin(c))
+
+        def loop(func):
+            return lambda: [func(i, 2.0, 30.0) for i in range(20000)]
+
+        compiled_s, direct_s = _best_of_interleaved(loop(compiled.func), loop(direct))
+        assert compiled_s < direct_s * 1.5, f"compiled {compiled_s * 1e3:.1f}ms, direct {direct_s * 1e3:.1f}ms"
+
+    def test_optimized_vs_naive(self):
+        """Repeated subterms and pi/180 factors, as generated by clients."""
+        tree = parse('sin(x*(pi/180))*sin(x*(pi/180)) + cos(x*(pi/180))*cos(x*(pi/180))'
+                     ' + sqrt(sin(x*(pi/180))^2 + 1) * (e^2 - 1)')
+        optimized, naive = compile_tree(tree), compile_tree(tree, optimized=False)
+
+        def loop(func):
+            return lambda: [func(float(i)) for i in range(20000)]
+
+        optimized_s, naive_s = _best_of_interleaved(loop(optimized.func), loop(naive.func))
+        assert optimized_s < naive_s / 2, f"optimized {optimized_s * 1e3:.1f}ms, naive {naive_s * 1e3:.1f}ms"
+
+
+@pytest.mark.performance
+class TestParallelScaling:
+    """Throughput of a large column on 1..N cores."""
+
+    def test_scaling(self):
+        n = 4_000_000
+        a, b = rng.uniform(1, 5, n), rng.uniform(1, 5, n)
+        compiled = compile_expression('sqrt(a^2 + b^2) * sin(a) + ln(a * b)')
+        expected = blocked.evaluate(compiled, {'a': a, 'b': b}).values
+        timings = {}
+        for workers in range(1, (os.cpu_count() or 1) + 1):
+            evaluator = ParallelEvaluator(workers=workers)
+            out = np.empty(n)
+            try:
+                evaluator.evaluate_expression(compiled, {'a': a, 'b': b}, out=out)
+                timings[workers], = _best_of_interleaved(
+                    lambda: evaluator.evaluate_expression(compiled, {'a': a, 'b': b}, out=out), rounds=3)
+            finally:
+                evaluator.shutdown()
+            np.testing.assert_array_equal(out, expected)
+        if len(timings) >= 4:
+            assert min(timings.values()) < timings[1] * 0.9, f"timings by cores: {timings}"
+
+
+@pytest.mark.performance
+class TestTranslationPerformance:
+    """Per-render cost of translating every msgid in all locales."""
+
+    def test_frozen_tables_vs_flask_babel(self):
+        app = create_app()
+        with open(os.path.join(ROOT, 'messages.pot'), 'rb') as f:
+            msgids = [m.id for m in read_po(f) if m.id and isinstance(m.id, str)]
+        locales = sorted(app.extensions['catalogs'].tables)
+
+        def per_render(bind):
+            def run():
+                for locale in locales:
+                    with app.test_request_context(headers={'Accept-Language': locale}):
+                        translate = bind()
+                        for _ in range(20):
+                            for msgid in msgids:
+                                translate(msgid)
+            return run
+
+        before, after = _best_of_interleaved(per_render(lambda: flask_babel.gettext),
+                                             per_render(i18n.current_translator), rounds=3)
+        assert after < before, f"Flask-Babel {before * 1e3:.1f}ms, frozen tables {after * 1e3:.1f}ms"
+
+
+def _first_request(config=None):
+    client = create_app(config).test_client()
+    start = time.perf_counter()
+    response = client.post('/', data={'operation': 'add', 'a': '1', 'b': '2'})
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    return elapsed
+
+
+@pytest.mark.performance
+class TestWarmPerformance:
+    """First calculation on a cold worker vs a warmed one."""
+
+    def test_first_request_latency(self):
+        class Warm:
+            WARM_ON_START = True
+        cold = min(_first_request() for _ in range(3))
+        warmed = min(_first_request(Warm) for _ in range(3))
+        assert warmed < cold, f"cold {cold * 1e3:.1f}ms, warmed {warmed * 1e3:.1f}ms"
+
+
+@pytest.mark.performance
+class TestIpcPerformance:
+    """Round trip of a large column against the JSON batch API."""
+
+    def test_against_json_api(self):
+        n = 200_000
+        directory = tempfile.mkdtemp(prefix='calk-')
+        path = os.path.join(directory, 'calk.sock')
+        server = Server(path)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with Client(path) as client:
+                a, b, out = client.empty(n), client.empty(n), client.empty(n)
+                a[:], b[:] = rng.uniform(1, 5, n), rng.uniform(1, 5, n)
+                client.evaluate('mul', out=out, a=a, b=b)
+                shared_s, = _best_of_interleaved(lambda: client.evaluate('mul', out=out, a=a, b=b), rounds=1)
+
+                class Config:
+                    API_BATCH_MAX_ITEMS = n
+                    API_BATCH_MAX_BYTES = 64 * n
+                api = create_app(Config).test_client()
+                payload = {'op': 'mul', 'a': a.tolist(), 'b': b.tolist()}
+                json_s, = _best_of_interleaved(lambda: api.post('/api/v1/batch', json=payload), rounds=1)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+            os.rmdir(directory)
+        assert shared_s < json_s, f"shared memory {shared_s * 1e3:.1f}ms, JSON API {json_s * 1e3:.0f}ms"
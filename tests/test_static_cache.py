@@ -0,0 +1,83 @@
+"""Tests for the in-memory static file cache."""
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk import create_app
+from calk.static_cache import StaticMemoryCache
+
+STATIC = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'calk', 'static')
+CSS = open(os.path.join(STATIC, 'css', 'style.css'), 'rb').read()
+
+
+class MemoryConfig:
+    STATIC_MEMORY_CACHE = True
+
+
+@pytest.fixture
+def app():
+    return create_app(MemoryConfig)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+class TestLoading:
+    """Files are read once, within the size limits."""
+
+    def test_loads_static_folder(self):
+        cache = StaticMemoryCache(STATIC)
+        assert 'css/style.css' in cache and 'img/favicon.svg' in cache
+        assert cache.stats()['size'] >= len(CSS)
+
+    def test_size_limits(self):
+        assert 'css/style.css' not in StaticMemoryCache(STATIC, max_file_size=len(CSS) - 1)
+        assert len(StaticMemoryCache(STATIC, max_total_size=0)) == 0
+
+    def test_disabled_by_default(self):
+        assert 'static_cache' not in create_app().extensions
+
+
+class TestServing:
+    """Responses come from memory and honour conditional and Range requests."""
+
+    def test_body_and_headers(self, app, client):
+        response = client.get('/static/css/style.css')
+        assert response.status_code == 200
+        assert response.data == CSS
+        assert response.mimetype == 'text/css'
+        assert response.accept_ranges == 'bytes'
+        assert response.last_modified is not None
+        etag, weak = response.get_etag()
+        assert etag and not weak
+        assert app.extensions['static_cache'].stats()['hits'] == 1
+
+    def test_conditional(self, client):
+        etag = client.get('/static/css/style.css').get_etag()[0]
+        response = client.get('/static/css/style.css', headers={'If-None-Match': f'"{etag}"'})
+        assert response.status_code == 304
+        assert response.data == b''
+
+    def test_range(self, client):
+        response = client.get('/static/css/style.css', headers={'Range': 'bytes=0-9'})
+        assert response.status_code == 206
+        assert response.data == CSS[:10]
+        assert response.headers['Content-Range'] == f'bytes 0-9/{len(CSS)}'
+
+    def test_unsatisfiable_range(self, client):
+        response = client.get('/static/css/style.css', headers={'Range': f'bytes={len(CSS) + 10}-'})
+        assert response.status_code == 416
+
+    def test_missing_file_falls_back_to_disk(self, app, client):
+        assert client.get('/static/nope.css').status_code == 404
+        assert app.extensions['static_cache'].stats()['misses'] == 1
+
+    def test_cache_policy_still_applies(self, client):
+        page = client.get('/').data.decode('utf-8')
+        assert '/static/css/style.css?v=' in page
+        assert client.get('/static/css/style.css?v=1').cache_control.immutable
@@ -0,0 +1,87 @@
+"""Tests for chunked CSV/JSONL evaluation."""
+import sys
+import os
+import json
+import tracemalloc
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk.services import stream
+
+
+def _csv_rows(n):
+    yield 'op,a,b\n'
+    for i in range(n):
+        yield f'add,{i},1\n'
+
+
+class TestEvaluateCsv:
+    """Tests for stream.evaluate_csv."""
+
+    def test_appends_result_and_error_columns(self):
+        lines = ['id,op,a,b\n', '1,add,2,3\n', '2,div,1,0\n', '3,sqrt,16,\n', '4,add,x,1\n']
+        out = ''.join(stream.evaluate_csv(lines)).splitlines()
+        assert out == [
+            'id,op,a,b,result,error',
+            '1,add,2,3,5.0,',
+            '2,div,1,0,,division_by_zero',
+            '3,sqrt,16,,4.0,',
+            '4,add,x,1,,invalid_input',
+        ]
+
+    def test_yields_one_piece_per_chunk(self):
+        pieces = list(stream.evaluate_csv(_csv_rows(10), chunk_size=4))
+        assert len(pieces) == 1 + 3
+        assert pieces[-1].splitlines()[-1] == 'add,9,1,10.0,'
+
+    def test_missing_columns(self):
+        with pytest.raises(stream.StreamFormatError):
+            next(stream.evaluate_csv(['x,y\n', '1,2\n']))
+        with pytest.raises(stream.StreamFormatError):
+            next(stream.evaluate_csv([]))
+
+    def test_reads_input_lazily(self):
+        consumed = []
+
+        def source():
+            for line in _csv_rows(100):
+                consumed.append(line)
+                yield line
+
+        output = stream.evaluate_csv(source(), chunk_size=10)
+        next(output)
+        next(output)
+        assert len(consumed) <= 1 + 10 + 1
+
+    def test_memory_stays_flat(self):
+        """Peak memory does not grow with the number of rows."""
+        def peak(n):
+            tracemalloc.start()
+            for _ in stream.evaluate_csv(_csv_rows(n), chunk_size=1000):
+                pass
+            result = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return result
+
+        small, large = peak(5000), peak(50000)
+        assert large < small * 2
+
+
+class TestEvaluateJsonl:
+    """Tests for stream.evaluate_jsonl."""
+
+    def test_results_and_errors(self):
+        lines = [
+            '{"op": "mul", "a": 3, "b": 4, "id": "x"}\n',
+            '\n',
+            '{"op": "ln", "a": 0}\n',
+            'not json\n',
+            '{"op": "nope", "a": 1}\n',
+        ]
+        out = [json.loads(line) for line in ''.join(stream.evaluate_jsonl(lines, chunk_size=2)).splitlines()]
+        assert out[0] == {'op': 'mul', 'a': 3, 'b': 4, 'id': 'x', 'result': 12.0}
+        assert out[1]['error'] == 'log_non_positive'
+        assert out[2] == {'error': 'invalid_input'}
+        assert out[3]['error'] == 'unknown_operation'
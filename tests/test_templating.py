@@ -0,0 +1,61 @@
+"""Tests for the bytecode cache and the warm-up step."""
+import sys
+import os
+
+from flask import template_rendered
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from calk import create_app
+from calk.templating import warm
+
+LOCALES = ['en', 'ru', 'fr', 'de', 'es', 'it', 'zh', 'ka', 'hy']
+
+
+def _config(**settings):
+    return type('Config', (), settings)
+
+
+class TestWarm:
+    """warm() compiles templates and renders every locale."""
+
+    def test_fills_page_cache(self):
+        app = create_app(_config(WARM_ON_START=True))
+        cache = app.extensions['page_cache']
+        assert set(cache._pages) == {(locale, variant) for locale in LOCALES for variant in (False, 'shell')}
+        assert cache.stats()['misses'] == 2 * len(LOCALES)
+
+    def test_first_post_renders_only_the_result(self):
+        app = create_app(_config(WARM_ON_START=True))
+        rendered = []
+        template_rendered.connect(lambda sender, template, **extra: rendered.append(template.name), app,
+                                  weak=False)
+        for locale in ('en', 'ka'):
+            app.test_client().post('/', data={'operation': 'add', 'a': '1', 'b': '2'},
+                                   headers={'Accept-Language': locale})
+        assert rendered == ['_result.html', '_result.html']
+
+    def test_returns_compiled_templates(self):
+        assert 'index.html' in warm(create_app())
+
+
+class TestBytecodeCache:
+    """Compiled templates are shared through the cache directory."""
+
+    def test_disabled_by_default(self):
+        assert create_app().jinja_env.bytecode_cache is None
+
+    def test_shared_between_apps(self, tmp_path):
+        directory = tmp_path / 'jinja'
+        config = _config(JINJA_BYTECODE_CACHE_DIR=str(directory), WARM_ON_START=True)
+        create_app(config)
+        assert any(directory.iterdir())
+
+        app = create_app(_config(JINJA_BYTECODE_CACHE_DIR=str(directory)))
+
+        def compile(*args, **kwargs):
+            raise AssertionError('template compiled despite the bytecode cache')
+        app.jinja_env.compile = compile
+        response = app.test_client().get('/', headers={'Accept-Language': 'ru'})
+        assert response.status_code == 200
+        assert 'current_lang=ru' in response.data.decode('utf-8')